@@ -22,18 +22,35 @@ CREATE TABLE IF NOT EXISTS Inventory (
     name VARCHAR(100) NOT NULL UNIQUE,
     price DECIMAL(10, 2) NOT NULL, -- Currency should use DECIMAL for precision
     stock_quantity INT NOT NULL,
+    barcode VARCHAR(32) UNIQUE, -- Optional barcode/SKU, scanned or typed at the till
+    -- Row version used by the CLI's inventory cache to fetch only rows changed since its last refresh.
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
     CHECK (price >= 0),
-    CHECK (stock_quantity >= 0)
+    CHECK (stock_quantity >= 0),
+    INDEX idx_inventory_updated_at (updated_at),
+    -- Low-stock listings (stock_quantity <= N) page through this index in product_id order.
+    -- Name-prefix search uses the UNIQUE index on name.
+    INDEX idx_inventory_stock (stock_quantity, product_id)
 );
+-- Upgrading an existing database:
+-- ALTER TABLE Inventory
+--     ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+--     ADD INDEX idx_inventory_updated_at (updated_at),
+--     ADD INDEX idx_inventory_stock (stock_quantity, product_id),
+--     ADD COLUMN barcode VARCHAR(32) UNIQUE AFTER stock_quantity;
 
 -- 3. Customers Table
 CREATE TABLE IF NOT EXISTS Customers (
     customer_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100), -- Written at checkout and printed on receipts
     mobile_number VARCHAR(15) UNIQUE,
     email VARCHAR(100) UNIQUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Upgrading an existing database:
+-- ALTER TABLE Customers ADD COLUMN name VARCHAR(100) AFTER customer_id;
+
 -- 4. Orders Table (To store header/summary of each transaction)
 CREATE TABLE IF NOT EXISTS Orders (
     order_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -41,7 +58,9 @@ CREATE TABLE IF NOT EXISTS Orders (
     order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     total_amount DECIMAL(10, 2) NOT NULL,
     payment_status VARCHAR(20) NOT NULL DEFAULT 'Paid',
-    FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
+    idempotency_key VARCHAR(64) UNIQUE, -- Set by tills that journal sales, so a replayed sale is stored only once
+    FOREIGN KEY (customer_id) REFERENCES Customers(customer_id),
+    INDEX idx_orders_date (order_date) -- Date-range sales reports
 );
 
 -- 5. Order Items Table (To store details of what was purchased in an order)
@@ -53,7 +72,62 @@ CREATE TABLE IF NOT EXISTS OrderItems (
     price_at_sale DECIMAL(10, 2) NOT NULL,
     FOREIGN KEY (order_id) REFERENCES Orders(order_id),
     FOREIGN KEY (product_id) REFERENCES Inventory(product_id),
-    CHECK (quantity > 0)
+    CHECK (quantity > 0),
+    INDEX idx_orderitems_order (order_id) -- MySQL creates this for the foreign key anyway; SQLite does not
+);
+
+-- Upgrading an existing database:
+-- ALTER TABLE Orders ADD INDEX idx_orders_date (order_date);
+-- ALTER TABLE Orders ADD COLUMN idempotency_key VARCHAR(64) UNIQUE AFTER payment_status;
+
+-- 6. Sales Rollups
+-- Running totals kept current by every checkout (in the same transaction as the order itself),
+-- so reports read a handful of rows instead of summing Orders/OrderItems.
+-- Rebuild them from the raw tables with: python superstore_cli.py rollups rebuild
+CREATE TABLE IF NOT EXISTS SalesDaily (
+    sales_date DATE PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    items_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS SalesHourly (
+    sales_hour DATETIME PRIMARY KEY, -- Start of the hour (minutes and seconds are zero)
+    order_count INT NOT NULL DEFAULT 0,
+    items_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS ProductSales (
+    product_id INT PRIMARY KEY,
+    units_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (product_id) REFERENCES Inventory(product_id)
+);
+
+-- Idempotency keys of orders moved to the cold order archive (superstore_archive.py), so a journal
+-- replay of an archived sale still finds the order instead of selling it a second time.
+CREATE TABLE IF NOT EXISTS ArchivedOrderKeys (
+    idempotency_key VARCHAR(64) PRIMARY KEY,
+    order_id INT NOT NULL,
+    customer_id INT,
+    FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
+);
+
+-- 7. Stock Reservations
+-- Units held for open carts from the moment an item is added until checkout, reset or expiry.
+-- Reserved units are already taken off Inventory.stock_quantity, which therefore shows what is free.
+-- Rows whose cart_id starts with 'allot:' are a till's block of a hot product, handed out to its carts
+-- without touching the Inventory row again. The expiry sweep returns abandoned units to stock.
+CREATE TABLE IF NOT EXISTS StockReservations (
+    cart_id VARCHAR(64) NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (cart_id, product_id),
+    FOREIGN KEY (product_id) REFERENCES Inventory(product_id),
+    CHECK (quantity >= 0),
+    INDEX idx_reservations_expiry (expires_at)
 );
 
 -- --------------------------------------------------------------------------------------
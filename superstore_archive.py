@@ -0,0 +1,479 @@
+"""Cold archive of closed months of order history for the Super Store CLI.
+
+Orders and OrderItems only grow, and every report scan and every checkout's index maintenance pays
+for all of it. `archive run` moves each closed month out of the hot tables into a directory of
+column files (one NumPy .npy file per column, read memory-mapped) and records it in a manifest:
+
+    superstore_archive/
+        manifest.json                   partitions: state, id range, row counts, sums, file checksums
+        2024-01/orders.order_id.npy     ... one file per column of Orders
+        2024-01/items.product_id.npy    ... and of OrderItems
+
+A month goes through three states, each saved in the manifest before the next step starts, so an
+interrupted run carries on where it stopped:
+
+    exporting   columns are being written to 2024-01.tmp/ (thrown away and redone on resume)
+    exported    files in place and equal to COUNT/SUM of the rows they were read from
+    archived    those rows deleted from the hot tables, a batch of orders per transaction
+
+Money is kept as whole paisa (int64), so archived sums are exact, and every order line carries its
+order's timestamp, so per-day, per-hour and per-product totals need no join. A sale that reaches the
+database for an archived month later (a late journal replay) stays hot until the next run archives
+it as a further segment of the month (2024-01~2).
+
+Readers (the sales report, rollup rebuild/check) add archived rows to the hot ones and leave out hot
+rows of a month that is exported but not yet deleted, so totals are the same before, during and
+after a run. Like the reports, the archive needs NumPy.
+"""
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import shutil
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from superstore_cart import to_money
+
+ARCHIVE_CONFIG = {
+    'directory': os.environ.get('SUPERSTORE_ARCHIVE_DIR', 'superstore_archive'),
+    'hot_months': 3,            # Months kept in the hot tables, counting the current one
+    'chunk_size': 100_000,      # Rows per fetch while exporting, and per array handed to the reports
+    'delete_batch': 1000,       # Orders deleted from the hot tables per transaction
+}
+
+EPOCH = datetime.datetime(1970, 1, 1)   # Timestamps are stored as whole seconds since this (naive, like order_date)
+
+ORDER_COLUMNS = (('order_id', '<i8'), ('customer_id', '<i8'), ('order_date', '<i8'), ('total_paisa', '<i8'),
+                 ('payment_status', 'S20'), ('idempotency_key', 'S64'))
+ITEM_COLUMNS = (('item_id', '<i8'), ('order_id', '<i8'), ('product_id', '<i8'), ('quantity', '<i8'),
+                ('price_paisa', '<i8'), ('order_date', '<i8'))
+
+class ArchiveError(RuntimeError):
+    """The archive and the database disagree, or an archive file is damaged."""
+
+def _as_datetime(value):
+    """TIMESTAMP values come back as datetime from MySQL and as text from SQLite aggregates."""
+    return value if isinstance(value, datetime.datetime) else datetime.datetime.fromisoformat(str(value))
+
+def _seconds(value):
+    return (_as_datetime(value) - EPOCH) // datetime.timedelta(seconds=1)
+
+def _paisa(value):
+    return int(to_money(value) * 100)
+
+def _money(paisa):
+    return decimal.Decimal(int(paisa)).scaleb(-2)
+
+def month_of(value):
+    return f"{value.year:04d}-{value.month:02d}"
+
+def month_bounds(month):
+    """'YYYY-MM' -> (first instant of the month, first instant of the next)."""
+    start = datetime.datetime.strptime(month, '%Y-%m')
+    return start, (start + datetime.timedelta(days=32)).replace(day=1)
+
+def cutoff_month(hot_months=None, today=None):
+    """The oldest month kept hot; every month before it is closed and can be archived."""
+    today = today or datetime.date.today()
+    hot_months = ARCHIVE_CONFIG['hot_months'] if hot_months is None else hot_months
+    index = today.year * 12 + today.month - max(hot_months, 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def _group_sum(keys, *values):
+    """(distinct keys, exact int64 sum of each `values` array per key)."""
+    if not len(keys):
+        return (keys,) + tuple(np.zeros(0, dtype=np.int64) for _ in values)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return (keys[starts],) + tuple(np.add.reduceat(np.asarray(column)[order], starts) for column in values)
+
+def _fsync(path):
+    """Flushes a file (or a directory entry, on platforms that allow opening one) to disk."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as data:
+        for block in iter(lambda: data.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class OrderArchive:
+    """The archive directory: its manifest, its memory-mapped column files and the queries readers run on them."""
+
+    def __init__(self, directory=None):
+        if np is None:
+            raise RuntimeError("The order archive needs NumPy (pip install numpy).")
+        self.directory = directory or ARCHIVE_CONFIG['directory']
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        try:
+            with open(self.manifest_path, encoding='utf-8') as manifest:
+                self.manifest = json.load(manifest)
+        except FileNotFoundError:
+            self.manifest = {'version': 1, 'partitions': {}}
+        self._mapped = {}   # (partition, table) -> {column: memory-mapped array}
+
+    @property
+    def partitions(self):
+        return self.manifest['partitions']
+
+    def save_manifest(self):
+        """Writes the manifest to a temp file and swaps it in, so a crash leaves the old or the new one."""
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as out:
+            json.dump(self.manifest, out, indent=1, sort_keys=True)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp_path, self.manifest_path)
+        _fsync(self.directory)
+
+    def path(self, name, file_name=None):
+        return os.path.join(self.directory, name, file_name) if file_name else os.path.join(self.directory, name)
+
+    def columns(self, name, table):
+        """A partition's 'orders' or 'items' columns as read-only memory-mapped arrays."""
+        key = (name, table)
+        if key not in self._mapped:
+            spec = ORDER_COLUMNS if table == 'orders' else ITEM_COLUMNS
+            self._mapped[key] = {column: np.load(self.path(name, f"{table}.{column}.npy"), mmap_mode='r')
+                                 for column, _ in spec}
+        return self._mapped[key]
+
+    def readable(self, start=None, end=None):
+        """Partitions readers count (exported or archived) whose month overlaps the dates [start, end]."""
+        first, last = (month_of(start) if start else None), (month_of(end) if end else None)
+        return [name for name, part in sorted(self.partitions.items())
+                if part['state'] in ('exported', 'archived')
+                and (first is None or part['month'] >= first) and (last is None or part['month'] <= last)]
+
+    def hot_exclusion(self, alias='o'):
+        """SQL condition (and params) leaving out the hot Orders rows of exported partitions whose delete
+        has not finished: readers already count them from the archive. ('', []) when there are none."""
+        conditions, params = [], []
+        for name in self.readable():
+            part = self.partitions[name]
+            if part['state'] == 'exported':
+                start, end = month_bounds(part['month'])
+                conditions.append(f"NOT ({alias}.order_id BETWEEN %s AND %s "
+                                  f"AND {alias}.order_date >= %s AND {alias}.order_date < %s)")
+                params += [part['min_order_id'], part['max_order_id'], start, end]
+        return ' AND '.join(conditions), params
+
+    # --- Queries ---------------------------------------------------------------------
+
+    def _slices(self, table, start, end, names, chunk_size=None):
+        """Yields {column: array} chunks of a table's archived rows with order_date within the dates [start, end]."""
+        chunk_size = chunk_size or ARCHIVE_CONFIG['chunk_size']
+        low = _seconds(datetime.datetime.combine(start, datetime.time())) if start else None
+        high = _seconds(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time())) if end else None
+        for name in self.readable(start, end):
+            columns = self.columns(name, table)
+            for offset in range(0, len(columns['order_date']), chunk_size):
+                chunk = {column: columns[column][offset:offset + chunk_size] for column in set(names) | {'order_date'}}
+                if low is not None or high is not None:
+                    dates = chunk['order_date']
+                    keep = np.ones(len(dates), dtype=bool)
+                    if low is not None:
+                        keep &= dates >= low
+                    if high is not None:
+                        keep &= dates < high
+                    chunk = {column: values[keep] for column, values in chunk.items()}
+                if len(chunk['order_date']):
+                    yield chunk
+
+    def line_chunks(self, start=None, end=None, chunk_size=None):
+        """Archived order lines as int64 rows (product_id, quantity, line revenue in paise, hour of day),
+        the columns the sales report reads from the hot tables."""
+        for chunk in self._slices('items', start, end, ('product_id', 'quantity', 'price_paisa'), chunk_size):
+            yield np.column_stack([chunk['product_id'], chunk['quantity'], chunk['quantity'] * chunk['price_paisa'],
+                                   chunk['order_date'] // 3600 % 24]).astype(np.int64)
+
+    def order_chunks(self, start=None, end=None, chunk_size=None):
+        """Archived orders as int64 rows (total_amount in paise, hour of day)."""
+        for chunk in self._slices('orders', start, end, ('total_paisa',), chunk_size):
+            yield np.column_stack([chunk['total_paisa'], chunk['order_date'] // 3600 % 24]).astype(np.int64)
+
+    def first_order_date(self, start=None, end=None):
+        """Date of the earliest archived order within [start, end], or None."""
+        firsts = [int(chunk['order_date'].min()) for chunk in self._slices('orders', start, end, ())]
+        return (EPOCH + datetime.timedelta(seconds=min(firsts))).date() if firsts else None
+
+    def rollups(self):
+        """SalesDaily, SalesHourly and ProductSales totals of every archived row, in the shape of
+        StorageEngine._rollups_from_orders(): {table: {str(key): (counters...)}}."""
+        totals = {'SalesDaily': {}, 'SalesHourly': {}, 'ProductSales': {}}
+
+        def add(table, key, values):
+            current = totals[table].get(key)
+            totals[table][key] = values if current is None else [a + b for a, b in zip(current, values)]
+
+        for name in self.readable():
+            orders, items = self.columns(name, 'orders'), self.columns(name, 'items')
+            for table, seconds, label in (
+                    ('SalesDaily', 86400, lambda key: (EPOCH + datetime.timedelta(days=key)).date().isoformat()),
+                    ('SalesHourly', 3600, lambda key: (EPOCH + datetime.timedelta(hours=key)).strftime('%Y-%m-%d %H:00:00'))):
+                keys, counts, revenue = _group_sum(orders['order_date'] // seconds, np.ones(len(orders['order_date']), np.int64),
+                                                   orders['total_paisa'])
+                units = dict(zip(*(column.tolist() for column in _group_sum(items['order_date'] // seconds, items['quantity']))))
+                for key, count, paisa in zip(keys.tolist(), counts.tolist(), revenue.tolist()):
+                    add(table, label(key), [count, units.get(key, 0), paisa])
+            keys, units, revenue = _group_sum(items['product_id'], items['quantity'], items['quantity'] * items['price_paisa'])
+            for key, count, paisa in zip(keys.tolist(), units.tolist(), revenue.tolist()):
+                add('ProductSales', str(key), [count, paisa])
+        return {table: {key: tuple(values[:-1]) + (_money(values[-1]),) for key, values in rows.items()}
+                for table, rows in totals.items()}
+
+    # --- Checks ----------------------------------------------------------------------
+
+    def file_totals(self, name):
+        """Row counts and exact sums of a partition, from its files."""
+        orders, items = self.columns(name, 'orders'), self.columns(name, 'items')
+        return {'orders': len(orders['order_id']), 'items': len(items['item_id']),
+                'revenue_paisa': int(orders['total_paisa'].sum()), 'units': int(items['quantity'].sum()),
+                'line_paisa': int((items['quantity'] * items['price_paisa']).sum())}
+
+    def check_files(self, name):
+        """Problems with a partition's files: missing, changed since export, or not adding up to the manifest."""
+        part = self.partitions[name]
+        for file_name, digest in sorted(part['files'].items()):
+            path = self.path(name, file_name)
+            if not os.path.exists(path):
+                return [f"{name}: {file_name} is missing"]
+            if _sha256(path) != digest:
+                return [f"{name}: {file_name} does not match its checksum"]
+        totals = self.file_totals(name)
+        return [f"{name}: {key} is {totals[key]} in the files, {part[key]} in the manifest"
+                for key in sorted(totals) if totals[key] != part[key]]
+
+    def size_bytes(self, name):
+        return sum(os.path.getsize(self.path(name, file_name)) for file_name in self.partitions[name].get('files', {}))
+
+def open_archive(directory=None):
+    """The archive at `directory` (default ARCHIVE_CONFIG['directory']) if one was ever written, else None."""
+    directory = directory or ARCHIVE_CONFIG['directory']
+    if not os.path.exists(os.path.join(directory, 'manifest.json')):
+        return None
+    return OrderArchive(directory)
+
+# ------------------------------------------------------------------------------
+# ARCHIVING
+# ------------------------------------------------------------------------------
+
+_MONTH_ROWS = "o.order_date >= %s AND o.order_date < %s AND o.order_id BETWEEN %s AND %s"
+
+def _db_totals(engine, month, min_order_id, max_order_id):
+    """The same counts and sums as OrderArchive.file_totals(), for a month's rows in the hot tables."""
+    params = month_bounds(month) + (min_order_id, max_order_id)
+    orders = engine.query_all("SELECT COUNT(*) AS count, COALESCE(SUM(o.total_amount), 0) AS revenue "
+                              f"FROM Orders o WHERE {_MONTH_ROWS}", params)[0]
+    items = engine.query_all("SELECT COUNT(*) AS count, COALESCE(SUM(oi.quantity), 0) AS units, "
+                             "COALESCE(SUM(oi.quantity * oi.price_at_sale), 0) AS value "
+                             f"FROM OrderItems oi JOIN Orders o ON o.order_id = oi.order_id WHERE {_MONTH_ROWS}", params)[0]
+    return {'orders': int(orders['count']), 'items': int(items['count']), 'revenue_paisa': _paisa(orders['revenue']),
+            'units': int(items['units']), 'line_paisa': _paisa(items['value'])}
+
+def _order_row(row):
+    order_id, customer_id, order_date, total_amount, payment_status, idempotency_key = row
+    return (order_id, -1 if customer_id is None else customer_id, _seconds(order_date), _paisa(total_amount),
+            (payment_status or '').encode(), (idempotency_key or '').encode())
+
+def _item_row(row):
+    item_id, order_id, product_id, quantity, price_at_sale, order_date = row
+    return item_id, order_id, product_id, quantity, _paisa(price_at_sale), _seconds(order_date)
+
+def _write_columns(engine, directory, table, spec, count, query, params, convert):
+    """Streams a query's rows into one pre-sized .npy file per column."""
+    arrays = {column: np.lib.format.open_memmap(os.path.join(directory, f"{table}.{column}.npy"), mode='w+',
+                                                 dtype=dtype, shape=(count,))
+              for column, dtype in spec}
+    written = 0
+    with engine.connection() as conn:
+        cursor = engine.stream_cursor(conn)
+        try:
+            engine.execute(cursor, query, params)
+            while True:
+                rows = cursor.fetchmany(ARCHIVE_CONFIG['chunk_size'])
+                if not rows:
+                    break
+                if written + len(rows) > count:
+                    raise ArchiveError(f"{table}: more rows than counted ({count}) while exporting")
+                for (column, _), values in zip(spec, zip(*map(convert, rows))):
+                    arrays[column][written:written + len(rows)] = values
+                written += len(rows)
+        finally:
+            engine.finish_stream(conn, cursor)
+    if written != count:
+        raise ArchiveError(f"{table}: {written} rows exported, {count} counted")
+    for column, array in arrays.items():
+        array.flush()
+        _fsync(os.path.join(directory, f"{table}.{column}.npy"))
+
+def _export(engine, archive, name):
+    """Writes a partition's rows (its month, order_id up to max_order_id) to column files and moves them into place."""
+    part = archive.partitions[name]
+    params = month_bounds(part['month']) + (0, part['max_order_id'])
+    counts = [engine.query_value(query, params) for query in (
+        f"SELECT COUNT(*) FROM Orders o WHERE {_MONTH_ROWS}",
+        f"SELECT COUNT(*) FROM OrderItems oi JOIN Orders o ON o.order_id = oi.order_id WHERE {_MONTH_ROWS}")]
+    final_dir, temp_dir = archive.path(name), archive.path(name) + '.tmp'
+    for stale in (temp_dir, final_dir):    # Left by a run interrupted before the manifest said 'exported'
+        shutil.rmtree(stale, ignore_errors=True)
+    os.makedirs(temp_dir)
+    _write_columns(engine, temp_dir, 'orders', ORDER_COLUMNS, int(counts[0]),
+                   "SELECT o.order_id, o.customer_id, o.order_date, o.total_amount, o.payment_status, o.idempotency_key "
+                   f"FROM Orders o WHERE {_MONTH_ROWS} ORDER BY o.order_id", params, _order_row)
+    _write_columns(engine, temp_dir, 'items', ITEM_COLUMNS, int(counts[1]),
+                   "SELECT oi.item_id, oi.order_id, oi.product_id, oi.quantity, oi.price_at_sale, o.order_date "
+                   f"FROM OrderItems oi JOIN Orders o ON o.order_id = oi.order_id WHERE {_MONTH_ROWS} ORDER BY oi.item_id",
+                   params, _item_row)
+    os.replace(temp_dir, final_dir)
+    _fsync(archive.directory)
+
+def _save_archived_keys(engine, archive, name):
+    """Copies an archived partition's idempotency keys from its column files into ArchivedOrderKeys
+    (for partitions archived before that table existed). Keys already there are left as they are."""
+    columns = archive.columns(name, 'orders')
+    keyed = np.flatnonzero(columns['idempotency_key'] != b'')
+    query = engine.upsert_sql('ArchivedOrderKeys', ['idempotency_key'], {'order_id': 'set', 'customer_id': 'set'})
+    for offset in range(0, len(keyed), ARCHIVE_CONFIG['delete_batch']):
+        rows = [(columns['idempotency_key'][i].decode(), int(columns['order_id'][i]),
+                 None if columns['customer_id'][i] < 0 else int(columns['customer_id'][i]))
+                for i in keyed[offset:offset + ARCHIVE_CONFIG['delete_batch']]]
+        with engine.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.rollback()
+                engine.begin(conn)
+                engine.executemany(cursor, query, rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+def _delete_hot_rows(engine, archive, name):
+    """Deletes a partition's orders and their lines from the hot tables, delete_batch orders per transaction,
+    moving their idempotency keys to ArchivedOrderKeys in the same transaction. Deleting an id twice is
+    harmless, so an interrupted delete is simply run again."""
+    order_ids = archive.columns(name, 'orders')['order_id']
+    batch = ARCHIVE_CONFIG['delete_batch']
+    for offset in range(0, len(order_ids), batch):
+        ids = order_ids[offset:offset + batch].tolist()
+        marks = ', '.join(['%s'] * len(ids))
+        with engine.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.rollback()
+                engine.begin(conn)
+                # The keys outlive their orders, so a late replay of an archived sale is still recognised.
+                engine.execute(cursor, "INSERT INTO ArchivedOrderKeys (idempotency_key, order_id, customer_id) "
+                                       "SELECT idempotency_key, order_id, customer_id FROM Orders "
+                                       f"WHERE order_id IN ({marks}) AND idempotency_key IS NOT NULL", ids)
+                engine.execute(cursor, f"DELETE FROM OrderItems WHERE order_id IN ({marks})", ids)
+                engine.execute(cursor, f"DELETE FROM Orders WHERE order_id IN ({marks})", ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+def _archive_partition(engine, archive, name, log):
+    """Takes one partition from wherever it is (exporting or exported) to archived."""
+    part = archive.partitions[name]
+    if part['state'] == 'exporting':
+        start = time.perf_counter()
+        _export(engine, archive, name)
+        totals = archive.file_totals(name)
+        if not totals['orders']:
+            shutil.rmtree(archive.path(name), ignore_errors=True)
+            del archive.partitions[name]
+            archive.save_manifest()
+            return
+        min_order_id = int(archive.columns(name, 'orders')['order_id'][0])
+        expected = _db_totals(engine, part['month'], min_order_id, part['max_order_id'])
+        if totals != expected:
+            archive._mapped.pop((name, 'orders'), None)
+            archive._mapped.pop((name, 'items'), None)
+            shutil.rmtree(archive.path(name), ignore_errors=True)
+            raise ArchiveError(f"{name}: exported files {totals} do not match the database {expected}")
+        files = {file_name: _sha256(archive.path(name, file_name)) for file_name in sorted(os.listdir(archive.path(name)))}
+        part.update(totals, state='exported', min_order_id=min_order_id, files=files)
+        archive.save_manifest()
+        log(f"{name}: exported {totals['orders']} orders, {totals['items']} lines, "
+            f"₹{_money(totals['revenue_paisa'])} in {time.perf_counter() - start:.1f} s")
+    if part['state'] == 'exported':
+        problems = archive.check_files(name)
+        if problems:
+            raise ArchiveError('; '.join(problems))
+        start = time.perf_counter()
+        _delete_hot_rows(engine, archive, name)
+        part.update(state='archived', archived_at=datetime.datetime.now().isoformat(' ', 'seconds'), keys_saved=True)
+        archive.save_manifest()
+        log(f"{name}: removed from the hot tables in {time.perf_counter() - start:.1f} s")
+
+def archive_orders(engine, archive=None, before=None, log=print):
+    """Archives every month before `before` ('YYYY-MM'; default: all but the last hot_months), after
+    finishing whatever an interrupted run left half done. Returns the partitions archived."""
+    archive = archive or OrderArchive()
+    before = before or cutoff_month()
+    if before > month_of(datetime.date.today()):
+        raise ArchiveError(f"{before} has not ended yet; only closed months can be archived")
+    done = []
+    for name in sorted(archive.partitions):
+        if archive.partitions[name]['state'] == 'archived' and not archive.partitions[name].get('keys_saved'):
+            _save_archived_keys(engine, archive, name)
+            archive.partitions[name]['keys_saved'] = True
+            archive.save_manifest()
+            log(f"{name}: idempotency keys copied to ArchivedOrderKeys")
+        if archive.partitions[name]['state'] != 'archived':
+            log(f"{name}: resuming ({archive.partitions[name]['state']})")
+            _archive_partition(engine, archive, name, log)
+            done.append(name)
+    while True:
+        first = engine.query_value("SELECT MIN(order_date) FROM Orders WHERE order_date < %s", (month_bounds(before)[0],))
+        if first is None:
+            return [name for name in done if name in archive.partitions]
+        month = month_of(_as_datetime(first))
+        segments = sum(1 for part in archive.partitions.values() if part['month'] == month)
+        name = month if not segments else f"{month}~{segments + 1}"
+        max_order_id = engine.query_value("SELECT MAX(order_id) FROM Orders WHERE order_date >= %s AND order_date < %s",
+                                          month_bounds(month))
+        archive.partitions[name] = {'month': month, 'state': 'exporting', 'max_order_id': int(max_order_id)}
+        archive.save_manifest()
+        _archive_partition(engine, archive, name, log)
+        done.append(name)
+
+def verify_archive(engine, archive):
+    """Re-checks every partition: files against their checksums and the manifest's counts and sums, and
+    (once archived) that none of its orders is still in the hot tables, where it would count twice."""
+    problems = []
+    for name, part in sorted(archive.partitions.items()):
+        if part['state'] == 'exporting':
+            problems.append(f"{name}: export did not finish (run `archive run` again)")
+            continue
+        problems += archive.check_files(name)
+        if part['state'] == 'archived':
+            left = engine.query_value(f"SELECT COUNT(*) FROM Orders o WHERE {_MONTH_ROWS}",
+                                      month_bounds(part['month']) + (part['min_order_id'], part['max_order_id']))
+            if left:
+                problems.append(f"{name}: {left} archived orders are still in the hot tables")
+    return problems
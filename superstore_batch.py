@@ -0,0 +1,112 @@
+"""Order files for the Super Store CLI's batch billing mode.
+
+Scanner-driven front ends and test replays hand the till whole orders instead of keystrokes.
+Orders are read as JSON Lines (one order per line) or CSV (one order line per row), from a file
+or stdin, and streamed: only the order being read is held in memory.
+
+    python superstore_cli.py batch orders.jsonl --results results.jsonl
+    python superstore_cli.py batch day.csv --workers 8 --group-commit
+    cat orders.jsonl | python superstore_cli.py batch - > results.jsonl
+
+JSONL: {"ref": "A-1", "name": "Asha", "mobile": "9876543210", "email": null,
+        "lines": [{"product_id": 1, "quantity": 2}, {"product_id": 4, "quantity": 1}]}
+CSV:   ref,name,mobile,email,product_id,quantity - consecutive rows with the same ref are one
+       order (the customer columns are read from its first row); without a ref column every
+       row is an order of its own.
+
+"ref" is echoed into the results; an optional "key" is used as the order's idempotency key,
+so a retried file does not sell the same order twice.
+"""
+import contextlib
+import csv
+import json
+import sys
+
+ORDER_COLUMN_ALIASES = {'order': 'ref', 'order_ref': 'ref', 'phone': 'mobile', 'mobile_number': 'mobile',
+                        'customer': 'name', 'customer_name': 'name', 'product': 'product_id', 'qty': 'quantity',
+                        'items': 'lines', 'idempotency_key': 'key'}
+
+def detect_format(path, fmt=None):
+    """'csv' or 'jsonl', from an explicit choice or the file extension (stdin defaults to JSONL)."""
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+def open_stream(path, mode):
+    """Opens a file, or stdin/stdout (left open) for '-'."""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if 'r' in mode else sys.stdout)
+    return open(path, mode, encoding='utf-8', newline='')
+
+def _column(key):
+    key = str(key).strip().lower()
+    return ORDER_COLUMN_ALIASES.get(key, key)
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+def _order(line_no, fields, lines):
+    return {'line': line_no, 'ref': _text(fields.get('ref')) or None, 'name': _text(fields.get('name')),
+            'mobile': _text(fields.get('mobile')), 'email': _text(fields.get('email')) or None,
+            'key': _text(fields.get('key')) or None, 'lines': lines}
+
+def _line(raw):
+    """One order line as (product_id, quantity), or raises ValueError."""
+    product_id, quantity = _text(raw.get('product_id')), _text(raw.get('quantity', 1))
+    if not product_id.isdigit():
+        raise ValueError(f"Invalid Item Number: {product_id or '(missing)'}")
+    if not quantity.lstrip('-').isdigit() or int(quantity) <= 0:
+        raise ValueError(f"Quantity must be a positive whole number (got {quantity or 'nothing'}) for item {product_id}")
+    return int(product_id), int(quantity)
+
+def read_orders(stream, fmt):
+    """Yields (order, error) per order: order is {'line', 'ref', 'name', 'mobile', 'email', 'key',
+    'lines': [(product_id, quantity), ...]}; when error is set the order could not be read (it may be
+    None, or partial so its ref can still be reported)."""
+    if fmt == 'jsonl':
+        for line_no, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                raw = json.loads(text)
+            except ValueError as err:
+                yield {'line': line_no, 'ref': None}, f"Invalid JSON ({err})"
+                continue
+            if not isinstance(raw, dict):
+                yield {'line': line_no, 'ref': None}, "Expected a JSON object"
+                continue
+            fields = {_column(key): value for key, value in raw.items()}
+            order = _order(line_no, fields, [])
+            raw_lines = fields.get('lines')
+            if not isinstance(raw_lines, list) or not raw_lines:
+                yield order, "Order has no lines"
+                continue
+            try:
+                order['lines'] = [_line({_column(key): value for key, value in item.items()}) for item in raw_lines]
+            except (AttributeError, ValueError) as err:
+                yield order, str(err) if isinstance(err, ValueError) else "Order lines must be JSON objects"
+                continue
+            yield order, None
+        return
+
+    reader = csv.reader(stream)
+    header = [_column(key) for key in next(reader, [])]
+    grouped = 'ref' in header
+    order, error = None, None
+    for values in reader:
+        if not any(values):
+            continue
+        fields = dict(zip(header, values))
+        if order is not None and (not grouped or _text(fields.get('ref')) != order['ref']):
+            yield order, error
+            order = None
+        if order is None:
+            # reader.line_num is the physical line the row ended on (the header is line 1).
+            order, error = _order(reader.line_num, fields, []), None
+        if error is None:
+            try:
+                order['lines'].append(_line(fields))
+            except ValueError as err:
+                error = f"line {reader.line_num}: {err}"
+    if order is not None:
+        yield order, error
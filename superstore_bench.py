@@ -0,0 +1,777 @@
+"""Benchmarks for the Super Store CLI hot paths.
+
+The benchmarks add BENCH- products and write real orders, so run them against a scratch
+database: either point superstore_engines.DB_CONFIG at one, or use the embedded SQLite engine:
+
+    python superstore_bench.py checkout --iterations 50
+    python superstore_bench.py --backend sqlite --sqlite-path bench.db checkout
+
+With --backend sqlite and no --sqlite-path a throwaway database file is created, which is how
+the concurrent load generator runs in CI-like environments:
+
+    python superstore_bench.py --backend sqlite load --cashiers 16 --duration 30
+
+With cart-time stock reservations, so shortfalls surface while the basket is keyed in, not at checkout:
+
+    python superstore_bench.py --backend sqlite load --cashiers 16 --stock 200 --reserve
+
+The same load with group commit off and then at several window / group-size settings:
+
+    python superstore_bench.py --backend sqlite group --cashiers 32 --windows 1 5 10 --max-orders 8 32
+
+Micro-benchmarks that need no database at all:
+
+    python superstore_bench.py lookup --products 100000
+    python superstore_bench.py cart --lines 10000
+
+Bulk catalogue import/export of 1M synthetic products:
+
+    python superstore_bench.py --backend sqlite import --products 1000000
+
+The analytical report benchmark seeds 10M order lines by default (needs NumPy):
+
+    python superstore_bench.py --backend sqlite --sqlite-path report.db report
+    python superstore_bench.py --backend sqlite --sqlite-path report.db report --skip-seed --chunk-size 50000
+
+Then with every month but the current one moved to the cold order archive (a scratch directory):
+
+    python superstore_bench.py --backend sqlite --sqlite-path report.db report --skip-seed --archive
+
+Storing 1M receipts in a scratch receipt store and timing reprint lookups (no database needed):
+
+    python superstore_bench.py receipts --receipts 1000000
+"""
+import argparse
+import atexit
+import csv
+import datetime
+import decimal
+import json
+import random
+import resource
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import superstore_archive as archive
+import superstore_catalog as catalog
+import superstore_receipts as receipts
+import superstore_reports as reports
+from superstore_cache import ProductIndex
+from superstore_cart import Cart, InsufficientStockError, to_money
+from superstore_engines import CHECKOUT_CONFIG, DB_ERRORS, INTEGRITY_ERRORS, STORAGE_CONFIG, STORAGE_ENGINES, SQLiteEngine
+from superstore_metrics import METRICS, format_metrics
+from superstore_pool import DB_POOL_CONFIG, PoolTimeoutError
+
+BENCH_PRODUCT_PREFIX = 'BENCH-'
+BENCH_STOCK = 1_000_000_000     # Large enough that benchmark orders never run out of stock
+BENCH_MOBILE = '9000000000'
+
+# ------------------------------------------------------------------------------
+# HELPERS
+# ------------------------------------------------------------------------------
+
+def make_engine(args, pool_size=None):
+    """Builds the storage engine selected on the command line."""
+    pool_config = dict(DB_POOL_CONFIG)
+    if pool_size:
+        pool_config['pool_size'] = pool_size
+    if args.backend == 'sqlite':
+        path = args.sqlite_path
+        if not path:
+            scratch_dir = tempfile.mkdtemp(prefix='superstore-bench-')
+            atexit.register(shutil.rmtree, scratch_dir, ignore_errors=True)
+            path = f"{scratch_dir}/bench.db"
+        return SQLiteEngine(path, pool_config=pool_config)
+    return STORAGE_ENGINES[args.backend](pool_config=pool_config)
+
+def seed_bench_products(engine, count, stock=BENCH_STOCK):
+    """Makes sure `count` benchmark products exist and returns them as order-line templates."""
+    names = [f"{BENCH_PRODUCT_PREFIX}{i:06d}" for i in range(count)]
+    existing = {row['name'] for row in engine.query_all("SELECT name FROM Inventory WHERE name LIKE %s",
+                                                         (BENCH_PRODUCT_PREFIX + '%',))}
+    with engine.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            engine.executemany(cursor, "INSERT INTO Inventory (name, price, stock_quantity) VALUES (%s, %s, %s)",
+                               [(name, 10.0 + i % 90, stock) for i, name in enumerate(names) if name not in existing])
+            # Reset the stock in case earlier runs used a lot of it.
+            engine.execute(cursor, "UPDATE Inventory SET stock_quantity = %s WHERE name LIKE %s",
+                           (stock, BENCH_PRODUCT_PREFIX + '%'))
+            conn.commit()
+        finally:
+            cursor.close()
+    engine.inventory_cache.invalidate()
+    rows = engine.query_all("SELECT product_id, name, price FROM Inventory WHERE name LIKE %s ORDER BY product_id LIMIT %s",
+                            (BENCH_PRODUCT_PREFIX + '%', count))
+    return [{'product_id': row['product_id'], 'name': row['name'], 'price': row['price']} for row in rows]
+
+def make_order(products, lines, quantity=1):
+    """Builds an order_list with `lines` distinct products; returns (order_list, total)."""
+    cart = Cart()
+    for product in products[:lines]:
+        cart.add(product, quantity)
+    return cart.lines(), cart.total
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+def summarize(label, samples):
+    """Prints mean / p50 / p95 latency in milliseconds."""
+    samples = sorted(samples)
+    p95 = percentile(samples, 0.95)
+    print(f"{label:<28} n={len(samples):<5} mean={statistics.mean(samples) * 1000:8.2f} ms  "
+          f"p50={statistics.median(samples) * 1000:8.2f} ms  p95={p95 * 1000:8.2f} ms")
+
+# ------------------------------------------------------------------------------
+# CHECKOUT: PER-ROW VS BATCHED
+# ------------------------------------------------------------------------------
+
+def bench_checkout(engine, order_list, total_amount, iterations, batched):
+    """Times `iterations` complete checkouts of the same order."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        engine.checkout(order_list, total_amount, 'Bench Customer', BENCH_MOBILE, batched=batched)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def run_checkout_benchmark(args):
+    engine = make_engine(args)
+    try:
+        products = seed_bench_products(engine, max(args.lines))
+        print("--- CHECKOUT: PER-ROW VS BATCHED ---")
+        for lines in args.lines:
+            order_list, total = make_order(products, lines)
+            for batched in (False, True):
+                label = f"{lines:>4} lines {'batched' if batched else 'per-row'}"
+                bench_checkout(engine, order_list, total, args.warmup, batched)
+                summarize(label, bench_checkout(engine, order_list, total, args.iterations, batched))
+    finally:
+        engine.close()
+
+# ------------------------------------------------------------------------------
+# CONCURRENT MULTI-CASHIER LOAD
+# ------------------------------------------------------------------------------
+
+class Cashier(threading.Thread):
+    """One simulated till: redraws the inventory, builds a basket and checks it out, headlessly."""
+
+    def __init__(self, engine, products, weights, args, seed, stop_at, results):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.products = products
+        self.cum_weights = weights      # Cumulative Zipf weights: low product indexes are the hot SKUs
+        self.args = args
+        self.rng = random.Random(seed)
+        self.stop_at = stop_at
+        self.results = results          # Shared list of (latency_seconds, outcome); list.append is thread-safe
+        self.refused_lines = 0          # Basket lines not added because their reservation was refused (--reserve)
+
+    def basket(self):
+        # Basket sizes are roughly geometric: most customers buy a few items, a long tail buys many.
+        size = min(self.args.max_basket, 1 + int(self.rng.expovariate(1 / max(self.args.basket_mean - 1, 0.001))))
+        cart = Cart()
+        for product in self.rng.choices(self.products, cum_weights=self.cum_weights, k=size):
+            cart.add(product, self.rng.randint(1, 3))
+        return cart
+
+    def run(self):
+        while time.monotonic() < self.stop_at:
+            self.engine.list_inventory()        # The billing screen redraw before the cashier keys items in
+            cart = self.basket()
+            cart_id = None
+            if self.args.reserve:
+                # Keyed in line by line: each line reserves its units, and a refused line stays off the bill.
+                cart_id = cart.cart_id
+                for line in cart.lines():
+                    if not self.reserve(cart_id, line):
+                        cart.remove(line.product_id)
+                if not cart:
+                    continue
+            mobile = f"8{self.rng.randrange(self.args.customers):09d}"
+            start = time.perf_counter()
+            try:
+                self.engine.checkout(cart.lines(), cart.total, 'Load Customer', mobile, cart_id=cart_id)
+                outcome = 'committed'
+            except InsufficientStockError:
+                outcome = 'insufficient_stock'
+            except INTEGRITY_ERRORS:
+                outcome = 'integrity_error'     # e.g. two tills inserting the same new customer mobile
+            except DB_ERRORS as err:
+                text = str(err).lower()
+                outcome = 'deadlock' if 'deadlock' in text else 'lock_timeout' if 'lock' in text else 'db_error'
+            except PoolTimeoutError:
+                outcome = 'pool_timeout'
+            self.results.append((time.perf_counter() - start, outcome))
+            if cart_id and outcome != 'committed':
+                self.engine.release_reservations(cart_id)
+            if self.args.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.args.think_time))
+
+    def reserve(self, cart_id, line):
+        try:
+            self.engine.reserve_stock(cart_id, line['product_id'], line['quantity'])
+            return True
+        except InsufficientStockError:
+            self.refused_lines += 1
+            return False
+
+def restocker(engine, products, args, stop_at):
+    """Manager thread: periodically tops up the hottest SKUs through the normal restock path."""
+    while time.monotonic() < stop_at:
+        time.sleep(args.restock_every)
+        for product in products[:10]:
+            engine.restock(product['product_id'], args.restock_qty)
+
+def zipf_weights(count, skew):
+    """Cumulative Zipf weights for `count` products ranked by popularity."""
+    weights, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank ** skew
+        weights.append(total)
+    return weights
+
+def measure_load(engine, products, weights, args):
+    """Runs the cashier threads for args.duration seconds; returns the raw figures of the run."""
+    results = []
+    lock_wait_before = engine.lock_wait_seconds()
+    pool_wait_before = engine.pool.stats['wait_time_total']
+    stop_at = time.monotonic() + args.duration
+    threads = [Cashier(engine, products, weights, args, args.seed + i, stop_at, results) for i in range(args.cashiers)]
+    if args.restock_every:
+        threads.append(threading.Thread(target=restocker, args=(engine, products, args, stop_at), daemon=True))
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    lock_wait_after = engine.lock_wait_seconds()
+    outcomes = {}
+    refused_lines = sum(thread.refused_lines for thread in threads if isinstance(thread, Cashier))
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        'elapsed': elapsed,
+        'attempted': len(results),
+        'committed': outcomes.get('committed', 0),
+        'outcomes': outcomes,
+        'latencies': sorted(latency for latency, _ in results),
+        'lock_wait': (lock_wait_after - lock_wait_before) if lock_wait_before is not None and lock_wait_after is not None else None,
+        'pool_wait': engine.pool.stats['wait_time_total'] - pool_wait_before,
+        'refused_lines': refused_lines,
+    }
+
+def apply_group_commit(engine, enabled, window_ms=None, max_orders=None):
+    """Switches group commit on or off for the next checkouts (a fresh committer picks up new settings)."""
+    CHECKOUT_CONFIG['group_commit'] = enabled
+    if window_ms is not None:
+        CHECKOUT_CONFIG['group_window_ms'] = window_ms
+    if max_orders is not None:
+        CHECKOUT_CONFIG['group_max_orders'] = max_orders
+    engine._group_committer = None
+
+def run_load_benchmark(args):
+    engine = make_engine(args, pool_size=args.pool_size or args.cashiers)
+    try:
+        products = seed_bench_products(engine, args.products, stock=args.stock)
+        apply_group_commit(engine, args.group_commit, args.group_window_ms, args.group_max_orders)
+        METRICS.reset()    # Report only the load phase, not the seeding
+        run = measure_load(engine, products, zipf_weights(len(products), args.skew), args)
+        latencies, attempted, committed = run['latencies'], run['attempted'], run['committed']
+
+        group = (f", group commit {CHECKOUT_CONFIG['group_window_ms']} ms / {CHECKOUT_CONFIG['group_max_orders']} orders"
+                 if args.group_commit else "")
+        print(f"--- LOAD: {args.cashiers} cashiers, {args.duration}s, {args.products} SKUs (skew {args.skew}), "
+              f"{engine.name} backend{group} ---")
+        print(f"Checkouts attempted : {attempted}")
+        print(f"Throughput          : {committed / run['elapsed']:.1f} committed orders/s")
+        print(f"Latency             : p50={percentile(latencies, 0.50) * 1000:.2f} ms  "
+              f"p95={percentile(latencies, 0.95) * 1000:.2f} ms  p99={percentile(latencies, 0.99) * 1000:.2f} ms")
+        print(f"Rollback rate       : {(attempted - committed) / attempted * 100 if attempted else 0.0:.2f}%  "
+              + '  '.join(f"{name}={count}" for name, count in sorted(run['outcomes'].items()) if name != 'committed'))
+        if run['lock_wait'] is not None:
+            print(f"DB lock wait        : {run['lock_wait']:.3f} s total, "
+                  f"{run['lock_wait'] / attempted * 1000 if attempted else 0.0:.2f} ms per checkout")
+        print(f"Pool wait           : {run['pool_wait']:.3f} s total")
+        if args.reserve:
+            stats = engine.reservations.stats
+            print(f"Reservations        : {stats['direct']} from stock, {stats['from_allotment']} from {stats['allotments']} "
+                  f"hot-SKU allotments, {run['refused_lines']} basket lines refused at the shelf")
+        if engine._group_committer:
+            stats = engine._group_committer.stats
+            print(f"Groups              : {stats['groups']} committed, {stats['orders'] / stats['groups'] if stats['groups'] else 0:.1f} "
+                  f"orders per group (largest {stats['largest']}), {stats['fallbacks']} fell back to single checkouts")
+        if args.metrics:
+            print("\n--- PER-OPERATION LATENCY ---")
+            print(format_metrics(METRICS.snapshot()))
+    finally:
+        engine.close()
+
+def run_group_benchmark(args):
+    """The load benchmark with group commit off, then at every window x group size combination."""
+    engine = make_engine(args, pool_size=args.pool_size or args.cashiers)
+    try:
+        settings = [(False, None, None)] + [(True, window, size) for window in args.windows for size in args.max_orders]
+        print(f"--- GROUP COMMIT: {args.cashiers} cashiers, {args.duration}s per setting, {args.products} SKUs, "
+              f"{engine.name} backend ---")
+        print(f"{'setting':<20} {'orders/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'per group':>9} {'failed':>7}")
+        for enabled, window, size in settings:
+            products = seed_bench_products(engine, args.products, stock=args.stock)    # Same starting stock every run
+            apply_group_commit(engine, enabled, window, size)
+            run = measure_load(engine, products, zipf_weights(len(products), args.skew), args)
+            latencies = run['latencies']
+            stats = engine._group_committer.stats if engine._group_committer else None
+            per_group = f"{stats['orders'] / stats['groups']:.1f}" if stats and stats['groups'] else '-'
+            label = f"{window:g} ms x {size}" if enabled else "off"
+            print(f"{label:<20} {run['committed'] / run['elapsed']:>9.1f} {percentile(latencies, 0.50) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.95) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+                  f"{per_group:>9} {run['attempted'] - run['committed']:>7}")
+    finally:
+        apply_group_commit(engine, False)
+        engine.close()
+
+# ------------------------------------------------------------------------------
+# PRODUCT LOOKUP INDEX (NO DATABASE)
+# ------------------------------------------------------------------------------
+
+LOOKUP_BRANDS = ['Amul', 'Britannia', 'Cadbury', 'Dabur', 'Haldiram', 'Lays', 'Maggi', 'Nestle', 'Parle',
+                 'Patanjali', 'Pepsi', 'Sunfeast', 'SurfExcel', 'Tata', 'Colgate', 'Dettol', 'Lifebuoy', 'Kissan']
+LOOKUP_ITEMS = ['Noodles', 'Biscuit', 'Chocolate', 'Detergent', 'Shampoo', 'Toothpaste', 'Soap', 'Ketchup',
+                'Juice', 'Chips', 'Namkeen', 'Tea', 'Coffee', 'Butter', 'Cheese', 'Milk', 'Atta', 'Rice', 'Dal', 'Salt']
+LOOKUP_SIZES = ['50g', '100g', '200g', '500g', '1kg', '2kg', '250ml', '500ml', '1L', 'Pack of 6', 'Family Pack']
+
+def synthetic_catalog(count, seed=1):
+    """Realistic-looking product rows: '<Brand> <Item> <Variant> <Size>' with EAN-13 style barcodes."""
+    rng = random.Random(seed)
+    rows = []
+    for product_id in range(1, count + 1):
+        name = (f"{rng.choice(LOOKUP_BRANDS)} {rng.choice(LOOKUP_ITEMS)} V{product_id:06d} {rng.choice(LOOKUP_SIZES)}")
+        rows.append({'product_id': product_id, 'name': name, 'price': float(rng.randint(5, 500)),
+                     'stock_quantity': rng.randint(0, 500), 'barcode': f"890{product_id:010d}"})
+    return rows
+
+def typo(word, rng):
+    """Applies one random edit (the kind of slip a cashier makes)."""
+    i = rng.randrange(len(word))
+    edit = rng.choice(['delete', 'replace', 'swap', 'insert'])
+    if edit == 'delete':
+        return word[:i] + word[i + 1:]
+    if edit == 'replace':
+        return word[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + word[i + 1:]
+    if edit == 'swap' and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + word[i:]
+
+def time_lookups(label, func, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    p99 = percentile(samples, 0.99)
+    print(f"{label:<28} n={len(samples):<6} p50={percentile(samples, 0.5) * 1e6:8.1f} us  "
+          f"p99={p99 * 1e6:8.1f} us  max={samples[-1] * 1e6:8.1f} us  {'OK' if p99 < 0.001 else 'OVER 1 ms'}")
+
+def run_lookup_benchmark(args):
+    rng = random.Random(args.seed)
+    rows = synthetic_catalog(args.products, args.seed)
+
+    index = ProductIndex()
+    start = time.perf_counter()
+    index.apply(rows, full_load=True)
+    print(f"--- LOOKUP: {args.products} products, index built in {time.perf_counter() - start:.2f} s ---")
+
+    sample = [rng.choice(rows) for _ in range(args.queries)]
+    time_lookups("barcode (exact)", index.by_barcode, [row['barcode'] for row in sample])
+    time_lookups("name prefix (autocomplete)", index.autocomplete,
+                 [row['name'][:rng.randint(3, 12)] for row in sample])
+    time_lookups("word prefix (autocomplete)", index.autocomplete,
+                 [row['name'].split()[1][:rng.randint(3, 6)] for row in sample])
+    time_lookups("fuzzy (one typo per word)", index.fuzzy,
+                 [' '.join(typo(word, rng) if len(word) >= 5 else word for word in row['name'].split()[:3])
+                  for row in sample])
+
+    # Incremental maintenance (new and renamed products, as delta refreshes deliver them), then a new
+    # product that must be findable immediately.
+    new_rows = synthetic_catalog(args.products + 1000, args.seed + 1)[args.products:]
+    renamed = [dict(row, name=f"{row['name']} Refill", barcode=None) for row in sample[:1000]]
+    time_lookups("incremental upsert", index.upsert, new_rows + renamed)
+    index.upsert({'product_id': args.products + 1001, 'name': 'Zzyzx Special Blend Tea 250g', 'price': 99.0,
+                  'stock_quantity': 5, 'barcode': '8909999999999'})
+    print(f"new product found by prefix: {bool(index.autocomplete('zzyzx'))}, by typo: {bool(index.fuzzy('zzyxz'))}")
+
+# ------------------------------------------------------------------------------
+# CART: LIST SCAN VS INDEXED CART (NO DATABASE)
+# ------------------------------------------------------------------------------
+
+class ListCart:
+    """The billing portal's old cart: a list of dicts, consolidated by linear scan, with float money."""
+
+    def __init__(self):
+        self.order_list = []
+        self.total = 0.0
+
+    def add(self, product, quantity):
+        subtotal = product['price'] * quantity
+        self.total += subtotal
+        for existing_item in self.order_list:
+            if existing_item['product_id'] == product['product_id']:
+                existing_item['quantity'] += quantity
+                existing_item['subtotal'] += subtotal
+                return
+        self.order_list.append({'product_id': product['product_id'], 'name': product['name'], 'quantity': quantity,
+                                'price': product['price'], 'subtotal': subtotal})
+
+    def remove(self, product_id):
+        for i, item in enumerate(self.order_list):
+            if item['product_id'] == product_id:
+                self.total -= item['subtotal']
+                del self.order_list[i]
+                return
+
+def cart_workload(lines, merge_share, remove_share, seed):
+    """A wholesale order being keyed in: `lines` distinct products (prices with paise), some scanned
+    again (merges), then some lines taken off. Returns (products, [(op, product_index, quantity)])."""
+    rng = random.Random(seed)
+    products = [{'product_id': product_id, 'name': f"Wholesale item {product_id}",
+                 'price': to_money(f"{rng.randint(100, 99_999) / 100:.2f}")} for product_id in range(1, lines + 1)]
+    ops = [('add', i, rng.randint(1, 24)) for i in range(lines)]
+    for _ in range(int(lines * merge_share)):
+        ops.insert(rng.randrange(len(ops) + 1), ('add', rng.randrange(lines), rng.randint(1, 24)))
+    ops.extend(('remove', i, None) for i in rng.sample(range(lines), int(lines * remove_share)))
+    return products, ops
+
+def run_cart_benchmark(args):
+    products, ops = cart_workload(args.lines, args.merge_share, args.remove_share, args.seed)
+    float_products = [dict(product, price=float(product['price'])) for product in products]   # As the old cache served them
+    print(f"--- CART: {args.lines} lines, {len(ops)} operations ({args.merge_share:.0%} re-scans, "
+          f"{args.remove_share:.0%} lines removed) ---")
+
+    timings = {}
+    for label, cart, catalogue in (("list + float (old)", ListCart(), float_products), ("Cart + Decimal", Cart(), products)):
+        start = time.perf_counter()
+        for op, i, quantity in ops:
+            if op == 'add':
+                cart.add(catalogue[i], quantity)
+            else:
+                cart.remove(catalogue[i]['product_id'])
+        timings[label] = elapsed = time.perf_counter() - start
+        print(f"{label:<22} {elapsed * 1000:10.1f} ms  {elapsed / len(ops) * 1e6:8.2f} us/op  total=₹{cart.total:.2f}")
+        if isinstance(cart, Cart):
+            exact = sum((line.subtotal for line in cart), to_money(0))
+            print(f"{'':<22} running total matches a full re-sum: {cart.total == exact}")
+        else:
+            exact_old = sum(to_money(repr(item['price'])) * item['quantity'] for item in cart.order_list)
+            print(f"{'':<22} float total drift vs exact: ₹{abs(to_money(0) + decimal.Decimal(cart.total) - exact_old):.10f}"
+                  f" (stored as ₹{to_money(cart.total)})")
+    print(f"Speed-up: {timings['list + float (old)'] / timings['Cart + Decimal']:.0f}x")
+
+    if args.checkout:
+        engine = make_engine(args)
+        try:
+            seeded = seed_bench_products(engine, args.lines)
+            cart = Cart()
+            for product in seeded:
+                cart.add(product, 1)
+            start = time.perf_counter()
+            order_id, _ = engine.checkout(cart.lines(), cart.total, 'Bench Customer', BENCH_MOBILE)
+            stored = engine.query_value("SELECT total_amount FROM Orders WHERE order_id = %s", (order_id,))
+            print(f"Checkout of {len(cart)} lines: {(time.perf_counter() - start) * 1000:.1f} ms, "
+                  f"stored total ₹{stored} (cart ₹{cart.total})")
+        finally:
+            engine.close()
+
+# ------------------------------------------------------------------------------
+# ANALYTICAL REPORTS OVER MANY ORDER LINES
+# ------------------------------------------------------------------------------
+
+def seed_report_dataset(engine, lines, products, days, seed, batch_orders=50_000):
+    """Writes about `lines` synthetic order lines (Zipf-popular products, ~4 lines per order) spread over
+    the last `days` days, straight into Orders/OrderItems, then rebuilds the sales rollups."""
+    np = reports.np
+    rng = np.random.default_rng(seed)
+    catalogue = seed_bench_products(engine, products)
+    product_ids = np.array([row['product_id'] for row in catalogue])
+    prices = np.array([row['price'] for row in catalogue], dtype=np.float64)   # Analytics only; orders keep exact DECIMALs
+    weights = 1.0 / np.arange(1, len(catalogue) + 1) ** 1.1
+    weights /= weights.sum()
+    now = np.datetime64(datetime.datetime.now().replace(microsecond=0), 's')
+    next_order = (engine.query_value("SELECT MAX(order_id) FROM Orders") or 0) + 1
+
+    written = 0
+    while written < lines:
+        basket = rng.poisson(3.0, batch_orders) + 1
+        basket = basket[:np.searchsorted(np.cumsum(basket), lines - written, side='right') + 1]
+        order_ids = np.arange(next_order, next_order + len(basket))
+        line_orders = np.repeat(order_ids, basket)[:lines - written]
+        picks = rng.choice(len(catalogue), size=len(line_orders), p=weights)
+        quantities = rng.integers(1, 4, len(line_orders))
+        totals = np.bincount(line_orders - next_order, weights=quantities * prices[picks], minlength=len(order_ids))
+        dates = np.char.replace((now - rng.integers(0, days * 86400, len(order_ids))).astype(str), 'T', ' ')
+
+        with engine.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                engine.executemany(cursor, "INSERT INTO Orders (order_id, order_date, total_amount) VALUES (%s, %s, %s)",
+                                   zip(order_ids.tolist(), dates.tolist(), np.round(totals, 2).tolist()))
+                engine.executemany(cursor, "INSERT INTO OrderItems (order_id, product_id, quantity, price_at_sale) "
+                                   "VALUES (%s, %s, %s, %s)",
+                                   zip(line_orders.tolist(), product_ids[picks].tolist(), quantities.tolist(),
+                                       prices[picks].tolist()))
+                conn.commit()
+            finally:
+                cursor.close()
+        written += len(line_orders)
+        next_order += len(order_ids)
+        print(f"\r  seeded {written:,} / {lines:,} lines", end='', flush=True)
+    print()
+    start = time.perf_counter()
+    engine.rebuild_rollups()
+    print(f"  rollups rebuilt in {time.perf_counter() - start:.1f} s")
+
+def time_reports(engine, chunk_size, label=None):
+    lines = engine.query_value("SELECT COUNT(*) FROM OrderItems")
+    today = datetime.date.today()
+    ranges = [("all time", None, None), ("last 7 days", today - datetime.timedelta(days=6), today)]
+    print(f"--- REPORT: {lines:,} order lines in the hot tables, chunk size {chunk_size:,}{f' ({label})' if label else ''} ---")
+    for name, start_day, end_day in ranges:
+        start = time.perf_counter()
+        report = reports.ReportingEngine(engine, chunk_size).report(start_day, end_day)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14} {report['lines']:>11,} lines in {elapsed:7.2f} s  "
+              f"({report['lines'] / elapsed:>12,.0f} lines/s)  top seller: {report['top_by_revenue'][0]['name'] if report['top_by_revenue'] else '-'}")
+
+def run_report_benchmark(args):
+    if reports.np is None:
+        raise SystemExit("The report benchmark needs NumPy (pip install numpy).")
+    engine = make_engine(args)
+    try:
+        if not args.skip_seed:
+            print(f"--- REPORT: seeding {args.lines:,} order lines over {args.days} days ---")
+            start = time.perf_counter()
+            seed_report_dataset(engine, args.lines, args.products, args.days, args.seed)
+            print(f"  seeded in {time.perf_counter() - start:.1f} s")
+        if args.archive:
+            scratch_dir = tempfile.mkdtemp(prefix='superstore-archive-')
+            atexit.register(shutil.rmtree, scratch_dir, ignore_errors=True)
+            archive.ARCHIVE_CONFIG['directory'] = scratch_dir
+            time_reports(engine, args.chunk_size, "hot tables only")
+            start = time.perf_counter()
+            names = archive.archive_orders(engine, before=archive.cutoff_month(1), log=lambda message: None)
+            print(f"--- ARCHIVE: {len(names)} months archived in {time.perf_counter() - start:.1f} s ---")
+            start = time.perf_counter()
+            problems = engine.check_rollups()
+            print(f"  rollups check over hot + archive: {'OK' if not problems else problems[:3]} "
+                  f"({time.perf_counter() - start:.1f} s)")
+        time_reports(engine, args.chunk_size, "hot + archive" if args.archive else None)
+        # Linux reports ru_maxrss in KiB.
+        print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+    finally:
+        engine.close()
+
+# ------------------------------------------------------------------------------
+# BULK CATALOG IMPORT / EXPORT
+# ------------------------------------------------------------------------------
+
+def run_import_benchmark(args):
+    scratch_dir = tempfile.mkdtemp(prefix='superstore-import-')
+    atexit.register(shutil.rmtree, scratch_dir, ignore_errors=True)
+    source = f"{scratch_dir}/catalog.{args.format}"
+    with open(source, 'w', encoding='utf-8', newline='') as out:
+        if args.format == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(['name', 'price', 'stock_quantity', 'barcode'])
+            writer.writerows((row['name'], row['price'], row['stock_quantity'], row['barcode'])
+                             for row in synthetic_catalog(args.products, args.seed))
+        else:
+            for row in synthetic_catalog(args.products, args.seed):
+                out.write(json.dumps({key: row[key] for key in ('name', 'price', 'stock_quantity', 'barcode')}) + '\n')
+
+    engine = make_engine(args)
+    try:
+        print(f"--- CATALOG: {args.products:,} products ({args.format}), batch size {args.batch_size:,} ---")
+        for label, stock_mode in (("import (new rows)", 'set'), ("re-import (restock)", 'add')):
+            start = time.perf_counter()
+            summary = catalog.import_catalog(engine, source, batch_size=args.batch_size, stock_mode=stock_mode)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<22} {elapsed:7.2f} s  {summary['rows'] / elapsed:>10,.0f} rows/s  "
+                  f"inserted={summary['inserted']:,} updated={summary['updated']:,} rejected={summary['errors']:,}")
+        start = time.perf_counter()
+        count = catalog.export_catalog(engine, f"{scratch_dir}/export.{args.format}")
+        elapsed = time.perf_counter() - start
+        print(f"{'export':<22} {elapsed:7.2f} s  {count / elapsed:>10,.0f} rows/s")
+    finally:
+        engine.close()
+
+# ------------------------------------------------------------------------------
+# RECEIPT STORE
+# ------------------------------------------------------------------------------
+
+def synthetic_sales(count, customers, seed=1):
+    """`count` sales, one every 5 seconds up to now, drawn from a pool of 1-12 line baskets and `customers` mobiles."""
+    rng = random.Random(seed)
+    catalogue = synthetic_catalog(500, seed)
+    baskets = []
+    for _ in range(1000):
+        cart = Cart()
+        for product in rng.sample(catalogue, rng.randint(1, 12)):
+            cart.add(product, rng.randint(1, 5))
+        baskets.append((cart.lines(), cart.total))
+    start = datetime.datetime.now() - datetime.timedelta(seconds=5 * count)
+    for order_id in range(1, count + 1):
+        lines, total = rng.choice(baskets)
+        yield receipts.Sale(order_id, lines, total, f"9{rng.randrange(customers):09d}", "Bench Customer",
+                            start + datetime.timedelta(seconds=5 * order_id))
+
+def run_receipt_benchmark(args):
+    scratch_dir = tempfile.mkdtemp(prefix='superstore-receipts-')
+    atexit.register(shutil.rmtree, scratch_dir, ignore_errors=True)
+    print(f"--- RECEIPTS: {args.receipts:,} receipts, {args.customers:,} customers, "
+          f"compression {'on' if not args.no_compress else 'off'} ---")
+
+    # One receipt per append, as the till stores them, on a sample of the sales. The tail of the
+    # latencies shows whether a checkout ever waits behind index maintenance (seals, run merges).
+    single = receipts.ReceiptStore(f"{scratch_dir}/single", compress=not args.no_compress)
+    sample = list(synthetic_sales(min(args.receipts, 20_000), args.customers, args.seed))
+    start = time.perf_counter()
+    time_lookups("one at a time (till)", lambda sale: single.append([sale], [receipts.render_receipt(sale)]), sample)
+    per_receipt = (time.perf_counter() - start) / len(sample)
+    single.close()
+    print(f"{'':<28} {1 / per_receipt:>10,.0f} receipts/s")
+
+    # All of them in batches rendered in one pass, as the batch billing mode stores them
+    store_ = receipts.ReceiptStore(f"{scratch_dir}/batched", compress=not args.no_compress)
+    raw_bytes, batch = 0, []
+    start = time.perf_counter()
+    for sale in synthetic_sales(args.receipts, args.customers, args.seed):
+        batch.append(sale)
+        if len(batch) >= args.batch_size:
+            texts = receipts.render_receipts(batch)
+            raw_bytes += sum(len(text.encode('utf-8')) for text in texts)
+            store_.append(batch, texts)
+            batch = []
+    if batch:
+        texts = receipts.render_receipts(batch)
+        raw_bytes += sum(len(text.encode('utf-8')) for text in texts)
+        store_.append(batch, texts)
+    elapsed = time.perf_counter() - start
+    stats = store_.stats()
+    print(f"{f'batches of {args.batch_size}':<28} {args.receipts / elapsed:>10,.0f} receipts/s  ({elapsed:.1f} s, "
+          f"sale generation included)")
+    print(f"{'size':<28} {stats['data_bytes'] / args.receipts:>10.0f} bytes/receipt stored ({raw_bytes / args.receipts:.0f} rendered) "
+          f"+ {stats['index_bytes'] / args.receipts:.0f} bytes of index | {stats['runs']} runs, {stats['unsorted']} unsorted")
+
+    rng = random.Random(args.seed)
+    first_day = (datetime.datetime.now() - datetime.timedelta(seconds=5 * args.receipts)).date()
+    days = (datetime.date.today() - first_day).days + 1
+    time_lookups("reprint by order id", lambda order_id: store_.find(order_id=order_id),
+                 [rng.randint(1, args.receipts) for _ in range(args.queries)])
+    time_lookups("latest 20 by mobile", lambda mobile: store_.find(mobile=mobile, limit=20),
+                 [f"9{rng.randrange(args.customers):09d}" for _ in range(args.queries)])
+    time_lookups("latest 20 of a day", lambda day: store_.find(day=day, limit=20),
+                 [first_day + datetime.timedelta(days=rng.randrange(days)) for _ in range(args.queries)])
+    found = store_.find(order_id=args.receipts // 2)
+    print(f"Order {args.receipts // 2} reprints as stored: {bool(found) and found[0].order_id == args.receipts // 2}")
+    store_.close()
+
+# ------------------------------------------------------------------------------
+# ENTRY POINT
+# ------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Super Store CLI benchmarks")
+    parser.add_argument('--backend', choices=sorted(STORAGE_ENGINES), default=STORAGE_CONFIG['backend'])
+    parser.add_argument('--sqlite-path', help="SQLite file to use (default: a throwaway scratch database)")
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    checkout = sub.add_parser('checkout', help="Compare per-row and batched checkout round trips")
+    checkout.add_argument('--lines', type=int, nargs='+', default=[1, 10, 200])
+    checkout.add_argument('--iterations', type=int, default=50)
+    checkout.add_argument('--warmup', type=int, default=5)
+    checkout.set_defaults(run=run_checkout_benchmark)
+
+    load = sub.add_parser('load', help="Simulate many cashiers checking out concurrently")
+    load.add_argument('--cashiers', type=int, default=8)
+    load.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+    load.add_argument('--products', type=int, default=500)
+    load.add_argument('--stock', type=int, default=2000, help="Starting stock per SKU (low values provoke shortfalls)")
+    load.add_argument('--skew', type=float, default=1.1, help="Zipf exponent for SKU popularity (0 = uniform)")
+    load.add_argument('--basket-mean', type=float, default=6.0)
+    load.add_argument('--max-basket', type=int, default=60)
+    load.add_argument('--customers', type=int, default=5000, help="Distinct customer mobiles to draw from")
+    load.add_argument('--think-time', type=float, default=0.0, help="Mean seconds a cashier pauses between orders")
+    load.add_argument('--restock-every', type=float, default=0.0, help="Seconds between manager restocks (0 = off)")
+    load.add_argument('--restock-qty', type=int, default=500)
+    load.add_argument('--pool-size', type=int, help="Connection pool size (default: one per cashier)")
+    load.add_argument('--seed', type=int, default=1)
+    load.add_argument('--metrics', action='store_true', help="Print the per-operation/statement latency table afterwards")
+    load.add_argument('--group-commit', action='store_true', help="Share transactions between concurrent checkouts")
+    load.add_argument('--group-window-ms', type=float, help="Group commit window (default from CHECKOUT_CONFIG)")
+    load.add_argument('--group-max-orders', type=int, help="Orders per group at most (default from CHECKOUT_CONFIG)")
+    load.add_argument('--reserve', action='store_true',
+                      help="Reserve each basket line as it is keyed in (stock reservations); only the checkout is timed")
+    load.set_defaults(run=run_load_benchmark)
+
+    group = sub.add_parser('group', parents=[load], add_help=False, conflict_handler='resolve',
+                           help="Throughput/latency of the load benchmark with group commit off and at several settings")
+    group.add_argument('--duration', type=float, default=5.0, help="Seconds to run each setting")
+    group.add_argument('--windows', type=float, nargs='+', default=[1, 5, 10], help="Group commit windows to try (ms)")
+    group.add_argument('--max-orders', type=int, nargs='+', default=[8, 32], help="Group sizes to try")
+    group.set_defaults(run=run_group_benchmark)
+
+    lookup = sub.add_parser('lookup', help="Micro-benchmark the in-memory product lookup index")
+    lookup.add_argument('--products', type=int, default=100_000)
+    lookup.add_argument('--queries', type=int, default=5000)
+    lookup.add_argument('--seed', type=int, default=1)
+    lookup.set_defaults(run=run_lookup_benchmark)
+
+    cart = sub.add_parser('cart', help="Time keying in a wholesale cart: old list scan vs the indexed Decimal cart")
+    cart.add_argument('--lines', type=int, default=10_000)
+    cart.add_argument('--merge-share', type=float, default=0.2, help="Extra scans of products already in the cart")
+    cart.add_argument('--remove-share', type=float, default=0.05, help="Share of lines taken off again")
+    cart.add_argument('--checkout', action='store_true', help="Also check the cart out against --backend")
+    cart.add_argument('--seed', type=int, default=1)
+    cart.set_defaults(run=run_cart_benchmark)
+
+    report = sub.add_parser('report', help="Seed millions of order lines and time the analytical sales report")
+    report.add_argument('--lines', type=int, default=10_000_000)
+    report.add_argument('--products', type=int, default=5000)
+    report.add_argument('--days', type=int, default=90)
+    report.add_argument('--chunk-size', type=int, default=reports.REPORT_CONFIG['chunk_size'])
+    report.add_argument('--skip-seed', action='store_true', help="Reuse the order lines already in --sqlite-path")
+    report.add_argument('--archive', action='store_true',
+                        help="Then archive every month but the current one (scratch archive) and time the reports again")
+    report.add_argument('--seed', type=int, default=1)
+    report.set_defaults(run=run_report_benchmark)
+
+    bulk = sub.add_parser('import', help="Time bulk catalogue import (insert, then restock) and export")
+    bulk.add_argument('--products', type=int, default=1_000_000)
+    bulk.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    bulk.add_argument('--batch-size', type=int, default=catalog.CATALOG_CONFIG['batch_size'])
+    bulk.add_argument('--seed', type=int, default=1)
+    bulk.set_defaults(run=run_import_benchmark)
+
+    receipt = sub.add_parser('receipts', help="Time storing receipts (one at a time and in batches) and reprint lookups")
+    receipt.add_argument('--receipts', type=int, default=1_000_000)
+    receipt.add_argument('--customers', type=int, default=100_000)
+    receipt.add_argument('--batch-size', type=int, default=receipts.RECEIPT_CONFIG['batch'])
+    receipt.add_argument('--queries', type=int, default=2000)
+    receipt.add_argument('--no-compress', action='store_true')
+    receipt.add_argument('--seed', type=int, default=1)
+    receipt.set_defaults(run=run_receipt_benchmark)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
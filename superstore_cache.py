@@ -0,0 +1,456 @@
+"""Process-local caches behind the Super Store CLI's storage engines.
+
+InventoryCache keeps a copy of the Inventory table refreshed with delta queries on updated_at, so the
+billing loop does not re-read the whole table on every keypress; ProductIndex is the in-memory
+barcode/prefix/typo-tolerant lookup built over the cache's rows; CustomerCache resolves returning
+customers by mobile number without a SELECT inside the checkout transaction.
+
+    cache = InventoryCache(engine.inventory_rows_since, **INVENTORY_CACHE_CONFIG)
+    index = ProductIndex()
+    cache.listeners.append(index.apply)     # The index follows every refresh
+    rows = cache.get_inventory()
+"""
+import bisect
+import collections
+import datetime
+import re
+import threading
+import time
+
+# The billing loop redraws the menu after every keypress. Instead of re-reading the whole Inventory
+# table each time, rows are kept in a process-local cache and refreshed with delta queries on updated_at.
+# updated_at is stamped when a writer changes the row, not when it commits, so a delta query cannot see
+# a write whose transaction commits more than overlap_seconds after that (a stalled or very long
+# transaction) once newer rows have moved the watermark past it. The periodic full refresh puts such a
+# row right within full_refresh_seconds.
+INVENTORY_CACHE_CONFIG = {
+    'refresh_interval': 2.0,    # Seconds a snapshot is served without asking the database for changes
+    'overlap_seconds': 5,       # Delta queries re-read this much history so late-committing writers are not missed
+    'full_refresh_seconds': 300,    # Every row is re-read this often to catch later commits still (0: never)
+    'max_pages': 64,            # Inventory pages / search results kept for the billing screen
+}
+
+class InventoryCache:
+    """Process-local copy of the Inventory table with incremental (delta) refresh."""
+
+    def __init__(self, fetch_rows, refresh_interval=2.0, overlap_seconds=5, max_pages=64, full_refresh_seconds=300):
+        self._fetch_rows = fetch_rows   # fetch_rows(since) -> rows changed at/after `since` (all rows when None)
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_seconds
+        self.max_pages = max_pages
+        self.overlap = datetime.timedelta(seconds=overlap_seconds)
+        self._lock = threading.Lock()
+        self._items = []            # Rows ordered by product_id (the order the menus print them in)
+        self.product_map = {}       # str(product_id) -> row, shared with _items
+        self._watermark = None      # Newest updated_at seen so far; None means a full load is needed
+        self._last_refresh = 0.0
+        self._last_full_read = 0.0  # When every row was last read (a full load or a full refresh)
+        self._stale = True
+        self._pages = {}            # Small memo of recent page/search results: key -> (loaded_at, value)
+        self.listeners = []         # Called as listener(changed_rows, full_load) after every refresh
+        self.stats = {'hits': 0, 'misses': 0, 'full_loads': 0, 'delta_rows': 0, 'full_refreshes': 0, 'late_rows': 0}
+
+    def invalidate(self):
+        """Forces the next read to fetch changes (called after our own writes)."""
+        self._stale = True
+        self._pages = {}
+
+    def memo(self, key, load):
+        """Serves a page/search result for up to refresh_interval seconds (bounded, so memory stays flat)."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached and now - cached[0] < self.refresh_interval:
+                self.stats['hits'] += 1
+                return cached[1]
+            self.stats['misses'] += 1
+        value = load()      # Outside the lock, so a slow query does not hold up other readers
+        with self._lock:
+            if len(self._pages) >= self.max_pages:
+                self._pages.pop(next(iter(self._pages)))    # Drop the oldest entry
+            self._pages[key] = (now, value)
+        return value
+
+    def clear(self):
+        """Drops everything so the next read does a full load."""
+        with self._lock:
+            self._items, self.product_map, self._watermark = [], {}, None
+            self._stale = True
+
+    def cached_rows(self):
+        """Copies of the rows currently held, without asking the database (used to keep selling offline)."""
+        with self._lock:
+            return [dict(row) for row in self._items]
+
+    def get_inventory(self):
+        """Returns the cached inventory, pulling only changed rows when the snapshot is stale."""
+        with self._lock:
+            if not self._stale and time.monotonic() - self._last_refresh < self.refresh_interval:
+                self.stats['hits'] += 1
+                return self._items
+            self.stats['misses'] += 1
+            self._refresh()
+            return self._items
+
+    def _refresh(self):
+        now = time.monotonic()
+        full_load = self._watermark is None
+        full_refresh = (not full_load and self.full_refresh_interval
+                        and now - self._last_full_read >= self.full_refresh_interval)
+        if full_load:
+            rows = self._fetch_rows(None)
+            self._items, self.product_map = [], {}
+            self.stats['full_loads'] += 1
+        elif full_refresh:
+            # Every row again, but only the ones that differ from the cache count as changed.
+            rows = self._fetch_rows(None)
+            self.stats['full_refreshes'] += 1
+        else:
+            rows = self._fetch_rows(self._watermark - self.overlap)
+            self.stats['delta_rows'] += len(rows)
+        if full_load or full_refresh:
+            self._last_full_read = now
+
+        since = None if full_load else self._watermark - self.overlap
+        changed = []
+        needs_sort = False
+        for row in rows:
+            updated_at = row.pop('updated_at')
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+            key = str(row['product_id'])
+            existing = self.product_map.get(key)
+            if existing is not None:
+                if existing == row:
+                    continue    # Re-read by the overlap or a full refresh, but unchanged
+                if full_refresh and updated_at < since:
+                    self.stats['late_rows'] += 1    # A change the delta queries had missed
+                # Update in place so the ordered list does not have to be rebuilt.
+                existing.update(row)
+                changed.append(existing)
+            else:
+                if self._items and row['product_id'] < self._items[-1]['product_id']:
+                    needs_sort = True
+                self._items.append(row)
+                self.product_map[key] = row
+                changed.append(row)
+        if needs_sort:
+            self._items.sort(key=lambda item: item['product_id'])
+        for listener in self.listeners:
+            listener(changed, full_load)
+
+        self._stale = False
+        self._last_refresh = time.monotonic()
+
+# Checkout resolves returning customers (by mobile number) from memory instead of a SELECT inside the
+# write transaction. Entries are only ever added after the customer row is committed.
+CUSTOMER_CACHE_CONFIG = {
+    'max_entries': 50_000,      # Least recently used customers are evicted beyond this
+    'ttl_seconds': 3600,        # Entries older than this are re-read from the database
+    'warm_days': 30,            # Warm-up loads customers who ordered within this many days
+}
+
+class CustomerCache:
+    """Bounded LRU map of mobile_number -> (customer_id, name) with a time-to-live."""
+
+    def __init__(self, max_entries=50_000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()   # mobile -> (stored_at, customer_id, name); oldest use first
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def get(self, mobile):
+        """(customer_id, name) for a cached, unexpired mobile number, else None."""
+        with self._lock:
+            entry = self._entries.get(mobile)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[mobile]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(mobile)
+            self.stats['hits'] += 1
+            return entry[1], entry[2]
+
+    def put(self, mobile, customer_id, name):
+        with self._lock:
+            self._entries[mobile] = (time.monotonic(), customer_id, name)
+            self._entries.move_to_end(mobile)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def discard(self, mobile):
+        with self._lock:
+            self._entries.pop(mobile, None)
+
+    def warm(self, rows):
+        """Loads (customer_id, mobile_number, name) rows, most recent last, without counting them as lookups."""
+        for customer_id, mobile, name in rows:
+            self.put(mobile, customer_id, name)
+
+    def __len__(self):
+        return len(self._entries)
+
+def _name_tokens(name):
+    """Lower-case word tokens of a product name ('Pepsi Can (300ml)' -> ['pepsi', 'can', '300ml'])."""
+    return re.findall(r'[a-z0-9]+', name.lower())
+
+def _wildcards(token):
+    """The token with each position in turn replaced by '*' (words with one character there in any form)."""
+    return {token[:i] + '*' + token[i + 1:] for i in range(len(token))}
+
+def _one_edit_patterns(word):
+    """Wildcard patterns matching indexed words one substitution or one insertion away from `word`."""
+    return ([word[:i] + '*' + word[i + 1:] for i in range(len(word))]
+            + [word[:i] + '*' + word[i:] for i in range(len(word) + 1)])
+
+def _one_edit_strings(word):
+    """`word` with one character deleted or two adjacent characters swapped."""
+    return ([word[:i] + word[i + 1:] for i in range(len(word))]
+            + [word[:i] + word[i + 1] + word[i] + word[i + 2:] for i in range(len(word) - 1)])
+
+class _SortedKeys:
+    """Sorted keys kept in chunks of up to 2 * CHUNK_SIZE (a pared-down sorted list): an insert or
+    delete shifts one chunk, not a 100k-entry list, and nothing is ever re-sorted wholesale."""
+
+    CHUNK_SIZE = 1000
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._chunks = [keys[i:i + self.CHUNK_SIZE] for i in range(0, len(keys), self.CHUNK_SIZE)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]     # Last key of each chunk, for bisect
+        self._len = len(keys)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        self._len += 1
+        if not self._chunks:
+            self._chunks, self._maxes = [[key]], [key]
+            return
+        i = min(bisect.bisect_left(self._maxes, key), len(self._maxes) - 1)
+        chunk = self._chunks[i]
+        bisect.insort(chunk, key)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * self.CHUNK_SIZE:
+            self._chunks[i:i + 1] = [chunk[:self.CHUNK_SIZE], chunk[self.CHUNK_SIZE:]]
+            self._maxes[i:i + 1] = [chunk[self.CHUNK_SIZE - 1], chunk[-1]]
+
+    def discard(self, key):
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return
+        chunk = self._chunks[i]
+        position = bisect.bisect_left(chunk, key)
+        if position < len(chunk) and chunk[position] == key:
+            del chunk[position]
+            self._len -= 1
+            if chunk:
+                self._maxes[i] = chunk[-1]
+            else:
+                del self._chunks[i], self._maxes[i]
+
+    def irange(self, key):
+        """Keys >= `key` in order (a generator; do not change the keys while it runs)."""
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return
+        chunk = self._chunks[i]
+        for position in range(bisect.bisect_left(chunk, key), len(chunk)):
+            yield chunk[position]
+        for chunk in self._chunks[i + 1:]:
+            yield from chunk
+
+class ProductIndex:
+    """In-memory lookup over the catalog: exact barcode/SKU, name-prefix autocomplete and typo-tolerant search.
+
+    Entries are the inventory cache's own row dicts, so price and stock shown in results follow the cache.
+    The index is kept current by the cache's delta refreshes (see InventoryCache.listeners).
+    """
+
+    FUZZY_MIN_TOKEN = 4     # Shorter words must match exactly; one typo in "tea" is a different word
+    MAX_PREFIX_WORDS = 64   # Words expanded for a short last-word prefix such as "c"
+
+    def __init__(self):
+        self.entries = {}           # product_id -> row dict
+        self._keys = {}             # product_id -> (name_lower, barcode, tokens) as currently indexed
+        self.barcodes = {}          # barcode -> product_id
+        self.names = _SortedKeys()  # (name_lower, product_id) for whole-name prefix search
+        self.tokens = {}            # word -> set(product_id)
+        self.token_list = _SortedKeys()     # Words, for word-prefix autocomplete
+        self.wildcards = {}         # word with one position as '*' -> set(words), for edit-distance-1 lookups
+
+    def __len__(self):
+        return len(self.entries)
+
+    def apply(self, rows, full_load=False):
+        """Indexes new or changed rows (InventoryCache listener)."""
+        if full_load:
+            self.__init__()
+            self._bulk_load(rows)
+            return
+        for row in rows:
+            self.upsert(row)
+
+    def _bulk_load(self, rows):
+        # Same structures as upsert(), but the sorted lists are sorted once instead of per row.
+        names = []
+        for row in rows:
+            product_id = row['product_id']
+            name_lower = row['name'].lower()
+            barcode = row.get('barcode') or None
+            tokens = set(_name_tokens(name_lower))
+            self.entries[product_id] = row
+            self._keys[product_id] = (name_lower, barcode, tokens)
+            if barcode:
+                self.barcodes[barcode] = product_id
+            names.append((name_lower, product_id))
+            for token in tokens:
+                self.tokens.setdefault(token, set()).add(product_id)
+        self.names = _SortedKeys(names)
+        self.token_list = _SortedKeys(self.tokens)
+        for token in self.tokens:
+            for pattern in _wildcards(token):
+                self.wildcards.setdefault(pattern, set()).add(token)
+
+    def upsert(self, row):
+        product_id = row['product_id']
+        name_lower = row['name'].lower()
+        barcode = row.get('barcode') or None
+        self.entries[product_id] = row
+        old = self._keys.get(product_id)
+        if old and old[0] == name_lower and old[1] == barcode:
+            return      # Only price/stock changed; nothing to re-index
+        if old:
+            self._unindex(product_id, *old)
+        tokens = set(_name_tokens(name_lower))
+        self._keys[product_id] = (name_lower, barcode, tokens)
+        if barcode:
+            self.barcodes[barcode] = product_id
+        self.names.add((name_lower, product_id))
+        for token in tokens:
+            ids = self.tokens.get(token)
+            if ids is None:
+                ids = self.tokens[token] = set()
+                self.token_list.add(token)
+                for pattern in _wildcards(token):
+                    self.wildcards.setdefault(pattern, set()).add(token)
+            ids.add(product_id)
+
+    def remove(self, product_id):
+        if product_id in self._keys:
+            self._unindex(product_id, *self._keys.pop(product_id))
+        self.entries.pop(product_id, None)
+
+    def _unindex(self, product_id, name_lower, barcode, tokens):
+        if barcode and self.barcodes.get(barcode) == product_id:
+            del self.barcodes[barcode]
+        self.names.discard((name_lower, product_id))
+        for token in tokens:
+            ids = self.tokens.get(token)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self.tokens[token]
+                self.token_list.discard(token)
+                for pattern in _wildcards(token):
+                    words = self.wildcards.get(pattern)
+                    if words is not None:
+                        words.discard(token)
+                        if not words:
+                            del self.wildcards[pattern]
+
+    # --- Lookups --------------------------------------------------------------
+
+    def get(self, product_id):
+        return self.entries.get(product_id)
+
+    def by_barcode(self, code):
+        product_id = self.barcodes.get(code.strip())
+        return self.entries.get(product_id) if product_id is not None else None
+
+    def _word_sets(self, word, fuzzy=False, prefix=False):
+        """Id sets of every indexed word matching `word`: exactly, within one edit, or as a prefix."""
+        if prefix:
+            sets = []
+            for token in self.token_list.irange(word):
+                if len(sets) >= self.MAX_PREFIX_WORDS or not token.startswith(word):
+                    break
+                sets.append(self.tokens[token])
+            return sets
+        exact = self.tokens.get(word)
+        sets = [exact] if exact else []
+        if fuzzy and len(word) >= self.FUZZY_MIN_TOKEN:
+            sets.extend(self.tokens[candidate] for candidate in self._similar_words(word))
+        return sets
+
+    def _similar_words(self, word):
+        """Indexed words exactly one edit (insert, delete, substitution, adjacent swap) away from `word`.
+        Every candidate comes from a dict lookup, so nothing needs verifying: about 4 * len(word) lookups."""
+        similar = set()
+        for pattern in _one_edit_patterns(word):
+            similar.update(self.wildcards.get(pattern, ()))
+        similar.update(variant for variant in _one_edit_strings(word) if variant in self.tokens)
+        similar.discard(word)
+        return similar
+
+    def _intersect(self, groups, limit):
+        """Up to `limit` ids found in every group (a group is a list of id sets; any set in it counts)."""
+        groups = sorted(groups, key=lambda sets: sum(map(len, sets)))
+        first, rest = groups[0], groups[1:]
+        hits = {}
+        for ids in first:       # Exact-word sets come first, so exact matches win the limited slots
+            for product_id in ids:
+                if product_id not in hits and all(any(product_id in s for s in group) for group in rest):
+                    hits[product_id] = True
+                    if len(hits) >= limit:
+                        return list(hits)
+        return list(hits)
+
+    def _ranked(self, ids):
+        return [self.entries[product_id] for product_id in sorted(ids, key=lambda p_id: self._keys[p_id][0])]
+
+    def autocomplete(self, text, limit=10):
+        """Products whose name, or one of whose words, starts with the typed text."""
+        query = text.lower().strip()
+        if not query:
+            return []
+        found = []
+        for name_lower, product_id in self.names.irange((query,)):
+            if len(found) >= limit or not name_lower.startswith(query):
+                break
+            found.append(product_id)
+        if len(found) < limit:
+            # Word-level: earlier words must match exactly, the last one is treated as a prefix.
+            words = _name_tokens(query)
+            if words:
+                groups = [self._word_sets(word) for word in words[:-1]] + [self._word_sets(words[-1], prefix=True)]
+                if all(groups):
+                    seen = set(found)
+                    found.extend(p_id for p_id in self._intersect(groups, limit + len(found)) if p_id not in seen)
+        return self._ranked(found[:limit])
+
+    def fuzzy(self, text, limit=10):
+        """Typo-tolerant search: each word may be off by one edit. Words matching nothing are ignored,
+        and if no product has all remaining words, the most common word is dropped until something matches."""
+        groups = [group for group in (self._word_sets(word, fuzzy=True) for word in _name_tokens(text)) if group]
+        while groups:
+            hits = self._intersect(groups, limit)
+            if hits:
+                return self._ranked(hits)
+            groups.remove(max(groups, key=lambda sets: sum(map(len, sets))))
+        return []
+
+    def search(self, text, limit=10):
+        """Barcode first, then prefix autocomplete, then fuzzy matching."""
+        entry = self.by_barcode(text)
+        if entry:
+            return [entry]
+        return self.autocomplete(text, limit) or self.fuzzy(text, limit)
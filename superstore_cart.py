@@ -0,0 +1,122 @@
+"""The billing cart for the Super Store CLI.
+
+A cart holds one line per product, indexed by product_id, so adding, merging and removing a line
+costs the same for a 10-line basket as for a 10,000-line wholesale order. Money is Decimal
+throughout, rounded to the paisa only where a value is first read in (a DECIMAL(10, 2) price),
+and the cart total and unit count are kept up to date as lines change instead of being re-summed.
+
+    cart = Cart()
+    cart.add(product, 3)            # product: an inventory row {'product_id', 'name', 'price', ...}
+    cart.remove(product_id)
+    engine.checkout(cart.lines(), cart.total, name, mobile, cart_id=cart.cart_id)
+
+Lines support item['key'] access, so code written for the old list of dicts (checkout, the order
+journal, receipts) reads them unchanged.
+"""
+import decimal
+import uuid
+
+CENT = decimal.Decimal('0.01')
+ZERO = decimal.Decimal('0.00')
+
+def to_money(value):
+    """A price or amount as Decimal rounded to the paisa (accepts Decimal, int, str and float)."""
+    if isinstance(value, float):
+        value = repr(value)     # The shortest decimal that reads back as this float, not its binary expansion
+    return decimal.Decimal(value).quantize(CENT, rounding=decimal.ROUND_HALF_UP)
+
+class InsufficientStockError(Exception):
+    """Raised when one or more cart lines cannot be covered by the current stock."""
+
+    def __init__(self, short_items):
+        self.short_items = short_items  # The order_list entries that could not be fulfilled
+        names = ', '.join(item['name'] for item in short_items)
+        super().__init__(f"Insufficient stock or invalid product ID for {names}. Aborting.")
+
+class CartLine:
+    """One product in the cart. The price is fixed when the product is first added."""
+
+    __slots__ = ('product_id', 'name', 'price', 'quantity')
+
+    def __init__(self, product_id, name, price, quantity=0):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+    def __getitem__(self, key):
+        if key not in ('product_id', 'name', 'price', 'quantity', 'subtotal'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def as_dict(self):
+        return {'product_id': self.product_id, 'name': self.name, 'quantity': self.quantity,
+                'price': self.price, 'subtotal': self.subtotal}
+
+    def __repr__(self):
+        return f"CartLine({self.product_id!r}, {self.name!r}, {self.price}, x{self.quantity})"
+
+class Cart:
+    """Order lines in the order they were first added, with an O(1) index by product_id and running totals."""
+
+    def __init__(self, cart_id=None):
+        self._lines = {}        # product_id -> CartLine (dicts keep insertion order)
+        self.total = ZERO
+        self.units = 0
+        self.cart_id = cart_id or uuid.uuid4().hex    # Stock reservations are held under this id
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def __contains__(self, product_id):
+        return product_id in self._lines
+
+    def get(self, product_id):
+        return self._lines.get(product_id)
+
+    def lines(self):
+        """The lines as a list (what checkout, the journal and receipts take as order_list)."""
+        return list(self._lines.values())
+
+    def add(self, product, quantity):
+        """Adds `quantity` units of an inventory row, merging into its existing line; returns the line."""
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive number.")
+        line = self._lines.get(product['product_id'])
+        if line is None:
+            line = self._lines[product['product_id']] = CartLine(product['product_id'], product['name'],
+                                                                 to_money(product['price']))
+        line.quantity += quantity
+        self.units += quantity
+        self.total += line.price * quantity
+        return line
+
+    def remove(self, product_id, quantity=None):
+        """Takes `quantity` units (default: the whole line) off a product's line; returns the units removed."""
+        line = self._lines.get(product_id)
+        if line is None:
+            return 0
+        removed = line.quantity if quantity is None else min(quantity, line.quantity)
+        line.quantity -= removed
+        if not line.quantity:
+            del self._lines[product_id]
+        self.units -= removed
+        self.total -= line.price * removed
+        return removed
+
+    def clear(self, cart_id=None):
+        """Empties the cart, which carries on as `cart_id` (default: a new random id)."""
+        self._lines.clear()
+        self.total = ZERO
+        self.units = 0
+        self.cart_id = cart_id or uuid.uuid4().hex
@@ -0,0 +1,174 @@
+"""Bulk catalogue import and export for the Super Store CLI.
+
+Supplier catalogues and restock sheets are read as CSV (with a header row) or JSON Lines, one product
+per row, and written to the database in batches: one multi-row upsert and one commit per batch, so
+files of any size stream through in constant memory (apart from the names seen, kept to catch
+duplicates within the file).
+
+    python superstore_cli.py catalog import suppliers.csv --batch-size 5000
+    python superstore_cli.py catalog import restock.jsonl --stock-mode add
+    python superstore_cli.py catalog export inventory.csv
+
+Recognised columns: name, price, stock_quantity (or stock / quantity / qty) and an optional
+barcode (or sku). Other columns, such as product_id in an export, are ignored on import.
+"""
+import contextlib
+import csv
+import decimal
+import functools
+import json
+import sys
+
+CATALOG_CONFIG = {
+    'batch_size': 5000,     # Rows per upsert statement and per commit
+}
+
+CATALOG_COLUMNS = ('product_id', 'name', 'price', 'stock_quantity', 'barcode')
+COLUMN_ALIASES = {'stock': 'stock_quantity', 'quantity': 'stock_quantity', 'qty': 'stock_quantity', 'sku': 'barcode'}
+
+# Limits from the Inventory table in project.sql.
+MAX_NAME_LENGTH = 100
+MAX_BARCODE_LENGTH = 32
+MAX_PRICE = decimal.Decimal('99999999.99')     # DECIMAL(10, 2)
+CENT = decimal.Decimal('0.01')
+
+def detect_format(path, fmt=None):
+    """'csv' or 'jsonl', from an explicit choice or the file extension."""
+    if fmt:
+        return fmt
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+def _open(path, mode):
+    """Opens a file, or stdin/stdout (left open) for '-'."""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if 'r' in mode else sys.stdout)
+    return open(path, mode, encoding='utf-8', newline='')
+
+@functools.lru_cache(maxsize=256)
+def _column(key):
+    """Canonical column name for a header/JSON key ('Stock ' -> 'stock_quantity')."""
+    key = str(key).strip().lower()
+    return COLUMN_ALIASES.get(key, key)
+
+def read_catalog(stream, fmt):
+    """Yields (line_no, row, error) for every data row; row maps canonical column names to values, or is None if unreadable."""
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as err:
+                yield line_no, None, f"Invalid JSON ({err})"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            yield line_no, {_column(key): value for key, value in row.items()}, None
+    else:
+        reader = csv.reader(stream)
+        header = [_column(key) for key in next(reader, [])]
+        for values in reader:
+            if not any(values):
+                continue
+            # reader.line_num is the physical line the row ended on (the header is line 1).
+            yield reader.line_num, dict(zip(header, values)), None
+
+def validate_row(row):
+    """Checks one input row and returns ({'name', 'price', 'stock_quantity', 'barcode'}, None) or (None, error)."""
+    name = str(row.get('name') or '').strip()
+    if not name:
+        return None, "Missing product name"
+    if len(name) > MAX_NAME_LENGTH:
+        return None, f"Name longer than {MAX_NAME_LENGTH} characters"
+    try:
+        price = decimal.Decimal(str(row.get('price', '')).strip()).quantize(CENT)
+    except (decimal.InvalidOperation, ValueError):
+        return None, f"Invalid price '{row.get('price')}'"
+    if not price.is_finite() or price < 0 or price > MAX_PRICE:
+        return None, f"Price must be between 0 and {MAX_PRICE} (got {price})"
+    stock = row.get('stock_quantity')
+    if type(stock) is not int:
+        try:
+            stock = decimal.Decimal(str(stock).strip())
+            stock = int(stock) if stock.is_finite() and stock == stock.to_integral_value() else None
+        except decimal.InvalidOperation:
+            stock = None
+        if stock is None:
+            return None, f"Invalid stock quantity '{row.get('stock_quantity')}'"
+    if stock < 0:
+        return None, f"Stock quantity cannot be negative (got {stock})"
+    barcode = str(row.get('barcode') or '').strip() or None
+    if barcode and len(barcode) > MAX_BARCODE_LENGTH:
+        return None, f"Barcode longer than {MAX_BARCODE_LENGTH} characters"
+    return {'name': name, 'price': price, 'stock_quantity': stock, 'barcode': barcode}, None
+
+def import_catalog(engine, path, fmt=None, batch_size=None, stock_mode='set', insert_only=False, on_error=None, on_batch=None):
+    """Streams a CSV/JSONL catalogue into Inventory in batches of `batch_size` rows (one commit per batch).
+
+    Rows that fail validation, repeat a name or barcode seen earlier in the file, or are rejected by the
+    database are reported through on_error(line_no, message) and skipped; the rest of the file still loads.
+    on_batch(summary) is called after every commit. Returns the summary dict.
+    """
+    batch_size = batch_size or CATALOG_CONFIG['batch_size']
+    fold = str.casefold if engine.text_keys_ignore_case else str
+    summary = {'rows': 0, 'inserted': 0, 'updated': 0, 'errors': 0, 'batches': 0}
+    seen_names, seen_barcodes = {}, {}
+
+    def reject(line_no, message):
+        summary['errors'] += 1
+        if on_error:
+            on_error(line_no, message)
+
+    def flush(batch):
+        inserted, updated, errors = engine.upsert_products(batch, stock_mode, insert_only)
+        summary['inserted'] += inserted
+        summary['updated'] += updated
+        summary['batches'] += 1
+        for line_no, message in errors:
+            reject(line_no, message)
+        if on_batch:
+            on_batch(summary)
+
+    batch = []
+    with _open(path, 'r') as stream:
+        for line_no, raw, error in read_catalog(stream, detect_format(path, fmt)):
+            summary['rows'] += 1
+            row, error = (None, error) if error else validate_row(raw)
+            if error:
+                reject(line_no, error)
+                continue
+            name_key = fold(row['name'])
+            if name_key in seen_names:
+                reject(line_no, f"Duplicate of line {seen_names[name_key]} ('{row['name']}')")
+                continue
+            if row['barcode'] and row['barcode'] in seen_barcodes:
+                reject(line_no, f"Barcode {row['barcode']} already used on line {seen_barcodes[row['barcode']]}")
+                continue
+            seen_names[name_key] = line_no
+            if row['barcode']:
+                seen_barcodes[row['barcode']] = line_no
+            batch.append((line_no, row))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    return summary
+
+def export_catalog(engine, path, fmt=None, batch_size=None):
+    """Streams the whole inventory (product_id order) to a CSV/JSONL file; returns the number of rows written."""
+    fmt = detect_format(path, fmt)
+    count = 0
+    with _open(path, 'w') as stream:
+        writer = csv.writer(stream) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(CATALOG_COLUMNS)
+        for item in engine.iter_inventory(batch_size=batch_size or CATALOG_CONFIG['batch_size']):
+            if writer:
+                writer.writerow([item[column] if item[column] is not None else '' for column in CATALOG_COLUMNS])
+            else:
+                # Decimal prices become JSON numbers; two-decimal DECIMAL(10, 2) values survive the float exactly.
+                stream.write(json.dumps({column: item[column] for column in CATALOG_COLUMNS}, default=float) + '\n')
+            count += 1
+    return count
@@ -1,135 +1,322 @@
-import mysql.connector
 from getpass import getpass   # Purpose: Safely take password input from the user without showing it on the screen.
 import os
 import datetime
+import contextlib
+import csv
+import decimal
+import asyncio
+import collections
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from superstore_cart import ZERO, Cart, InsufficientStockError, to_money
+from superstore_engines import (CHECKOUT_CONFIG, DB_ERRORS, INTEGRITY_ERRORS, INVENTORY_PAGE_SIZE, SERVICE_CONFIG,
+                                STORAGE_CONFIG, STORAGE_ENGINES, RemoteEngine, RemoteError)
+from superstore_journal import JOURNAL_CONFIG, JournalReplayer, OrderJournal, SnapshotEngine
+from superstore_metrics import METRICS, METRICS_CONFIG, format_metrics
+from superstore_pool import DB_POOL_CONFIG, PoolTimeoutError
+from superstore_receipts import RECEIPT_CONFIG, ReceiptStore, Sale, render_receipt, render_receipts
+from superstore_reservations import RESERVATION_CONFIG
+from superstore_service import CheckoutService
 
 # ------------------------------------------------------------------------------
-# 1. DATABASE CONFIGURATION (*** CRITICAL: CHANGE THESE VALUES ***)
+# 1. DATABASE CONFIGURATION
 # ------------------------------------------------------------------------------
 
-
-# host, user, password, and database are the minimum required to connect to a MySQL database.
-
-DB_CONFIG = {
-    'host': 'your server',
-    'user': 'user name',      
-    'password': 'your password ', 
-    'database': 'your database name'
-}
-
-'''Key Purpose host MySQL server address (localhost or IP) user Username to 
-login password Password for the userdatabase Name of the database to useport Port MySQL is running on (default 3306)
-charset	Character set used for connection (optional)
-auth_plugin	Authentication plugin (optional, e.g., 'mysql_native_password')'''
+# DB_CONFIG (*** CRITICAL: CHANGE THESE VALUES ***), STORAGE_CONFIG and SERVICE_CONFIG are set in
+# superstore_engines.py, next to the storage engines that read them.
 
 def clear_screen():
     """Clears the terminal screen."""
     os.system('cls' if os.name == 'nt' else 'clear') # This line clears the terminal screen in a cross-platform way, using 'cls' for Windows and 'clear' for Linux/macOS, chosen based on os.name.
 
+# ------------------------------------------------------------------------------
+# 2. STORAGE ENGINES (MySQL SERVER OR EMBEDDED SQLITE, see superstore_engines.py)
+# ------------------------------------------------------------------------------
+
+LOW_STOCK_THRESHOLD = 10
+CART_DISPLAY_LINES = 20     # Most recent cart lines shown under the catalog (the receipt lists them all)
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+def get_engine():
+    """Returns the process-wide storage engine selected by STORAGE_CONFIG['backend']."""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            backend = STORAGE_CONFIG['backend']
+            if backend not in STORAGE_ENGINES:
+                raise RuntimeError(f"Unknown storage backend '{backend}' (choose from: {', '.join(STORAGE_ENGINES)}).")
+            _ENGINE = STORAGE_ENGINES[backend]()
+        return _ENGINE
+
+def close_engine():
+    """Closes the process-wide engine's pooled connections (called on shutdown)."""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is not None:
+            _ENGINE.close()
+            _ENGINE = None
+
 def connect_db():
-    """Establishes and returns a database connection."""
+    """Returns the storage engine once the database answers, or None (after explaining why)."""
     try:
-        # Attempt to connect to the database using the configuration
-        conn = mysql.connector.connect(**DB_CONFIG)  # mysql.connector.connect(**DB_CONFIG) → This is the key part: it connects to your MySQL database.
-        # The ** just unpacks this dictionary into keyword arguments for the function.
-        return conn
-    except mysql.connector.Error as err:
-        print(f"\n--- DATABASE CONNECTION FAILED ---")
+        # The engine's pool reuses an idle connection when it can and only opens a new one
+        # when every existing connection is busy.
+        engine = get_engine()
+        engine.ping()
+        return engine
+    except DB_ERRORS + (PoolTimeoutError, RuntimeError) as err:
+        print("\n--- DATABASE CONNECTION FAILED ---")
         print(f"Error: {err}")
         print("\nEnsure the following:")
-        print("1. Your **MySQL Server** is running.")
-        print("2. The 'host', 'user', and 'password' in the Python file are **correct**.")
-        print("3. The database name **'superstore_db'** exists and is spelled correctly.")
+        if STORAGE_CONFIG['backend'] == 'sqlite':
+            print(f"1. The SQLite file **'{STORAGE_CONFIG['sqlite_path']}'** is writable.")
+            print("2. 'project.sql' sits next to this Python file (the schema is built from it).")
+        else:
+            print("1. Your **MySQL Server** is running.")
+            print("2. The 'host', 'user', and 'password' in the Python file are **correct**.")
+            print("3. The database name **'superstore_db'** exists and is spelled correctly.")
         input("\nPress Enter to return to the main menu...")
         return None
 
+def print_pool_stats(engine):
+    """Prints connection pool usage so the pool size can be tuned for the store's terminals."""
+    stats = engine.pool.stats
+    avg_wait_ms = (stats['wait_time_total'] / stats['waits'] * 1000) if stats['waits'] else 0.0
+    print(f"DB Pool ({engine.name}): {stats['checkouts']} checkouts | {stats['waits']} waited "
+          f"(avg {avg_wait_ms:.1f} ms, max {stats['wait_time_max'] * 1000:.1f} ms) | "
+          f"{stats['timeouts']} timeouts | {stats['created']} opened | {stats['reconnects']} reconnects")
+    if engine.replicas:
+        reads = METRICS.snapshot()['counters']
+        lags = []
+        for replica in engine.replicas:
+            applied_at = replica.applied_at()
+            lags.append(f"{replica.name} " + (f"{time.time() - applied_at:.1f} s behind" if applied_at is not None else "unavailable"))
+        print(f"Read replicas: {', '.join(lags)} | reads: {reads.get('reads.replica', 0)} on replicas, "
+              f"{reads.get('reads.primary_own_write', 0)} on the primary after own writes, "
+              f"{reads.get('reads.primary_no_replica', 0)} with no replica fresh enough")
+
+def print_cache_stats(engine):
+    """Prints inventory and customer cache hit/miss counters."""
+    stats = engine.inventory_cache.stats
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = (stats['hits'] / lookups * 100) if lookups else 0.0
+    print(f"Inventory Cache: {stats['hits']} hits | {stats['misses']} misses ({hit_rate:.1f}% hit rate) | "
+          f"{stats['full_loads']} full loads | {stats['delta_rows']} delta rows | "
+          f"{stats['full_refreshes']} full refreshes ({stats['late_rows']} late rows)")
+    stats = engine.customer_cache.stats
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = (stats['hits'] / lookups * 100) if lookups else 0.0
+    print(f"Customer Cache: {len(engine.customer_cache)} customers | {stats['hits']} hits | {stats['misses']} misses "
+          f"({hit_rate:.1f}% hit rate) | {stats['evictions']} evicted | {stats['expired']} expired")
+
+_JOURNAL = None
+_REPLAYER = None
+_JOURNAL_LOCK = threading.Lock()
+
+def get_journal():
+    """The process-wide order journal (its replay thread starts with it), or None when JOURNAL_CONFIG['mode'] is 'off'."""
+    global _JOURNAL, _REPLAYER
+    if JOURNAL_CONFIG['mode'] == 'off':
+        return None
+    with _JOURNAL_LOCK:
+        if _JOURNAL is None:
+            _JOURNAL = OrderJournal(JOURNAL_CONFIG['directory'], JOURNAL_CONFIG['fsync_interval'])
+            _REPLAYER = JournalReplayer(_JOURNAL, get_engine, batch_size=JOURNAL_CONFIG['replay_batch'],
+                                        interval=JOURNAL_CONFIG['replay_interval'])
+            _REPLAYER.start()
+            _REPLAYER.wake()    # Sales left over from an earlier session go first
+        return _JOURNAL
+
+def get_replayer():
+    get_journal()
+    return _REPLAYER
+
+def close_journal():
+    """Stops the replay thread and closes the journal file (called on shutdown)."""
+    global _JOURNAL, _REPLAYER
+    with _JOURNAL_LOCK:
+        if _JOURNAL is not None:
+            _REPLAYER.stop()
+            _JOURNAL.close()
+            _JOURNAL = _REPLAYER = None
+
+def reachable_engine():
+    """The storage engine if the database answers right now, else None (without printing anything)."""
+    try:
+        engine = get_engine()
+        engine.ping()
+        return engine
+    except DB_ERRORS + (PoolTimeoutError, RuntimeError):
+        return None
+
+def open_offline_engine(engine=None):
+    """A SnapshotEngine over the live engine's cached catalogue, else the journal's saved one (None if neither exists)."""
+    rows = engine.inventory_cache.cached_rows() if engine is not None else None
+    if not rows:
+        journal = get_journal()
+        rows = journal.load_catalog() if journal else None
+    return SnapshotEngine(rows) if rows else None
+
+def print_journal_status(journal, replayer=None):
+    """Prints the journal backlog and every sale the database could not take (stock conflicts)."""
+    state = ''
+    if replayer is not None and replayer.online is not None:
+        state = ' | database ' + ('online' if replayer.online else f"OFFLINE ({replayer.last_error})")
+    print(f"Order Journal: {len(journal.pending)} sales waiting | {len(journal.conflicts)} conflicts{state}")
+    for order, conflict in journal.conflicts.values():
+        lines = ', '.join(f"{item['name']} x{item['quantity']}" for item in order['order_list']
+                          if not conflict['short'] or item['product_id'] in conflict['short'])
+        print(f"  CONFLICT {order['key'][:8]} sold {order['at']} to {order['name']} ({order['mobile']}), "
+              f"₹{to_money(order['total']):.2f}: {lines} -- {conflict['message']}")
+
 # ------------------------------------------------------------------------------
-# 2. LOGIN & AUTHENTICATION
+# 3. LOGIN & AUTHENTICATION
 # ------------------------------------------------------------------------------
 
+def offline_login(journal, role_required):
+    """Signs a cashier in against the credentials this till last saw accepted by the database."""
+    print(f"\n--- {role_required.upper()} LOGIN (OFFLINE: database unreachable, sales will be journaled) ---")
+    username = input("Username: ")
+    password = getpass("Password: ")
+    if journal.check_login(username, password, role_required):
+        print(f"\n--- Login Successful (offline). Welcome, {username} ({role_required}) ---\n")
+        return True, username
+    print("\n!!! Invalid credentials, or this user has not signed in on this till before. !!!")
+    input("Press Enter to continue...")
+    return False, None
+
 def authenticate_user(role_required):
     """Handles username and password authentication."""
-    conn = connect_db()
-    if not conn:
+    # Cashiers can still sign in while the database is down if this till has seen their login before.
+    journal = get_journal() if role_required == 'billing' else None
+    engine = reachable_engine() if journal else None
+    if journal and engine is None and journal.has_logins():
+        return offline_login(journal, role_required)
+    engine = engine or connect_db()
+    if not engine:
         return False, None
-    
-    cursor = conn.cursor(dictionary=True)
+
     print(f"\n--- {role_required.upper()} LOGIN ---")
     username = input("Username: ")
     print("(Note: Password input is hidden for security.)")
     password = getpass("Password: ")
-    
+
     try:
         # Check username, password, and required role
-        # IMPORTANT: The 'password_hash' column stores the raw password string for this example
-        query = ("SELECT username, role FROM Users WHERE username = %s AND password_hash = %s AND role = %s")
-        cursor.execute(query, (username, password, role_required))
-        user = cursor.fetchone()
-        
+        user = engine.authenticate(username, password, role_required)
+
         if user:
             print(f"\n--- Login Successful. Welcome, {user['username']} ({user['role']}) ---\n")
+            if journal:
+                journal.remember_login(username, password, role_required)
             return True, user['username']
         else:
             print("\n!!! Invalid credentials or insufficient role access. !!!")
             input("Press Enter to continue...")
             return False, None
-            
-    except mysql.connector.Error as err:
+
+    except DB_ERRORS as err:
         print(f"\n!!! DB Error during authentication: {err} !!!")
         input("Press Enter to continue...")
         return False, None
-        
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
 
 # ------------------------------------------------------------------------------
-# 3. BILLING PORTAL FUNCTIONS
+# 4. BILLING PORTAL FUNCTIONS
 # ------------------------------------------------------------------------------
 
-def get_inventory(conn):
-    """Retrieves current inventory for the menu."""
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT product_id, name, price, stock_quantity FROM Inventory ORDER BY product_id")
-    inventory = cursor.fetchall()
-    cursor.close()
-    
-    # CRITICAL FIX: Convert price from Decimal (MySQL's default for DECIMAL types) to float.
-    for item in inventory:
-        item['price'] = float(item['price'])
-        
-    return inventory
-
-def generate_receipt(order_id, order_list, total_amount, mobile, customer_name):
-    """Generates and prints a detailed receipt."""
-    receipt = []
-    receipt.append("=============================================")
-    receipt.append("          SUPER STORE SALES RECEIPT          ")
-    receipt.append("=============================================")
-    receipt.append(f"Order ID: {order_id:<20} Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    receipt.append(f"Customer Name: {customer_name}")
-    receipt.append(f"Customer Mobile: {mobile}")
-    receipt.append("---------------------------------------------")
-    receipt.append("Item                    Qty   Price    Total")
-    receipt.append("---------------------------------------------")
-    
-    for item in order_list:
-        name = item['name'][:20].ljust(20)
-        qty = str(item['quantity']).ljust(3)
-        price = f"₹{item['price']:.2f}".ljust(6)
-        subtotal = f"₹{item['subtotal']:.2f}"
-        receipt.append(f"{name} {qty} {price} {subtotal}")
-
-    receipt.append("---------------------------------------------")
-    receipt.append(f"Subtotal:                               ₹{total_amount:.2f}")
-    receipt.append(f"TOTAL AMOUNT:                           ₹{total_amount:.2f}")
-    receipt.append("=============================================\n")
-    
-    print('\n'.join(receipt))
+_RECEIPTS = None
+_RECEIPTS_LOCK = threading.Lock()
+
+def get_receipt_store():
+    """The process-wide receipt store (superstore_receipts.py), or None when RECEIPT_CONFIG['enabled'] is off."""
+    global _RECEIPTS
+    if not RECEIPT_CONFIG['enabled']:
+        return None
+    with _RECEIPTS_LOCK:
+        if _RECEIPTS is None:
+            _RECEIPTS = ReceiptStore(RECEIPT_CONFIG['directory'])
+        return _RECEIPTS
+
+def close_receipts():
+    """Closes the receipt store's files (called on shutdown)."""
+    global _RECEIPTS
+    with _RECEIPTS_LOCK:
+        if _RECEIPTS is not None:
+            _RECEIPTS.close()
+            _RECEIPTS = None
+
+def store_receipts(sales, texts):
+    """Keeps rendered receipts for reprints. The sales are already safe, so a store that cannot be
+    written only costs the reprint: it is reported, not raised."""
+    try:
+        store = get_receipt_store()
+        if store is not None:
+            store.append(sales, texts)
+    except OSError as e:
+        print(f"!!! Receipt not saved for reprints: {e} !!!", file=sys.stderr)
+
+def generate_receipt(order_id, order_list, total_amount, mobile, customer_name, note=None):
+    """Generates and prints a detailed receipt, and keeps it in the receipt store for reprints."""
+    sale = Sale(order_id, order_list, total_amount, mobile, customer_name, datetime.datetime.now(), note)
+    receipt = render_receipt(sale)
+    print(receipt)
+    store_receipts([sale], [receipt])
+
+def validate_customer(name, mobile):
+    """The billing checks on customer details; returns the error message, or None if they are fine."""
+    if not name:
+        return "Customer name is required."
+    # CRITICAL: Mobile number validation (exactly 10 digits)
+    if not mobile or not mobile.isdigit() or len(mobile) != 10:
+        return "Mobile number must be exactly 10 digits and contain only numbers."
+    return None
+
+def complete_sale(engine, cart, name, mobile, email=None, key=None, cart_id=None, on_outage=None):
+    """Checks a cart out, or journals it when the database cannot be reached (no terminal I/O).
+
+    Returns (order_id, customer_name, journaled); a journaled sale's order_id is 'J-' plus the start of
+    its idempotency key. on_outage(error) is called before a sale that failed on an outage is journaled.
+    Refused sales raise (InsufficientStockError, an integrity error, JournalError, ...).
+    `cart_id` names the stock reservations the checkout uses up.
+    """
+    order_list, total_amount = cart.lines(), cart.total
+    journal = get_journal()
+    key = key or (uuid.uuid4().hex if journal else None)
+    if journal is None or (JOURNAL_CONFIG['mode'] == 'fallback' and not isinstance(engine, SnapshotEngine)):
+        try:
+            order_id, customer_name = engine.checkout(order_list, total_amount, name, mobile, email, idempotency_key=key,
+                                                      cart_id=cart_id)
+            return order_id, customer_name, False
+        except Exception as e:
+            if journal is None or not _is_outage(e):
+                raise
+            # The commit may or may not have happened; the key lets the replay find out without selling twice.
+            if on_outage:
+                on_outage(e)
 
-def process_billing_transaction(conn, order_list, total_amount):
-    """Inserts order, order items, updates inventory, and generates receipt in a transaction."""
+    journal.record_sale(order_list, total_amount, name, mobile, email, key=key, cart_id=cart_id)
+    get_replayer().wake()
+    if isinstance(engine, SnapshotEngine):
+        engine.apply_sale(order_list)
+    else:
+        engine.inventory_cache.invalidate()
+    return f"J-{key[:8]}", name, True
+
+def process_billing_transaction(engine, cart):
+    """Inserts order, order items, updates inventory, and generates receipt in a transaction.
+
+    Returns True once the sale is committed (or journaled); the caller then must not release the
+    cart's reservations, which the checkout (or its replay) uses up.
+    """
     
     # 1. Get Customer Info and Validate
     print("\n--- CUSTOMER DETAILS ---")
@@ -138,149 +325,244 @@ def process_billing_transaction(conn, order_list, total_amount):
     mobile = input("Customer Mobile Number (10 Digits Required): ").strip()
     email = input("Customer Email (Optional, press Enter): ").strip()
     
-    if not name:
-        print("!!! TRANSACTION FAILED: Customer name is required. !!!")
-        return
+    error = validate_customer(name, mobile)
+    if error:
+        print(f"!!! TRANSACTION FAILED: {error} !!!")
+        return False
 
-    # CRITICAL: Mobile number validation (exactly 10 digits)
-    if not mobile or not mobile.isdigit() or len(mobile) != 10:
-        print("!!! TRANSACTION FAILED: Mobile number must be exactly 10 digits and contain only numbers. !!!")
-        return
+    def on_outage(e):
+        print(f"\n--- Database unavailable ({e}); the sale is saved to the offline journal. ---")
 
-    cursor = None
-    order_id = None 
-    customer_name = name 
-    
     try:
-        cursor = conn.cursor()
+        order_id, customer_name, journaled = complete_sale(engine, cart, name, mobile, email, cart_id=cart.cart_id,
+                                                           on_outage=on_outage)
+    except Exception as e:
+        print(f"\n!!! TRANSACTION FAILED: {e} !!!")
+        return False
+    note = "Order number assigned when this sale reaches the database." if journaled else None
 
-        # FIX: Rollback any hanging transaction state before starting a new one. 
-        conn.rollback() 
-        conn.start_transaction()
+    # 6. Generate Receipt (called only once the sale is committed or journaled)
+    generate_receipt(order_id, cart.lines(), cart.total, mobile, customer_name, note)
+    return True
 
-        # 2. Check/Insert Customer
-        customer_id = None
-        
-        # Check by mobile number
-        cursor.execute("SELECT customer_id, name FROM Customers WHERE mobile_number = %s", (mobile,))
-        customer = cursor.fetchone()
-
-        if customer:
-            customer_id = customer[0]
-            # Use the name found in the database for the receipt
-            customer_name = customer[1] 
-        else:
-            # Insert new customer, including name (must match CHAR(10) constraint)
-            customer_insert_query = "INSERT INTO Customers (name, mobile_number, email) VALUES (%s, %s, %s)"
-            # Ensure mobile number is exactly 10 chars, which is guaranteed by the validation above
-            cursor.execute(customer_insert_query, (name, mobile, email if email else None))
-            customer_id = cursor.lastrowid
-            
-        # 3. Insert Order
-        order_insert_query = "INSERT INTO Orders (customer_id, total_amount) VALUES (%s, %s)"
-        cursor.execute(order_insert_query, (customer_id, total_amount))
-        order_id = cursor.lastrowid
-
-        # 4. Insert Order Items and Update Inventory Stock
-        update_stock_query = "UPDATE Inventory SET stock_quantity = stock_quantity - %s WHERE product_id = %s AND stock_quantity >= %s"
-        order_item_insert_query = "INSERT INTO OrderItems (order_id, product_id, quantity, price_at_sale) VALUES (%s, %s, %s, %s)"
-
-        for item in order_list:
-            # Check if stock update will be successful
-            cursor.execute(update_stock_query, (item['quantity'], item['product_id'], item['quantity']))
-            
-            if cursor.rowcount == 0:
-                raise Exception(f"Insufficient stock or invalid product ID for {item['name']}. Aborting.")
+def _release_cart(engine, cart_id):
+    """Gives an abandoned cart's reserved units back to stock (left to the expiry sweep if that fails)."""
+    if cart_id and not isinstance(engine, SnapshotEngine):
+        try:
+            engine.release_reservations(cart_id)
+        except DB_ERRORS + (PoolTimeoutError,):
+            pass
 
-            # Insert into OrderItems
-            # item['price'] is float, but MySQL connector handles conversion to DECIMAL
-            cursor.execute(order_item_insert_query, (order_id, item['product_id'], item['quantity'], item['price']))
+def _is_outage(err):
+    """Whether a failed checkout means the database (or checkout service) could not be reached, as
+    opposed to the order itself being refused (stock, constraints, bad input)."""
+    if isinstance(err, RemoteError):
+        return err.code in (None, 'db_error', 'busy')
+    return isinstance(err, DB_ERRORS + (PoolTimeoutError,)) and not isinstance(err, INTEGRITY_ERRORS)
 
-        # 5. Commit Transaction
-        conn.commit()
-        
-        # 6. Generate Receipt (called only on successful commit)
-        generate_receipt(order_id, order_list, total_amount, mobile, customer_name)
+def connect_till():
+    """The billing portal's engine: the database when it answers, else (journal on) the offline catalogue."""
+    if get_journal() is None:
+        return connect_db()
+    engine = reachable_engine()
+    if engine is None:
+        engine = open_offline_engine()
+        if engine is None:
+            return connect_db()     # No catalogue saved yet: explain the connection failure as before
+        print("\n--- DATABASE UNREACHABLE: selling offline from the saved catalogue; sales are journaled. ---")
+        input("Press Enter to continue...")
+    return engine
 
-    except Exception as e:
-        # Rollback on any failure
-        conn.rollback()
-        print(f"\n!!! TRANSACTION FAILED: {e} !!!")
-        
-    finally:
-        # Ensure cursor is closed after transaction attempt
-        if cursor:
-            cursor.close()
+def _save_catalog_in_background(journal, engine):
+    """Saves the catalogue for opening offline: the inventory cache's rows when the till holds the whole
+    catalogue, else (DatabaseLookup) rows streamed from the database a batch at a time."""
+    rows = engine.inventory_cache.cached_rows() or engine.iter_inventory()
 
+    def save():
+        try:
+            journal.save_catalog(rows)
+        except DB_ERRORS + (PoolTimeoutError,):
+            pass    # The previous catalogue stays; the next billing session saves it again
+
+    threading.Thread(target=save, name='catalog-snapshot', daemon=True).start()
+
+
+def prompt_inventory_search():
+    """Asks for a name filter: plain text matches the start of the name, *text matches anywhere."""
+    text = input("Search item name (prefix, or *text to match anywhere; Enter to clear): ").strip()
+    if not text:
+        return {}
+    if text.startswith('*'):
+        return {'name_contains': text[1:]} if text[1:] else {}
+    return {'name_prefix': text}
 
 def billing_portal():
     """Main function for the billing section with interactive input."""
-    conn = connect_db()
-    if not conn: return
+    engine = connect_till()
+    if not engine: return
+    journal = get_journal()
 
-    order_list = []
-    total_bill = 0.0
+    # Units added to the cart are reserved under cart.cart_id (RESERVATION_CONFIG) until checkout or reset.
+    cart = Cart()
+    # Only one page of the catalog is on screen at a time: page_starts is the stack of after_id values
+    # for the pages seen so far (for [P]rev), and search holds the active name filter.
+    page_starts = [0]
+    search = {}
+    # Typed names and scanned barcodes are resolved in memory by the product index (built once, here), or
+    # for a catalogue above PRODUCT_INDEX_MAX_PRODUCTS by indexed queries (engine.product_lookup()).
+    matches, match_query = None, ''
+
+    try:
+        index = engine.product_lookup()
+        if not len(engine.customer_cache):
+            engine.warm_customer_cache()    # Regulars then check out without a customer lookup
+        if journal and not isinstance(engine, SnapshotEngine):
+            _save_catalog_in_background(journal, engine)    # Lets this till open offline next time
+    except DB_ERRORS as e:
+        print(f"Error building product index: {e}")
+        input("\nPress Enter to continue...")
+        return
 
     while True:
+        if isinstance(engine, SnapshotEngine) and get_replayer().online:
+            # The replay thread reached the database again: go back to live stock.
+            online = reachable_engine()
+            if online is not None:
+                try:
+                    engine, index = online, online.product_lookup()
+                except DB_ERRORS:
+                    pass
+        if RESERVATION_CONFIG['enabled'] and not isinstance(engine, (SnapshotEngine, RemoteEngine)):
+            try:
+                engine.reservations.maybe_sweep()   # The checkout service sweeps for its own tills
+            except DB_ERRORS + (PoolTimeoutError,):
+                pass
         try:
-            inventory = get_inventory(conn)
-        except mysql.connector.Error as e:
-            print(f"Error fetching inventory: {e}")
+            if matches is not None:
+                inventory, has_more = matches, False
+            else:
+                inventory, has_more = engine.inventory_page(page_starts[-1], **search)
+        except DB_ERRORS as e:
+            offline = open_offline_engine(engine) if journal else None
+            if offline is None:
+                print(f"Error fetching inventory: {e}")
+                input("\nPress Enter to continue...")
+                break
+            print(f"Database unreachable ({e}); selling offline, sales are journaled.")
             input("\nPress Enter to continue...")
-            break
+            engine, index = offline, offline.product_lookup()
+            continue
 
         clear_screen()
         print("--- CURRENT INVENTORY & BILLING ---")
+        if isinstance(engine, SnapshotEngine):
+            print(f"*** OFFLINE: stock shown is as last seen; {len(journal.pending)} sales waiting for the database ***")
+        elif journal and (journal.pending or journal.conflicts):
+            print(f"Journal: {len(journal.pending)} sales waiting | {len(journal.conflicts)} stock conflicts "
+                  f"(manager: superstore_cli.py journal status)")
+        if matches is not None:
+            print(f"Matches for '{match_query}' ([S]earch or [N]ext to go back to the catalog):")
+        elif search:
+            print(f"Search: {search.get('name_prefix') or '*' + search.get('name_contains', '')}")
         print("| No. | Item Name                 | Price (₹) | Stock |")
         print("-----------------------------------------------------")
         
         product_map = {}
         for item in inventory:
-            # item['price'] is already a float
+            # item['price'] is a Decimal (exact paisa), formatted like a float
             print(f"| {item['product_id']:<3} | {item['name'][:25]:<25} | {item['price']:<9.2f} | {item['stock_quantity']:<5} |")
             product_map[str(item['product_id'])] = item
             
         print("-----------------------------------------------------")
+        print(f"Page {len(page_starts)}{' (more: [N]ext)' if has_more else ''}{' | [P]rev' if len(page_starts) > 1 else ''}")
 
-        if order_list:
+        if cart:
             print("\n--- CURRENT ORDER ITEMS ---")
-            for item in order_list:
-                print(f"- {item['name']} x{item['quantity']} (₹{item['subtotal']:.2f})")
-            print(f"TOTAL: ₹{total_bill:.2f}\n")
+            if len(cart) > CART_DISPLAY_LINES:
+                # Wholesale orders run to thousands of lines: show the most recently added ones.
+                print(f"... {len(cart) - CART_DISPLAY_LINES} earlier lines")
+            for item in itertools.islice(cart, max(len(cart) - CART_DISPLAY_LINES, 0), None):
+                print(f"- {item.name} x{item.quantity} (₹{item.subtotal:.2f})")
+            print(f"TOTAL: ₹{cart.total:.2f} ({len(cart)} lines, {cart.units} units)\n")
         
         # Clear options for clarity
-        print("\nOptions: [ITEM NO.] to add item | [C]heckout | [R]eset | [D] Done | [B]ack (Main Menu)")
+        print("\nOptions: [ITEM NO.], barcode or name to add item | [N]ext/[P]rev page | [S]earch | [C]heckout | [R]eset | [D] Done | [B]ack (Main Menu)")
         
         # New interactive input logic
-        user_input = input("Enter Item No. or Command: ").strip().lower()
+        raw_input = input("Enter Item No. or Command: ").strip()
+        user_input = raw_input.lower()
 
         if user_input in ['b', 'back']:
+            if cart:
+                _release_cart(engine, cart.cart_id)
             print("Exiting Billing Portal.")
             break
+
+        elif user_input in ['n', 'next']:
+            if matches is not None:
+                matches = None
+            elif has_more and inventory:
+                page_starts.append(inventory[-1]['product_id'])
+            continue
+
+        elif user_input in ['p', 'prev']:
+            if matches is not None:
+                matches = None
+            elif len(page_starts) > 1:
+                page_starts.pop()
+            continue
+
+        elif user_input in ['s', 'search']:
+            search = prompt_inventory_search()
+            page_starts = [0]
+            matches = None
+            continue
         
         elif user_input in ['r', 'reset']:
-            order_list = []
-            total_bill = 0.0
+            if cart:
+                _release_cart(engine, cart.cart_id)
+            cart.clear()
             print("Order reset.")
             input("\nPress Enter to continue...")
             continue
 
         elif user_input in ['c', 'checkout', 'd', 'done']:
-            if order_list:
-                process_billing_transaction(conn, order_list, total_bill)
+            if cart:
+                if not process_billing_transaction(engine, cart):
+                    _release_cart(engine, cart.cart_id)
                 # Reset order state after transaction attempt
-                order_list = []
-                total_bill = 0.0
+                cart.clear()
                 input("\nPress Enter to continue...")
             else:
                 print("!!! Order is empty. Cannot check out. !!!")
                 input("\nPress Enter to continue...")
             continue
         
-        # Process as Item ID input
+        # Process as Item ID input (items on the current page, or any valid number the cashier knows)
         p_id = user_input
-        if p_id in product_map:
-            item = product_map[p_id]
+        item = product_map.get(p_id)
+        if item is None and raw_input:
+            index = engine.product_lookup()     # Cheap when fresh; picks up other tills' catalog changes otherwise
+            item = index.by_barcode(raw_input)
+        if item is None and p_id.isdigit():
+            try:
+                item = engine.get_product(int(p_id))
+            except DB_ERRORS as e:
+                print(f"Error fetching item: {e}")
+        elif item is None and len(p_id) >= 2:
+            # Name entry: prefix autocomplete first, then typo-tolerant matching.
+            hits = index.search(raw_input, INVENTORY_PAGE_SIZE)
+            if len(hits) == 1:
+                item = hits[0]
+            elif hits:
+                matches, match_query = hits, raw_input
+                continue
+            else:
+                print(f"!!! No products match '{raw_input}'. !!!")
+                input("\nPress Enter to continue...")
+                continue
+        if item:
+            matches = None
             
             try:
                 qty_input = input(f"Enter quantity for {item['name']} (Stock: {item['stock_quantity']}): ").strip()
@@ -295,35 +577,24 @@ def billing_portal():
                     input("\nPress Enter to continue...")
                     continue
                 
-                if qty > item['stock_quantity']:
+                if RESERVATION_CONFIG['enabled'] and not isinstance(engine, SnapshotEngine):
+                    # Holds the units now, so the checkout cannot fail on them and the stock shown stays honest.
+                    try:
+                        engine.reserve_stock(cart.cart_id, item['product_id'], qty)
+                    except InsufficientStockError:
+                        available = engine.stock(item['product_id'])
+                        print(f"!!! Insufficient stock! Only {available} available for {item['name']}. !!!")
+                        input("\nPress Enter to continue...")
+                        continue
+                elif qty > item['stock_quantity']:
                     print(f"!!! Insufficient stock! Only {item['stock_quantity']} available for {item['name']}. !!!")
                     input("\nPress Enter to continue...")
                     continue
 
-                # Calculation uses float values
-                subtotal = item['price'] * qty
-                total_bill += subtotal
-                
-                # Check if item is already in order_list to consolidate
-                found = False
-                for existing_item in order_list:
-                    if existing_item['product_id'] == item['product_id']:
-                        existing_item['quantity'] += qty
-                        existing_item['subtotal'] += subtotal
-                        found = True
-                        break
-                
-                if not found:
-                    # Store a temporary entry for the current bill
-                    order_list.append({
-                        'product_id': item['product_id'],
-                        'name': item['name'],
-                        'quantity': qty,
-                        'price': item['price'],
-                        'subtotal': subtotal
-                    })
-
-                print(f"-> Added {item['name']} x{qty}. Current Total: ₹{total_bill:.2f}")
+                # Merges into the product's existing line, if any; money stays Decimal.
+                cart.add(item, qty)
+
+                print(f"-> Added {item['name']} x{qty}. Current Total: ₹{cart.total:.2f}")
 
             except ValueError:
                 print("!!! Invalid quantity. Must be a whole number. !!!")
@@ -336,42 +607,131 @@ def billing_portal():
             print(f"!!! Invalid Item Number or Command: {user_input} !!!")
             input("\nPress Enter to continue...")
 
-    if conn and conn.is_connected():
-        conn.close()
-
 # ------------------------------------------------------------------------------
-# 4. INVENTORY PORTAL FUNCTIONS (Admin Only)
+# 5. INVENTORY PORTAL FUNCTIONS (Admin Only)
 # ------------------------------------------------------------------------------
 
-def get_total_earnings(conn):
+def get_total_earnings(engine):
     """Calculates and returns the total earnings from all completed orders."""
-    cursor = conn.cursor()
     try:
-        # SUM(total_amount) from Orders table
-        query = "SELECT SUM(total_amount) FROM Orders"
-        cursor.execute(query)
-        total_earnings = cursor.fetchone()[0]
-        # FIX: Explicitly convert Decimal from MySQL to float for consistency.
-        return float(total_earnings) if total_earnings is not None else 0.0
-    except mysql.connector.Error as err:
+        return engine.total_earnings()
+    except DB_ERRORS as err:
         print(f"!!! DB Error fetching total earnings: {err} !!!")
-        return 0.0
-    finally:
-        cursor.close()
+        return ZERO
 
-def view_reports(conn):
+def print_sales_rollups(engine):
+    """Today's sales (by hour) and the best sellers, all read from the rollup tables."""
+    try:
+        summary = engine.sales_summary()
+        top = engine.top_products()
+    except DB_ERRORS as err:
+        print(f"!!! DB Error fetching sales rollups: {err} !!!")
+        return
+    print(f"Orders (all time): {summary['total_orders']}")
+    print(f"Today ({summary['day']}): {summary['day_orders']} orders, {summary['day_items']} items, ₹{summary['day_revenue']:.2f}")
+    for hour in summary['hours']:
+        print(f"  {hour['hour']:02d}:00  {hour['orders']:>5} orders  ₹{hour['revenue']:>10.2f}")
+    if top:
+        print("\nTop products by revenue:")
+        for row in top:
+            print(f"  {row['name']:<30} {row['units_sold']:>6} units  ₹{row['revenue']:>10.2f}")
+
+def print_sales_report(engine, date_range):
+    """Top sellers, hourly sales, basket averages and stock cover for a date range ('all' = every order)."""
+    try:
+        start = end = None
+        if date_range.lower() != 'all':
+            start, end = (datetime.date.fromisoformat(day) for day in date_range.split())
+    except ValueError:
+        print("!!! Enter two dates as YYYY-MM-DD YYYY-MM-DD, or 'all'. !!!")
+        return
+    try:
+        report = engine.sales_report(start, end)
+    except DB_ERRORS + (RuntimeError,) as err:
+        print(f"!!! Could not build the sales report: {err} !!!")
+        return
+
+    print(f"\n--- SALES REPORT ({report['start'] or 'first order'} to {report['end'] or 'today'}, {report['days']} days) ---")
+    print(f"Orders: {report['orders']}   Lines: {report['lines']}   Units: {report['units']}   Revenue: ₹{report['revenue']:.2f}")
+    print(f"Average basket: {report['avg_basket_units']} units, {report['avg_basket_lines']} lines, ₹{report['avg_basket_value']:.2f}")
+    for title, key in (("Top products by revenue", 'top_by_revenue'), ("Top products by units", 'top_by_units')):
+        print(f"\n{title}:")
+        for row in report[key]:
+            print(f"  {row['name']:<30} {row['units']:>8} units  ₹{row['revenue']:>12.2f}")
+    print("\nSales by hour of day:")
+    for row in report['hourly']:
+        if row['orders'] or row['units']:
+            print(f"  {row['hour']:02d}:00  {row['orders']:>7} orders  {row['units']:>8} units  ₹{row['revenue']:>12.2f}")
+    print("\nLowest stock cover (days of stock left at the current sales rate):")
+    for row in report['stock_cover']:
+        print(f"  {row['name']:<30} {row['stock']:>6} in stock  {row['units_per_day']:>8.2f}/day  {row['days_left']:>7.1f} days")
+
+def view_reports(engine):
     """Displays key reports like total earnings."""
     clear_screen()
     print("\n--- FINANCIAL REPORTS ---")
     
-    total_earnings = get_total_earnings(conn)
+    total_earnings = get_total_earnings(engine)
     
     print("\n=============================================")
     print(f"💰 TOTAL SUPERSTORE EARNINGS: ₹{total_earnings:.2f}")
     print("=============================================")
-    input("\nPress Enter to return to the Inventory Menu...")
+    print_sales_rollups(engine)
+    print_pool_stats(engine)
+    print_cache_stats(engine)
+
+    date_range = input("\nDetailed sales report - date range 'YYYY-MM-DD YYYY-MM-DD', 'all', or Enter to return: ").strip()
+    if date_range:
+        print_sales_report(engine, date_range)
+        input("\nPress Enter to return to the Inventory Menu...")
 
-def add_new_product(conn):
+RECEIPT_LIST_LIMIT = 20     # Matching receipts listed by the reprint screen
+
+def find_receipts(store, query, limit=None):
+    """Stored receipts for a query of an order ID, a 10-digit customer mobile and/or a date (YYYY-MM-DD),
+    newest first. Raises ValueError for anything else."""
+    order_id = mobile = day = None
+    for part in query.split():
+        if re.fullmatch(r'\d{4}-\d{2}-\d{2}', part):
+            day = datetime.date.fromisoformat(part)
+        elif part.isdigit() and len(part) == 10:
+            mobile = part
+        elif part.isdigit():
+            order_id = part
+        else:
+            raise ValueError(f"'{part}' is not an order ID, a 10-digit mobile number or a date (YYYY-MM-DD).")
+    if order_id is None and mobile is None and day is None:
+        raise ValueError("Enter an order ID, a 10-digit mobile number or a date (YYYY-MM-DD).")
+    return store.find(order_id, mobile, day, limit)
+
+def reprint_receipt():
+    """Finds stored receipts by order ID, customer mobile and/or date and prints one again (reprints, returns)."""
+    store = get_receipt_store()
+    if store is None:
+        print("The receipt store is off (SUPERSTORE_RECEIPTS=off).")
+        return
+    print("\n--- REPRINT A RECEIPT ---")
+    query = input("Order ID, customer mobile (10 digits) and/or date (YYYY-MM-DD): ").strip()
+    if not query:
+        return
+    try:
+        found = find_receipts(store, query, limit=RECEIPT_LIST_LIMIT + 1)
+    except ValueError as e:
+        print(f"!!! {e} !!!")
+        return
+    if len(found) <= 1:
+        print(found[0].text if found else "No stored receipt matches.")
+        return
+    for number, receipt in enumerate(found[:RECEIPT_LIST_LIMIT], 1):
+        print(f"{number:>3}. {receipt.at:%Y-%m-%d %H:%M}  Order ID: {receipt.order_id or '(journaled)':<12} "
+              f"Mobile: {receipt.mobile}")
+    if len(found) > RECEIPT_LIST_LIMIT:
+        print(f"     ... only the latest {RECEIPT_LIST_LIMIT} are listed; add a mobile number or a date to narrow the search.")
+    choice = input("Number to reprint (Enter to return): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= min(len(found), RECEIPT_LIST_LIMIT):
+        print(found[int(choice) - 1].text)
+
+def add_new_product(engine):
     """Adds a new unique product to the inventory."""
     print("\n--- ADD NEW PRODUCT ---")
     name = input("Enter new product name: ").strip()
@@ -381,9 +741,9 @@ def add_new_product(conn):
         return
 
     try:
-        price = float(input("Enter price (e.g., 12.50): "))
-        if price < 0: raise ValueError
-    except ValueError:
+        price = to_money(input("Enter price (e.g., 12.50): ").strip())
+        if not price.is_finite() or price < 0: raise ValueError
+    except (ValueError, decimal.InvalidOperation):
         print("!!! Invalid price. Must be a non-negative number. !!!")
         return
 
@@ -394,38 +754,37 @@ def add_new_product(conn):
         print("!!! Invalid quantity. Must be a non-negative integer. !!!")
         return
 
-    cursor = conn.cursor()
+    barcode = input("Enter barcode/SKU (optional, press Enter): ").strip()
+
     try:
-        query = "INSERT INTO Inventory (name, price, stock_quantity) VALUES (%s, %s, %s)"
-        cursor.execute(query, (name, price, quantity))
-        conn.commit()
-        print(f"\n-> Successfully added new product: {name} (ID: {cursor.lastrowid})")
-    except mysql.connector.IntegrityError:
-        print(f"!!! Error: Product named '{name}' already exists. !!!")
-    except mysql.connector.Error as err:
+        product_id = engine.add_product(name, price, quantity, barcode)
+        print(f"\n-> Successfully added new product: {name} (ID: {product_id})")
+    except INTEGRITY_ERRORS:
+        print(f"!!! Error: Product named '{name}'{' or barcode ' + barcode if barcode else ''} already exists. !!!")
+    except DB_ERRORS as err:
         print(f"!!! DB Error: {err} !!!")
-    finally:
-        cursor.close()
 
-def update_stock(conn):
+def update_stock(engine):
     """Updates the stock quantity of an existing product."""
     
-    inventory = get_inventory(conn)
-    if not inventory:
-        print("Inventory is empty.")
-        return
+    # Show the first page of low-stock items (the usual restock candidates) instead of the whole catalog.
+    low_stock, has_more = engine.inventory_page(max_stock=LOW_STOCK_THRESHOLD)
 
     print("\n--- UPDATE EXISTING STOCK ---")
+    print(f"Low stock (<= {LOW_STOCK_THRESHOLD} units):")
     print("| No. | Item Name                 | Stock |")
     print("-----------------------------------------")
-    product_map = {}
-    for item in inventory:
+    for item in low_stock:
         print(f"| {item['product_id']:<3} | {item['name'][:25]:<25} | {item['stock_quantity']:<5} |")
-        product_map[str(item['product_id'])] = item
+    if not low_stock:
+        print("| (none)                                |")
     print("-----------------------------------------")
+    if has_more:
+        print("(More low-stock items: see option 3, filter [L]ow stock.)")
 
     p_id = input("Enter Item No. to update stock: ").strip()
-    if p_id not in product_map:
+    item = engine.get_product(int(p_id)) if p_id.isdigit() else None
+    if item is None:
         print("!!! Invalid Item Number. !!!")
         return
 
@@ -436,21 +795,115 @@ def update_stock(conn):
         print("!!! Quantity to add must be a positive integer. !!!")
         return
 
-    cursor = conn.cursor()
     try:
-        query = "UPDATE Inventory SET stock_quantity = stock_quantity + %s WHERE product_id = %s"
-        cursor.execute(query, (add_qty, p_id))
-        conn.commit()
-        print(f"\n-> Stock updated for {product_map[p_id]['name']}. Added {add_qty} units.")
-    except mysql.connector.Error as err:
+        engine.restock(item['product_id'], add_qty)
+        print(f"\n-> Stock updated for {item['name']}. Added {add_qty} units.")
+    except DB_ERRORS as err:
         print(f"!!! DB Error: {err} !!!")
-    finally:
-        cursor.close()
+
+def import_export_catalog(engine):
+    """Bulk-loads a supplier catalogue / restock sheet, or exports the inventory, as CSV or JSON Lines."""
+    import superstore_catalog as catalog
+
+    print("\n--- CATALOG IMPORT / EXPORT ---")
+    print("1. Import products (new names are added, existing ones get the file's price and stock)")
+    print("2. Import a restock sheet (quantities are added to the current stock)")
+    print("3. Export inventory")
+    choice = input("Enter choice (1-3): ").strip()
+    if choice not in ('1', '2', '3'):
+        print("!!! Invalid choice. !!!")
+        return
+    path = input("File path (.csv or .jsonl): ").strip()
+    if not path:
+        return
+
+    try:
+        if choice == '3':
+            count = catalog.export_catalog(engine, path)
+            print(f"\n✅ Exported {count} products to {path}.")
+            return
+        shown = []
+
+        def on_error(line_no, message):
+            if len(shown) < 20:
+                shown.append(f"  line {line_no}: {message}")
+
+        summary = catalog.import_catalog(engine, path, stock_mode='add' if choice == '2' else 'set', on_error=on_error,
+                                         on_batch=lambda done: print(f"\r  {done['rows']} rows read...", end='', flush=True))
+        print(f"\n✅ {summary['inserted']} products added, {summary['updated']} updated, "
+              f"{summary['errors']} rows rejected ({summary['batches']} batches).")
+        if shown:
+            print("\n".join(shown) + ("\n  ..." if summary['errors'] > len(shown) else ''))
+    except OSError as err:
+        print(f"!!! Cannot open {path}: {err} !!!")
+    except DB_ERRORS as err:
+        print(f"!!! DB Error during catalog {'export' if choice == '3' else 'import'}: {err} !!!")
+        print("Batches committed before the error are kept; re-running the import is safe.")
+
+def view_metrics(engine):
+    """Latency histograms, row counts and error/rollback counters for this till (and the service, if used)."""
+    while True:
+        clear_screen()
+        print("\n--- PERFORMANCE METRICS ---")
+        if not METRICS.enabled:
+            print("Instrumentation is off (set SUPERSTORE_METRICS=1 to enable it).")
+        print(format_metrics(METRICS.snapshot()))
+        if hasattr(engine, 'service_metrics'):
+            try:
+                print("\n--- CHECKOUT SERVICE ---")
+                print(format_metrics(engine.service_metrics()))
+            except DB_ERRORS as err:
+                print(f"!!! Could not fetch service metrics: {err} !!!")
+        print(f"\nSlow statements (>= {METRICS_CONFIG['slow_query_ms']} ms) are logged to {METRICS.slow_log_path or '(disabled)'}")
+        choice = input("[D]ump to file | [R]eset | Enter to return: ").strip().lower()
+        if choice == 'd':
+            path = input(f"File (Enter for {METRICS_CONFIG['dump_path']}): ").strip() or None
+            try:
+                print(f"✅ Metrics written to {METRICS.dump(path)}")
+            except OSError as err:
+                print(f"!!! Cannot write metrics: {err} !!!")
+            input("Press Enter to continue...")
+        elif choice == 'r':
+            METRICS.reset()
+        else:
+            return
+
+def browse_inventory(engine):
+    """Pages through the inventory with optional name search and low-stock filter."""
+    page_starts = [0]
+    filters = {}
+    while True:
+        inventory, has_more = engine.inventory_page(page_starts[-1], **filters)
+        if not inventory and len(page_starts) == 1:
+            print("\nNo matching products." if filters else "\nInventory is currently empty.")
+        else:
+            print(f"\n--- CURRENT INVENTORY (Page {len(page_starts)}) ---")
+            print("| ID | Item Name                 | Price (₹) | Stock |")
+            print("-------------------------------------------------")
+            for item in inventory:
+                print(f"| {item['product_id']:<2} | {item['name'][:25]:<25} | {item['price']:<9.2f} | {item['stock_quantity']:<5} |")
+            print("-------------------------------------------------")
+
+        command = input("[N]ext | [P]rev | [S]earch | [L]ow stock | [A]ll | Enter to finish: ").strip().lower()
+        if command == 'n' and has_more and inventory:
+            page_starts.append(inventory[-1]['product_id'])
+        elif command == 'p' and len(page_starts) > 1:
+            page_starts.pop()
+        elif command in ('s', 'l', 'a'):
+            if command == 's':
+                filters = prompt_inventory_search()
+            elif command == 'l':
+                filters = {'max_stock': LOW_STOCK_THRESHOLD}
+            else:
+                filters = {}
+            page_starts = [0]
+        elif not command:
+            break
 
 def inventory_portal():
     """Main function for the inventory management section."""
-    conn = connect_db()
-    if not conn: return
+    engine = connect_db()
+    if not engine: return
 
     while True:
         clear_screen()
@@ -459,43 +912,362 @@ def inventory_portal():
         print("2. Update Existing Product Stock")
         print("3. View Current Inventory")
         print("4. View Financial Reports (Total Earnings)")
-        print("5. Back to Main Menu")
+        print("5. Import / Export Catalog (CSV, JSONL)")
+        print("6. Performance Metrics")
+        print("7. Reprint a Receipt")
+        print("8. Back to Main Menu")
         
-        choice = input("Enter choice (1-5): ").strip()
+        choice = input("Enter choice (1-8): ").strip()
         
         if choice == '1':
-            add_new_product(conn)
+            add_new_product(engine)
         elif choice == '2':
-            update_stock(conn)
+            update_stock(engine)
         elif choice == '3':
-            inventory = get_inventory(conn)
-            if inventory:
-                print("\n--- CURRENT INVENTORY ---")
-                print("| ID | Item Name                 | Price (₹) | Stock |")
-                print("-------------------------------------------------")
-                for item in inventory:
-                    print(f"| {item['product_id']:<2} | {item['name'][:25]:<25} | {item['price']:<9.2f} | {item['stock_quantity']:<5} |")
-                print("-------------------------------------------------")
-            else:
-                print("\nInventory is currently empty.")
+            browse_inventory(engine)
         elif choice == '4':
-            view_reports(conn)
+            view_reports(engine)
         elif choice == '5':
+            import_export_catalog(engine)
+        elif choice == '6':
+            view_metrics(engine)
+            continue
+        elif choice == '7':
+            reprint_receipt()
+        elif choice == '8':
             print("Exiting Inventory Portal.")
             break
         else:
-            print("!!! Invalid choice. Please select 1-5. !!!")
+            print("!!! Invalid choice. Please select 1-8. !!!")
             
         input("\nPress Enter to continue...")
 
-    if conn and conn.is_connected():
-        conn.close()
 
 
 
+# ------------------------------------------------------------------------------
+# 6. CHECKOUT SERVICE (ONE PROCESS FOR MANY TILLS) AND OTHER SUBCOMMANDS
+# ------------------------------------------------------------------------------
+
+# The service itself is superstore_service.CheckoutService; run_service starts it for `superstore_cli.py serve`.
+def run_service(host=None, port=None, backend=None, workers=None):
+    """Starts the checkout service in the foreground (Ctrl+C to stop)."""
+    backend = backend or SERVICE_CONFIG['backend']
+    if backend == 'service':
+        raise RuntimeError("The checkout service cannot use the 'service' backend itself.")
+    workers = workers or SERVICE_CONFIG['workers']
+    # One pooled connection per executor worker: the executor is what bounds database concurrency.
+    engine = STORAGE_ENGINES[backend](pool_config=dict(DB_POOL_CONFIG, pool_size=workers))
+    service = CheckoutService(engine, workers)
+    engine.warm_customer_cache()
+    try:
+        asyncio.run(service.serve(host or SERVICE_CONFIG['host'], port or SERVICE_CONFIG['port']))
+    except KeyboardInterrupt:
+        print("\nCheckout service stopped.")
+    finally:
+        service.executor.shutdown(wait=True)
+        engine.close()
+
+def run_rollups(action, backend=None):
+    """`rollups rebuild` backfills the sales rollups from the raw orders; `rollups check` reports drift.
+    Returns a process exit code (1 if the check found mismatches)."""
+    backend = backend or STORAGE_CONFIG['backend']
+    if backend == 'service':
+        backend = SERVICE_CONFIG['backend']
+    engine = STORAGE_ENGINES[backend]()
+    try:
+        if action == 'rebuild':
+            for table, count in engine.rebuild_rollups().items():
+                print(f"{table}: {count} rows rebuilt")
+            return 0
+        problems = engine.check_rollups()
+        for problem in problems:
+            print(problem)
+        print(f"Sales rollups: {'OK' if not problems else f'{len(problems)} mismatches'}")
+        return 1 if problems else 0
+    finally:
+        engine.close()
+
+def run_catalog(args):
+    """`catalog import|export PATH`: bulk catalogue transfer from the command line. Returns a process exit code."""
+    import superstore_catalog as catalog
+
+    if args.backend:
+        STORAGE_CONFIG['backend'] = args.backend
+    engine = get_engine()
+    log = sys.stderr if args.path == '-' else sys.stdout    # Keep stdout clean when it carries the data
+    error_file = open(args.errors, 'w', encoding='utf-8', newline='') if args.errors else None
+    try:
+        if args.action == 'export':
+            start = time.perf_counter()
+            count = catalog.export_catalog(engine, args.path, args.format, args.batch_size)
+            print(f"Exported {count} products in {time.perf_counter() - start:.1f} s", file=log)
+            return 0
+
+        error_writer = csv.writer(error_file) if error_file else None
+        if error_writer:
+            error_writer.writerow(['line', 'error'])
+
+        def on_error(line_no, message):
+            if error_writer:
+                error_writer.writerow([line_no, message])
+            else:
+                print(f"line {line_no}: {message}", file=sys.stderr)
+
+        start = time.perf_counter()
+        summary = catalog.import_catalog(engine, args.path, args.format, args.batch_size, args.stock_mode, args.insert_only,
+                                         on_error=on_error)
+        elapsed = time.perf_counter() - start
+        print(f"{summary['rows']} rows in {elapsed:.1f} s ({summary['rows'] / elapsed if elapsed else 0:,.0f} rows/s): "
+              f"{summary['inserted']} inserted, {summary['updated']} updated, {summary['errors']} rejected, "
+              f"{summary['batches']} batches", file=log)
+        return 1 if summary['errors'] else 0
+    finally:
+        if error_file:
+            error_file.close()
+        close_engine()
+
+def run_journal(action, retry_conflicts=False, backend=None):
+    """`journal status|replay`: list waiting and conflicted sales, or apply the backlog now.
+    Returns a process exit code (1 if conflicts remain, 2 if the database could not be reached)."""
+    if backend:
+        STORAGE_CONFIG['backend'] = backend
+    journal = OrderJournal(JOURNAL_CONFIG['directory'], JOURNAL_CONFIG['fsync_interval'])
+    try:
+        if action == 'replay':
+            if retry_conflicts:
+                print(f"{journal.retry_conflicts()} conflicted sales queued again")
+            replayer = JournalReplayer(journal, get_engine, batch_size=JOURNAL_CONFIG['replay_batch'])
+            start = time.perf_counter()
+            try:
+                applied, conflicts = replayer.replay_all()
+            except DB_ERRORS + (PoolTimeoutError,) as err:
+                print(f"Replay stopped, database unreachable: {err}")
+                return 2
+            print(f"Replayed {applied + conflicts} sales in {time.perf_counter() - start:.1f} s: "
+                  f"{applied} applied, {conflicts} stock conflicts")
+        print_journal_status(journal)
+        return 1 if journal.conflicts else 0
+    finally:
+        journal.close()
+        close_engine()
+
+def run_reservations(action, backend=None):
+    """`reservations status|sweep`: show the stock held by open carts, or return expired holds to stock now."""
+    if backend:
+        STORAGE_CONFIG['backend'] = backend
+    engine = get_engine()
+    try:
+        if action == 'sweep':
+            print(f"{engine.sweep_reservations()} expired units returned to stock")
+        summary = engine.reservation_summary()
+        print(f"Open carts: {summary['carts']} holding {summary['cart_units']} units | "
+              f"hot-product allotments: {summary['allotment_units']} units | expired, awaiting sweep: {summary['expired_units']} units")
+        return 0
+    finally:
+        close_engine()
+
+def sell_batch_order(engine, order, products):
+    """One order from a batch file through the billing checks and complete_sale; returns its result record
+    (with the sale to print a receipt for under 'sale' when it went through)."""
+    start = time.perf_counter()
+    cart = Cart()
+    error = validate_customer(order['name'], order['mobile'])
+    for product_id, quantity in order['lines'] if error is None else ():
+        item = products.get(str(product_id)) or engine.get_product(product_id)
+        if item is None:
+            error = f"Invalid Item Number: {product_id}"
+            break
+        cart.add(item, quantity)
+    result = {'line': order['line'], 'ref': order['ref'], 'status': 'rejected', 'order_id': None, 'customer': None}
+    if error is None:
+        try:
+            order_id, customer_name, journaled = complete_sale(engine, cart, order['name'], order['mobile'],
+                                                               order['email'], key=order['key'])
+            result.update(status='journaled' if journaled else 'committed', order_id=order_id, customer=customer_name)
+            note = "Order number assigned when this sale reaches the database." if journaled else None
+            result['sale'] = Sale(order_id, cart.lines(), cart.total, order['mobile'], customer_name,
+                                  datetime.datetime.now(), note)
+        except Exception as e:
+            error = str(e)
+    result.update(lines=len(cart), units=cart.units, total=cart.total, error=error,
+                  ms=round((time.perf_counter() - start) * 1000, 2))
+    return result
+
+def run_batch(args):
+    """`batch PATH`: bills every order in a JSONL/CSV file (or stdin) with no prompts, writing one result
+    line per order and a closing summary. Returns a process exit code (1 if any order was rejected)."""
+    import superstore_batch as batch
+
+    if args.backend:
+        STORAGE_CONFIG['backend'] = args.backend
+    if args.group_commit:
+        CHECKOUT_CONFIG['group_commit'] = True
+    log = sys.stderr if args.results == '-' else sys.stdout    # Keep stdout clean when it carries the results
+    engine = get_engine()
+    try:
+        rows = engine.list_inventory()
+    except DB_ERRORS + (PoolTimeoutError,) as err:
+        engine = open_offline_engine() if get_journal() else None
+        if engine is None:
+            print(f"Database unreachable: {err}", file=log)
+            close_engine()
+            return 2
+        print("Database unreachable: billing from the saved catalogue; sales are journaled.", file=log)
+        rows = engine.list_inventory()
+    # Prices as of the start of the batch, like a till's cart; products added meanwhile are looked up one by one.
+    products = {str(item['product_id']): item for item in rows}
+
+    counts = collections.Counter()
+    latencies = []
+    line_count, revenue = 0, ZERO
+    store = get_receipt_store()
+    sold = []   # Sales whose receipts are rendered and stored together, RECEIPT_CONFIG['batch'] at a time
+    workers = max(1, args.workers)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') if workers > 1 else None
+    start = time.perf_counter()
+    try:
+        with batch.open_stream(args.path, 'r') as source, batch.open_stream(args.results, 'w') as results, \
+                (batch.open_stream(args.receipts, 'w') if args.receipts else contextlib.nullcontext()) as receipts_out:
+
+            def flush_receipts():
+                if not sold:
+                    return
+                texts = render_receipts(sold)
+                if store is not None:
+                    store_receipts(sold, texts)
+                if receipts_out is not None:
+                    receipts_out.write(''.join(text + '\n' for text in texts))
+                sold.clear()
+
+            def write(result):
+                nonlocal line_count, revenue
+                sale = result.pop('sale', None)
+                if sale is not None and (store is not None or receipts_out is not None):
+                    sold.append(sale)
+                    if len(sold) >= RECEIPT_CONFIG['batch']:
+                        flush_receipts()
+                counts[result['status']] += 1
+                if result['status'] != 'rejected':
+                    revenue += result['total']
+                    line_count += result['lines']
+                latencies.append(result['ms'])
+                results.write(json.dumps(result, default=str) + '\n')
+
+            pending = collections.deque()    # Futures (or ready results) in input order
+            for order, error in batch.read_orders(source, batch.detect_format(args.path, args.format)):
+                if error is not None:
+                    result = {'line': order['line'], 'ref': order['ref'], 'status': 'rejected', 'order_id': None,
+                              'customer': None, 'lines': 0, 'units': 0, 'total': ZERO, 'error': error, 'ms': 0.0}
+                elif pool is None:
+                    result = sell_batch_order(engine, order, products)
+                else:
+                    result = pool.submit(sell_batch_order, engine, order, products)
+                pending.append(result)
+                # A bounded window keeps memory flat on large files while every worker stays busy.
+                while pending and (len(pending) > workers * 4 or not hasattr(pending[0], 'result')):
+                    head = pending.popleft()
+                    write(head.result() if hasattr(head, 'result') else head)
+            while pending:
+                head = pending.popleft()
+                write(head.result() if hasattr(head, 'result') else head)
+            flush_receipts()
+
+            elapsed = time.perf_counter() - start
+            latencies.sort()
+            orders = len(latencies)
+
+            def percentile(p):
+                return latencies[min(orders - 1, int(orders * p))] if orders else 0.0
+
+            summary = {'orders': orders, 'committed': counts['committed'], 'journaled': counts['journaled'],
+                       'rejected': counts['rejected'], 'revenue': revenue, 'seconds': round(elapsed, 3),
+                       'orders_per_s': round(orders / elapsed, 1) if elapsed else 0.0,
+                       'lines_per_s': round(line_count / elapsed, 1) if elapsed else 0.0,
+                       'p50_ms': percentile(0.50), 'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99)}
+            results.write(json.dumps({'summary': summary}, default=str) + '\n')
+        print(f"{orders} orders in {elapsed:.1f} s ({summary['orders_per_s']:,.0f} orders/s, "
+              f"{summary['lines_per_s']:,.0f} lines/s): {summary['committed']} committed, "
+              f"{summary['journaled']} journaled, {summary['rejected']} rejected | "
+              f"p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms", file=log)
+        return 1 if counts['rejected'] else 0
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        journal = _JOURNAL
+        if journal and journal.pending:
+            print(f"{len(journal.pending)} journaled sales are waiting for the database "
+                  "(superstore_cli.py journal replay).", file=log)
+        close_journal()
+        close_receipts()
+        close_engine()
+
+def run_archive(args):
+    """`archive run|verify|status`: move closed months of orders to the cold archive, re-check it, or list it.
+    Returns a process exit code (1 if the archive and the database disagree)."""
+    import superstore_archive as cold
+
+    backend = args.backend or STORAGE_CONFIG['backend']
+    if backend == 'service':
+        backend = SERVICE_CONFIG['backend']     # Archiving deletes rows, so it talks to the database itself
+    engine = STORAGE_ENGINES[backend]()
+    try:
+        archive = cold.OrderArchive(args.directory)
+        if args.action == 'run':
+            start = time.perf_counter()
+            try:
+                names = cold.archive_orders(engine, archive, args.before)
+            except (cold.ArchiveError, ValueError) as err:
+                print(f"!!! Archiving stopped: {err} !!!")
+                return 1
+            print(f"{len(names)} partitions archived in {time.perf_counter() - start:.1f} s")
+        problems = cold.verify_archive(engine, archive) if args.action != 'status' else []
+        for name, part in sorted(archive.partitions.items()):
+            line = f"{name:<10} {part['state']:<9}"
+            if part['state'] != 'exporting':
+                line += (f" {part['orders']:>10} orders {part['items']:>11} lines  ₹{cold._money(part['revenue_paisa']):>14}"
+                         f"  {archive.size_bytes(name) / 2**20:8.1f} MiB")
+            print(line)
+        hot = engine.query_all("SELECT COUNT(*) AS orders, MIN(order_date) AS first FROM Orders")[0]
+        print(f"Hot tables: {hot['orders']} orders since {hot['first'] or '-'} | archive cut-off: before {cold.cutoff_month()}")
+        for problem in problems:
+            print(problem)
+        if args.action != 'status':
+            print(f"Order archive: {'OK' if not problems else f'{len(problems)} problems'}")
+        return 1 if problems else 0
+    finally:
+        engine.close()
+
+def run_receipts(args):
+    """`receipts find|status|index`: print stored receipts again, show the store, or sort its unindexed
+    receipts into the indexes now. Returns a process exit code (1 if nothing matched)."""
+    store = ReceiptStore(args.directory or RECEIPT_CONFIG['directory'])
+    try:
+        if args.action == 'find':
+            try:
+                found = find_receipts(store, ' '.join(args.query), args.limit)
+            except ValueError as err:
+                print(f"!!! {err} !!!")
+                return 1
+            for receipt in found:
+                print(receipt.text)
+            if not found:
+                print("No stored receipt matches.")
+            return 0 if found else 1
+        if args.action == 'index':
+            start = time.perf_counter()
+            store.seal()
+            print(f"Indexed in {time.perf_counter() - start:.2f} s")
+        stats = store.stats()
+        print(f"Receipt store {store.directory}: {stats['receipts']:,} receipts in {stats['data_bytes'] / 2**20:.1f} MiB "
+              f"({stats['data_bytes'] / max(stats['receipts'], 1):.0f} bytes each) | index {stats['index_bytes'] / 2**20:.1f} MiB, "
+              f"{stats['runs']} sorted runs, {stats['unsorted']} receipts not sorted yet")
+        return 0
+    finally:
+        store.close()
 
 # ------------------------------------------------------------------------------
-# 5. MAIN APPLICATION ENTRY POINT
+# 7. MAIN APPLICATION ENTRY POINT
 # ------------------------------------------------------------------------------
 
 def main():
@@ -522,10 +1294,94 @@ def main():
                 inventory_portal()
         elif choice == '3':
             print("\nSystem shutting down. Goodbye!")
+            journal = _JOURNAL
+            if journal and journal.pending:
+                print(f"{len(journal.pending)} journaled sales are still waiting for the database; "
+                      "they are replayed the next time the CLI runs (or: superstore_cli.py journal replay).")
+            close_journal()
+            close_receipts()
+            close_engine()
+            if os.environ.get('SUPERSTORE_METRICS_DUMP'):
+                METRICS.dump()
             break
         else:
             print("!!! Invalid choice. Please select 1, 2, or 3. !!!")
             input("Press Enter to continue...")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Super Store Management System (CLI)")
+    commands = parser.add_subparsers(dest='command')
+    serve_parser = commands.add_parser('serve', help="Run the checkout service that tills connect to")
+    serve_parser.add_argument('--host', help=f"Listen address (default {SERVICE_CONFIG['host']})")
+    serve_parser.add_argument('--port', type=int, help=f"Listen port (default {SERVICE_CONFIG['port']})")
+    serve_parser.add_argument('--backend', choices=['mysql', 'sqlite'], help="Storage backend behind the service")
+    serve_parser.add_argument('--workers', type=int, help="Database worker threads / pooled connections")
+    serve_parser.add_argument('--group-commit', action='store_true',
+                              help="Share one transaction between checkouts arriving within a few ms (see CHECKOUT_CONFIG)")
+    rollups_parser = commands.add_parser('rollups', help="Rebuild or verify the sales rollup tables")
+    rollups_parser.add_argument('action', choices=['rebuild', 'check'])
+    rollups_parser.add_argument('--backend', choices=['mysql', 'sqlite'], help="Storage backend holding the orders")
+    catalog_parser = commands.add_parser('catalog', help="Bulk import or export the product catalogue (CSV or JSONL)")
+    catalog_parser.add_argument('action', choices=['import', 'export'])
+    catalog_parser.add_argument('path', help="File to read or write ('-' for stdin/stdout)")
+    catalog_parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension")
+    catalog_parser.add_argument('--batch-size', type=int, help="Rows per upsert and commit (default 5000)")
+    catalog_parser.add_argument('--stock-mode', choices=['set', 'add'], default='set',
+                                help="'set' replaces stock levels, 'add' adds to them (restock sheets)")
+    catalog_parser.add_argument('--insert-only', action='store_true', help="Reject rows naming an existing product")
+    catalog_parser.add_argument('--errors', help="Write rejected rows (line, error) to this CSV file")
+    catalog_parser.add_argument('--backend', choices=sorted(STORAGE_ENGINES), help="Storage backend (default from STORAGE_CONFIG)")
+    journal_parser = commands.add_parser('journal', help="Show or replay the offline order journal")
+    journal_parser.add_argument('action', choices=['status', 'replay'])
+    journal_parser.add_argument('--retry-conflicts', action='store_true',
+                                help="Queue sales that failed on stock again (after restocking) before replaying")
+    journal_parser.add_argument('--backend', choices=sorted(STORAGE_ENGINES), help="Storage backend (default from STORAGE_CONFIG)")
+    reservations_parser = commands.add_parser('reservations', help="Show or sweep the stock held by open carts")
+    reservations_parser.add_argument('action', choices=['status', 'sweep'])
+    reservations_parser.add_argument('--backend', choices=sorted(STORAGE_ENGINES), help="Storage backend (default from STORAGE_CONFIG)")
+    batch_parser = commands.add_parser('batch', help="Bill a file of orders (JSONL or CSV) without prompts")
+    batch_parser.add_argument('path', help="Orders to bill ('-' for stdin); formats in superstore_batch.py")
+    batch_parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension (stdin: JSONL)")
+    batch_parser.add_argument('--results', default='-', help="Write per-order results and the summary here as JSONL (default stdout)")
+    batch_parser.add_argument('--workers', type=int, default=1, help="Orders checked out concurrently (default 1)")
+    batch_parser.add_argument('--group-commit', action='store_true',
+                              help="Share one transaction between concurrent checkouts (see CHECKOUT_CONFIG)")
+    batch_parser.add_argument('--receipts', help="Also write every receipt to this text file (they are kept for reprints "
+                              "either way, see RECEIPT_CONFIG)")
+    batch_parser.add_argument('--backend', choices=sorted(STORAGE_ENGINES), help="Storage backend (default from STORAGE_CONFIG)")
+    archive_parser = commands.add_parser('archive', help="Move closed months of orders to the cold archive, or check it")
+    archive_parser.add_argument('action', choices=['run', 'verify', 'status'])
+    archive_parser.add_argument('--before', help="Archive months before this one, YYYY-MM (default: all but the last "
+                                "ARCHIVE_CONFIG['hot_months'])")
+    archive_parser.add_argument('--directory', help="Archive directory (default SUPERSTORE_ARCHIVE_DIR or ./superstore_archive)")
+    archive_parser.add_argument('--backend', choices=['mysql', 'sqlite'], help="Storage backend holding the orders")
+    receipts_parser = commands.add_parser('receipts', help="Reprint stored receipts, or show the receipt store")
+    receipts_parser.add_argument('action', choices=['find', 'status', 'index'])
+    receipts_parser.add_argument('query', nargs='*', help="find: an order ID, a 10-digit mobile and/or a date YYYY-MM-DD")
+    receipts_parser.add_argument('--limit', type=int, default=RECEIPT_LIST_LIMIT,
+                                 help=f"find: most receipts printed, newest first (default {RECEIPT_LIST_LIMIT})")
+    receipts_parser.add_argument('--directory', help="Receipt store (default SUPERSTORE_RECEIPT_DIR or ./superstore_receipts)")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        if args.group_commit:
+            CHECKOUT_CONFIG['group_commit'] = True
+        run_service(args.host, args.port, args.backend, args.workers)
+    elif args.command == 'rollups':
+        sys.exit(run_rollups(args.action, args.backend))
+    elif args.command == 'catalog':
+        sys.exit(run_catalog(args))
+    elif args.command == 'journal':
+        sys.exit(run_journal(args.action, args.retry_conflicts, args.backend))
+    elif args.command == 'reservations':
+        sys.exit(run_reservations(args.action, args.backend))
+    elif args.command == 'archive':
+        sys.exit(run_archive(args))
+    elif args.command == 'batch':
+        sys.exit(run_batch(args))
+    elif args.command == 'receipts':
+        sys.exit(run_receipts(args))
+    else:
+        main()
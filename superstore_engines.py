@@ -0,0 +1,1592 @@
+"""Storage engines for the Super Store CLI.
+
+StorageEngine holds the store operations (inventory, checkout, customers, rollups, reservations),
+written once with %s placeholders; MySQLEngine and SQLiteEngine supply the connection pool and the
+few dialect differences, and RemoteEngine forwards every operation to the checkout service. The
+offline SnapshotEngine lives with the order journal (superstore_journal).
+
+    engine = STORAGE_ENGINES[STORAGE_CONFIG['backend']]()
+    order_id, customer = engine.checkout(cart.lines(), cart.total, name, mobile)
+"""
+try:
+    import mysql.connector
+except ImportError:     # Only the MySQL backend needs the connector; the SQLite backend runs without it.
+    mysql = None
+import contextlib
+import datetime
+import decimal
+import functools
+import itertools
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+
+from superstore_cache import CUSTOMER_CACHE_CONFIG, INVENTORY_CACHE_CONFIG, CustomerCache, InventoryCache, ProductIndex
+from superstore_cart import ZERO, InsufficientStockError, to_money
+from superstore_group_commit import GroupCommitter
+from superstore_metrics import METRICS, instrumented
+from superstore_pool import DB_POOL_CONFIG, ConnectionPool, PoolTimeoutError
+from superstore_replicas import REPLICA_CONFIG, MySQLReplica, SQLiteReplica
+from superstore_reservations import RESERVATION_CONFIG, ReservationManager
+
+# ------------------------------------------------------------------------------
+# DATABASE CONFIGURATION (*** CRITICAL: CHANGE THESE VALUES ***)
+# ------------------------------------------------------------------------------
+
+# host, user, password, and database are the minimum required to connect to a MySQL database.
+
+DB_CONFIG = {
+    'host': 'your server',
+    'user': 'user name',      
+    'password': 'your password ', 
+    'database': 'your database name'
+}
+
+'''Key Purpose host MySQL server address (localhost or IP) user Username to 
+login password Password for the userdatabase Name of the database to useport Port MySQL is running on (default 3306)
+charset	Character set used for connection (optional)
+auth_plugin	Authentication plugin (optional, e.g., 'mysql_native_password')'''
+
+# Which storage engine the CLI uses: 'mysql' (the server configured above) or 'sqlite'
+# (an embedded database file, handy for a degraded-mode till or load testing without a MySQL server).
+STORAGE_CONFIG = {
+    'backend': os.environ.get('SUPERSTORE_BACKEND', 'mysql'),
+    'sqlite_path': os.environ.get('SUPERSTORE_SQLITE_PATH', 'superstore.db'),
+    'sqlite_busy_timeout': 10,  # Seconds a writer waits for another connection's write lock
+    'sqlite_cache_mib': 64,     # Page cache per connection; keeps index pages of large catalogues in memory during bulk imports
+}
+
+# The checkout service (superstore_service, started with superstore_cli.py serve) lets many tills share one process and one connection pool.
+# Tills become thin clients by selecting the 'service' backend above.
+SERVICE_CONFIG = {
+    'host': os.environ.get('SUPERSTORE_SERVICE_HOST', '127.0.0.1'),
+    'port': int(os.environ.get('SUPERSTORE_SERVICE_PORT', '8765')),
+    'backend': os.environ.get('SUPERSTORE_SERVICE_BACKEND', 'mysql'),  # Where the service itself stores data
+    'workers': 8,           # Bounded executor size = database connections the service keeps busy at once
+    'client_timeout': 30,   # Seconds a till waits for a service response
+}
+
+class RemoteError(Exception):
+    """An error reported by (or while talking to) the checkout service."""
+
+    def __init__(self, message, code=None, details=None):
+        super().__init__(message)
+        self.code = code
+        self.details = details
+
+class RemoteIntegrityError(RemoteError):
+    """The service rejected a write because of a uniqueness/integrity constraint."""
+
+# Driver errors the CLI reports as "DB Error" regardless of the backend in use.
+DB_ERRORS = (sqlite3.Error, RemoteError) + ((mysql.connector.Error,) if mysql else ())
+INTEGRITY_ERRORS = (sqlite3.IntegrityError, RemoteIntegrityError) + ((mysql.connector.IntegrityError,) if mysql else ())
+
+# Inventory screens show one page at a time, so they stay fast and small at any catalog size.
+INVENTORY_PAGE_SIZE = 20
+
+# The billing portal resolves barcodes and typed names with an in-memory ProductIndex over the whole
+# catalogue (about 1.5 KB per product, built in under 2 s at 100k). Above this many products it looks
+# them up with indexed queries instead (DatabaseLookup), and never loads the whole catalogue.
+PRODUCT_INDEX_MAX_PRODUCTS = int(os.environ.get('SUPERSTORE_INDEX_MAX_PRODUCTS', '200000'))
+
+# Checkout settings. The batched path issues a constant number of statements per order
+# (one multi-row stock decrement and one multi-row OrderItems insert) instead of two per cart line.
+# Group commit lets checkouts that arrive together share one transaction, so a rush of orders pays
+# for one BEGIN/COMMIT (and one log flush on the server) per group instead of one per order.
+CHECKOUT_CONFIG = {
+    'batched': True,
+    'group_commit': os.environ.get('SUPERSTORE_GROUP_COMMIT', '0') == '1',
+    'group_window_ms': 5,       # How long the first checkout of a group waits for others to join
+    'group_max_orders': 32,     # A group is committed at once when this many orders have joined
+    # Products per multi-row stock UPDATE. Each row of a CASE update scans the CASE, so one statement
+    # for a 10,000-line wholesale order would cost O(lines^2); chunks keep it linear.
+    'stock_update_chunk': 500,
+}
+
+def consolidate_lines(order_list):
+    """Returns {product_id: total quantity} for the order, merging repeated product ids."""
+    quantities = {}
+    for item in order_list:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    return quantities
+
+_UPSERT_ASSIGNMENTS = {
+    'set': "{column} = {new}",
+    'add': "{column} = {column} + {new}",
+    'coalesce': "{column} = COALESCE({new}, {column})",
+}
+
+def _upsert_assignments(updates, new_value):
+    """The SET list of an upsert; `new_value` formats a column name into the dialect's 'incoming value' syntax."""
+    return ', '.join(_UPSERT_ASSIGNMENTS[how].format(column=column, new=new_value.format(column))
+                     for column, how in updates.items())
+
+ROLLUP_COUNTERS = {'order_count': 'add', 'items_sold': 'add', 'revenue': 'add'}
+
+# Statements that never change data; anything else run on a primary connection counts as a write.
+_READ_ONLY_STATEMENTS = ('SELECT', 'SHOW', 'WITH')
+
+class _Session(threading.local):
+    """Per-thread state of a StorageEngine: how many primary connections the thread holds, and whether
+    it wrote through them (stamped into last_write_at once the outermost one is handed back)."""
+    depth = 0
+    wrote = False
+
+class DatabaseLookup:
+    """ProductIndex's by_barcode() and search() as indexed queries, for a catalogue too large to hold in
+    memory: a barcode is one UNIQUE-index lookup, a name a prefix page on the name index (a substring
+    page only when no name starts with the text). Unlike ProductIndex it does not correct typos."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def by_barcode(self, code):
+        code = code.strip()
+        return self.engine.get_product_by_barcode(code) if code else None
+
+    def search(self, text, limit=10):
+        """Barcode first, then names starting with `text`, then names containing it."""
+        text = text.strip()
+        entry = self.by_barcode(text)
+        if entry or not text:
+            return [entry] if entry else []
+        rows, _ = self.engine.inventory_page(page_size=limit, name_prefix=text)
+        if not rows:
+            rows, _ = self.engine.inventory_page(page_size=limit, name_contains=text)
+        return rows
+
+class StorageEngine:
+    """Backend-neutral store operations used by the CLI.
+
+    Queries are written once with %s placeholders. Subclasses provide the connection pool and the
+    few dialect differences: placeholder style, how a write transaction is opened and schema setup.
+    """
+
+    name = 'base'
+    text_keys_ignore_case = True   # UNIQUE text columns compare case-insensitively (MySQL's default collation)
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.replicas = []              # Replica objects reads may be routed to (see read_connection)
+        self.last_write_at = 0.0        # Wall-clock time of this process's latest write to the primary
+        self._session = _Session()
+        self._replica_turn = itertools.count()
+        self.inventory_cache = InventoryCache(self.inventory_rows_since, **INVENTORY_CACHE_CONFIG)
+        self.customer_cache = CustomerCache(CUSTOMER_CACHE_CONFIG['max_entries'], CUSTOMER_CACHE_CONFIG['ttl_seconds'])
+        self._product_index = None
+        self._database_lookup = None
+        self._group_committer = None
+        self._group_committer_lock = threading.Lock()
+        self.reservations = ReservationManager(self)
+
+    # --- Connection and dialect hooks -------------------------------------------
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrows a pooled connection to the primary for the duration of a `with` block."""
+        with METRICS.timed('pool.acquire'):
+            conn = self.pool.acquire()
+        session = self._session
+        session.depth += 1
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+            session.depth -= 1
+            if not session.depth and session.wrote:
+                # Stamped after the commit, so a replica that has caught up to this time holds the write.
+                session.wrote = False
+                self.last_write_at = time.time()
+
+    @contextlib.contextmanager
+    def read_connection(self):
+        """Borrows a connection for read-only work: a replica no more than max_staleness_seconds behind that
+        already has this process's last write, else the primary. Reads nested in a primary connection
+        (a transaction in progress) stay on the primary."""
+        replica = self._fresh_replica()
+        if replica is None:
+            with self.connection() as conn:
+                yield conn
+        else:
+            with replica.connection() as conn:
+                yield conn
+
+    def _fresh_replica(self):
+        """The next replica (round robin) fit to serve a read now, or None."""
+        if not self.replicas or self._session.depth:
+            return None
+        now = time.time()
+        behind_own_write = False
+        turn = next(self._replica_turn)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(turn + offset) % len(self.replicas)]
+            applied_at = replica.applied_at()
+            if applied_at is None or now - applied_at > REPLICA_CONFIG['max_staleness_seconds']:
+                continue
+            if applied_at < self.last_write_at:
+                behind_own_write = True
+                continue
+            METRICS.count('reads.replica')
+            return replica
+        METRICS.count('reads.primary_own_write' if behind_own_write else 'reads.primary_no_replica')
+        return None
+
+    def sql(self, query):
+        """Adapts a %s-style query to the driver's placeholder style."""
+        return query
+
+    def begin(self, conn):
+        """Opens a write transaction."""
+        conn.start_transaction()
+
+    def execute(self, cursor, query, params=()):
+        if self.replicas and not query.lstrip()[:6].upper().startswith(_READ_ONLY_STATEMENTS):
+            self._session.wrote = True  # Read-your-writes bookkeeping (see _fresh_replica)
+        if not METRICS.enabled:
+            cursor.execute(self.sql(query), params)
+            return cursor
+        start = time.perf_counter()
+        try:
+            cursor.execute(self.sql(query), params)
+        except Exception:
+            METRICS.record_statement(query, params, time.perf_counter() - start, error=True)
+            raise
+        METRICS.record_statement(query, params, time.perf_counter() - start, cursor.rowcount)
+        return cursor
+
+    def stream_cursor(self, conn):
+        """A cursor that fetches rows from the server as they are read instead of all at once."""
+        return conn.cursor()
+
+    def finish_stream(self, conn, cursor):
+        """Closes a streaming cursor, even if the caller stopped reading early."""
+        cursor.close()
+
+    def executemany(self, cursor, query, seq_of_params):
+        if self.replicas:
+            self._session.wrote = True
+        if not METRICS.enabled:
+            cursor.executemany(self.sql(query), seq_of_params)
+            return cursor
+        if not isinstance(seq_of_params, (list, tuple)):
+            seq_of_params = list(seq_of_params)    # So the slow log can show (a prefix of) the batch
+        start = time.perf_counter()
+        try:
+            cursor.executemany(self.sql(query), seq_of_params)
+        except Exception:
+            METRICS.record_statement(query, seq_of_params, time.perf_counter() - start, error=True)
+            raise
+        METRICS.record_statement(query, seq_of_params, time.perf_counter() - start, cursor.rowcount)
+        return cursor
+
+    def upsert_sql(self, table, key_columns, updates):
+        """INSERT of one row that updates the stored row instead when the key already exists.
+
+        `updates` maps each non-key column to how an existing value changes: 'set' replaces it,
+        'add' adds the new value onto it and 'coalesce' replaces it unless the new value is NULL.
+        """
+        columns = key_columns + list(updates)
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE " + _upsert_assignments(updates, "VALUES({})"))
+
+    def hour_bucket_sql(self, column):
+        """SQL expression (and its params) truncating a timestamp column to the start of its hour."""
+        return f"DATE_FORMAT({column}, %s)", ['%Y-%m-%d %H:00:00']
+
+    def hour_of_day_sql(self, column):
+        """SQL expression (and its params) giving the hour of day (0-23) of a timestamp column."""
+        return f"HOUR({column})", []
+
+    def locking_read(self, query, exclusive=False):
+        """Turns a SELECT into one that reads the latest committed rows and locks them until commit
+        (exclusively when the transaction is going to change them)."""
+        return query + (" FOR UPDATE" if exclusive else " LOCK IN SHARE MODE")
+
+    @staticmethod
+    def rows_as_dicts(cursor, rows):
+        """Turns plain DB-API rows into dicts keyed by column name."""
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def query_all(self, query, params=(), replica=False):
+        """Runs a read-only query and returns every row as a dict (`replica`: see _read)."""
+        return self._read(query, params, lambda cursor: self.rows_as_dicts(cursor, cursor.fetchall()), replica)
+
+    def query_value(self, query, params=(), replica=False):
+        """Runs a read-only query and returns the first column of the first row (or None)."""
+        def first(cursor):
+            row = cursor.fetchone()
+            return row[0] if row else None
+        return self._read(query, params, first, replica)
+
+    def _read(self, query, params, fetch, replica=False):
+        """Runs one query and returns fetch(cursor). With `replica` it may be served by a read replica
+        (see read_connection); if that replica fails, the query is run again on the primary."""
+        target = self._fresh_replica() if replica else None
+        if target is not None:
+            try:
+                with target.connection() as conn:
+                    return self._fetch(conn, query, params, fetch)
+            except DB_ERRORS + (PoolTimeoutError,):
+                METRICS.count('reads.replica_errors')
+        with self.connection() as conn:
+            return self._fetch(conn, query, params, fetch)
+
+    def _fetch(self, conn, query, params, fetch):
+        cursor = conn.cursor()
+        try:
+            self.execute(cursor, query, params)
+            return fetch(cursor)
+        finally:
+            cursor.close()
+
+    def ping(self):
+        """Raises a driver error if the database cannot be reached."""
+        self.query_value("SELECT 1")
+
+    def lock_wait_seconds(self):
+        """Cumulative time writers spent waiting for database locks, or None if the backend cannot tell."""
+        return None
+
+    def stock(self, product_id):
+        """Live stock level for one product (None if it does not exist)."""
+        return self.query_value("SELECT stock_quantity FROM Inventory WHERE product_id = %s", (product_id,))
+
+    def close(self):
+        try:
+            self.reservations.close()
+        except DB_ERRORS + (PoolTimeoutError,):
+            pass    # The expiry sweep returns the allotments instead
+        for replica in self.replicas:
+            replica.close()
+        self.pool.close_all()
+
+    # --- Store operations --------------------------------------------------------
+
+    @instrumented('op.authenticate')
+    def authenticate(self, username, password, role_required):
+        """Returns the matching user row ({'username', 'role'}) or None."""
+        # IMPORTANT: The 'password_hash' column stores the raw password string for this example
+        users = self.query_all("SELECT username, role FROM Users WHERE username = %s AND password_hash = %s AND role = %s",
+                               (username, password, role_required))
+        return users[0] if users else None
+
+    @instrumented('op.inventory_fetch')
+    def inventory_rows_since(self, since):
+        """Inventory rows (with updated_at) changed at or after `since`; every row ordered by id when None."""
+        if since is None:
+            return self.query_all("SELECT product_id, name, price, stock_quantity, barcode, updated_at FROM Inventory ORDER BY product_id",
+                                  replica=True)
+        return self.query_all("SELECT product_id, name, price, stock_quantity, barcode, updated_at FROM Inventory WHERE updated_at >= %s",
+                              (since,), replica=True)
+
+    def list_inventory(self):
+        """Current inventory ordered by product_id (served from the inventory cache)."""
+        return self.inventory_cache.get_inventory()
+
+    def product_index(self):
+        """The in-memory ProductIndex: built on first use, then kept current by the cache's delta refreshes."""
+        if self._product_index is None:
+            index = ProductIndex()
+            self.inventory_cache.listeners.append(index.apply)
+            self.inventory_cache.clear()    # Next read is a full load, which (re)builds the index
+            self._product_index = index
+        self.inventory_cache.get_inventory()
+        return self._product_index
+
+    def product_lookup(self):
+        """What the billing portal looks products up with: product_index(), or a DatabaseLookup when the
+        catalogue holds more than PRODUCT_INDEX_MAX_PRODUCTS products (decided once per engine)."""
+        if self._product_index is None and self._database_lookup is None:
+            if self.product_count() > PRODUCT_INDEX_MAX_PRODUCTS:
+                self._database_lookup = DatabaseLookup(self)
+        return self._database_lookup or self.product_index()
+
+    @instrumented('op.product_count')
+    def product_count(self):
+        return self.query_value("SELECT COUNT(*) FROM Inventory", replica=True)
+
+    @instrumented('op.get_product_by_barcode')
+    def get_product_by_barcode(self, barcode):
+        """One inventory row by barcode (UNIQUE index lookup), or None."""
+        rows = self.query_all("SELECT product_id, name, price, stock_quantity, barcode FROM Inventory WHERE barcode = %s",
+                              (barcode,), replica=True)
+        return rows[0] if rows else None
+
+    @staticmethod
+    def _like(text, prefix_only):
+        """LIKE pattern for a literal search text ('!' is the escape character in both dialects)."""
+        escaped = text.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+        return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+    def iter_inventory(self, name_prefix=None, name_contains=None, max_stock=None, after_id=0, limit=None, batch_size=500):
+        """Streams matching inventory rows in product_id order without loading the whole result into memory.
+
+        Filters: name prefix (uses the name index), name substring, and low stock (stock_quantity <= max_stock).
+        `after_id` gives keyset pagination: the next page starts after the last product_id already shown.
+        """
+        where, params = ["product_id > %s"], [after_id]
+        if name_prefix:
+            where.append("name LIKE %s ESCAPE '!'")
+            params.append(self._like(name_prefix, prefix_only=True))
+        if name_contains:
+            where.append("name LIKE %s ESCAPE '!'")
+            params.append(self._like(name_contains, prefix_only=False))
+        if max_stock is not None:
+            where.append("stock_quantity <= %s")
+            params.append(max_stock)
+        query = f"SELECT product_id, name, price, stock_quantity, barcode FROM Inventory WHERE {' AND '.join(where)} ORDER BY product_id"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        with self.read_connection() as conn:
+            cursor = self.stream_cursor(conn)
+            try:
+                self.execute(cursor, query, params)
+                names = [column[0] for column in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(zip(names, row))
+            finally:
+                self.finish_stream(conn, cursor)
+
+    @instrumented('op.inventory_page')
+    def inventory_page(self, after_id=0, page_size=INVENTORY_PAGE_SIZE, name_prefix=None, name_contains=None, max_stock=None):
+        """One page of (optionally filtered) inventory: returns (rows, has_more)."""
+        key = ('page', after_id, page_size, name_prefix, name_contains, max_stock)
+
+        def load():
+            rows = list(self.iter_inventory(name_prefix, name_contains, max_stock, after_id, limit=page_size + 1))
+            return rows[:page_size], len(rows) > page_size
+
+        return self.inventory_cache.memo(key, load)
+
+    @instrumented('op.get_product')
+    def get_product(self, product_id):
+        """One inventory row by id (primary-key lookup), or None."""
+        rows = self.query_all("SELECT product_id, name, price, stock_quantity, barcode FROM Inventory WHERE product_id = %s",
+                              (product_id,), replica=True)
+        return rows[0] if rows else None
+
+    @instrumented('op.add_product')
+    def add_product(self, name, price, quantity, barcode=None):
+        """Inserts a new product and returns its id. Raises one of INTEGRITY_ERRORS for a duplicate name or barcode."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self.execute(cursor, "INSERT INTO Inventory (name, price, stock_quantity, barcode) VALUES (%s, %s, %s, %s)",
+                             (name, price, quantity, barcode or None))
+                conn.commit()
+                self.inventory_cache.invalidate()
+                return cursor.lastrowid
+            finally:
+                cursor.close()
+
+    @instrumented('op.restock')
+    def restock(self, product_id, add_qty):
+        """Adds `add_qty` units to a product. Returns False if the product does not exist."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self.execute(cursor, "UPDATE Inventory SET stock_quantity = stock_quantity + %s WHERE product_id = %s",
+                             (add_qty, product_id))
+                conn.commit()
+                self.inventory_cache.invalidate()
+                return cursor.rowcount > 0
+            finally:
+                cursor.close()
+
+    @instrumented('op.upsert_products')
+    def upsert_products(self, rows, stock_mode='set', insert_only=False):
+        """Writes one batch of catalogue rows in a single transaction: new names are inserted, existing ones updated.
+
+        `rows` are (line_no, {'name', 'price', 'stock_quantity', 'barcode'}) pairs that already passed validation.
+        stock_mode 'set' replaces the stock level, 'add' adds onto it (restock files). With insert_only, rows
+        naming an existing product are rejected instead. Returns (inserted, updated, errors) where errors
+        is a list of (line_no, message) for the rows that were not written.
+        """
+        fold = str.casefold if self.text_keys_ignore_case else str
+        query = self.upsert_sql('Inventory', ['name'], {'price': 'set', 'stock_quantity': 'add' if stock_mode == 'add' else 'set',
+                                                        'barcode': 'coalesce'})
+        errors, accepted = [], []
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.rollback()
+                self.begin(conn)
+                # Two indexed lookups per batch give exact per-row errors without trying each row against the database.
+                existing = {fold(name) for name, in self._matching(cursor, 'name', [row['name'] for _, row in rows])}
+                barcode_owner = dict(self._matching(cursor, 'barcode', [row['barcode'] for _, row in rows if row.get('barcode')],
+                                                    extra_column='name'))
+                for line_no, row in rows:
+                    owner = barcode_owner.get(row.get('barcode'))
+                    if insert_only and fold(row['name']) in existing:
+                        errors.append((line_no, f"Product '{row['name']}' already exists"))
+                    elif owner is not None and fold(owner) != fold(row['name']):
+                        errors.append((line_no, f"Barcode {row['barcode']} already belongs to '{owner}'"))
+                    else:
+                        accepted.append((line_no, row))
+
+                # New names go through a plain INSERT (cheaper than an upsert that has to probe every unique key);
+                # the upsert only handles rows already in the table. Both are one multi-row statement on MySQL.
+                new_rows, old_rows = [], []
+                for _, row in accepted:
+                    params = (row['name'], row['price'], row['stock_quantity'], row.get('barcode') or None)
+                    (old_rows if fold(row['name']) in existing else new_rows).append(params)
+                try:
+                    if new_rows:
+                        self.executemany(cursor, "INSERT INTO Inventory (name, price, stock_quantity, barcode) VALUES (%s, %s, %s, %s)",
+                                         new_rows)
+                    if old_rows:
+                        self.executemany(cursor, query, old_rows)
+                except DB_ERRORS:
+                    # Something the checks above cannot see (a name added by another session meanwhile, a stock
+                    # total breaking a CHECK): redo the batch row by row so only the offending rows are rejected.
+                    conn.rollback()
+                    METRICS.count('rollbacks.import_batch')
+                    self.begin(conn)
+                    accepted = self._upsert_rows_individually(cursor, query, accepted, errors)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                METRICS.count('rollbacks.import')
+                raise
+            finally:
+                cursor.close()
+        self.inventory_cache.invalidate()
+        inserted = sum(1 for _, row in accepted if fold(row['name']) not in existing)
+        return inserted, len(accepted) - inserted, sorted(errors)
+
+    def _matching(self, cursor, column, values, extra_column=None):
+        """Rows of Inventory whose `column` is one of `values`: (column,) or (column, extra_column) tuples."""
+        if not values:
+            return []
+        selected = column + (f", {extra_column}" if extra_column else '')
+        self.execute(cursor, f"SELECT {selected} FROM Inventory WHERE {column} IN ({', '.join(['%s'] * len(values))})", values)
+        return cursor.fetchall()
+
+    def _upsert_rows_individually(self, cursor, query, rows, errors):
+        """Upserts rows one at a time, each behind a savepoint; failures go to `errors`. Returns the rows written."""
+        written = []
+        for line_no, row in rows:
+            self.execute(cursor, "SAVEPOINT import_row")
+            try:
+                self.execute(cursor, query, (row['name'], row['price'], row['stock_quantity'], row.get('barcode') or None))
+            except DB_ERRORS as err:
+                self.execute(cursor, "ROLLBACK TO SAVEPOINT import_row")
+                errors.append((line_no, str(err)))
+            else:
+                written.append((line_no, row))
+        return written
+
+    @instrumented('op.total_earnings')
+    def total_earnings(self):
+        """Total earnings from all completed orders (summed over the SalesDaily rollup, one row per day)."""
+        total_earnings = self.query_value("SELECT SUM(revenue) FROM SalesDaily", replica=True)
+        return to_money(total_earnings) if total_earnings is not None else ZERO
+
+    @instrumented('op.sales_summary')
+    def sales_summary(self, day=None):
+        """Totals from the rollup tables: all-time and for `day` (default today), plus the day's hourly breakdown."""
+        day = day or datetime.date.today()
+        totals = self.query_all("SELECT COALESCE(SUM(order_count), 0) AS orders, COALESCE(SUM(revenue), 0) AS revenue "
+                                "FROM SalesDaily", replica=True)[0]
+        today = self.query_all("SELECT order_count, items_sold, revenue FROM SalesDaily WHERE sales_date = %s", (day,),
+                               replica=True)
+        start = datetime.datetime.combine(day, datetime.time())
+        hours = self.query_all("SELECT sales_hour, order_count, revenue FROM SalesHourly "
+                               "WHERE sales_hour >= %s AND sales_hour < %s ORDER BY sales_hour",
+                               (start, start + datetime.timedelta(days=1)), replica=True)
+        today = today[0] if today else {'order_count': 0, 'items_sold': 0, 'revenue': 0}
+        return {
+            'total_orders': int(totals['orders']),
+            'total_revenue': to_money(totals['revenue']),
+            'day': day.isoformat(),
+            'day_orders': int(today['order_count']),
+            'day_items': int(today['items_sold']),
+            'day_revenue': to_money(today['revenue']),
+            'hours': [{'hour': row['sales_hour'].hour, 'orders': int(row['order_count']), 'revenue': to_money(row['revenue'])}
+                      for row in hours],
+        }
+
+    @instrumented('op.top_products')
+    def top_products(self, limit=5):
+        """Best sellers by revenue, read from the ProductSales rollup."""
+        rows = self.query_all("SELECT p.product_id, i.name, p.units_sold, p.revenue FROM ProductSales p "
+                              "JOIN Inventory i ON i.product_id = p.product_id ORDER BY p.revenue DESC LIMIT %s", (limit,),
+                              replica=True)
+        for row in rows:
+            row['revenue'] = to_money(row['revenue'])
+        return rows
+
+    @instrumented('op.sales_report')
+    def sales_report(self, start=None, end=None, top_n=None):
+        """Detailed analytics over the raw order lines (see superstore_reports; needs NumPy)."""
+        import superstore_reports   # Imported on demand so the CLI itself runs without NumPy
+        return superstore_reports.ReportingEngine(self).report(start, end, top_n)
+
+    # --- Sales rollups -------------------------------------------------------------
+
+    def _update_rollups(self, cursor, order_time, order_list, total_amount):
+        """Adds one order to SalesDaily, SalesHourly and ProductSales (runs inside the checkout transaction).
+
+        Every checkout touches the same day/hour row, so this runs last, just before commit, to hold
+        those row locks for as short a time as possible.
+        """
+        items = sum(item['quantity'] for item in order_list)
+        self.execute(cursor, self.upsert_sql('SalesDaily', ['sales_date'], ROLLUP_COUNTERS),
+                     (order_time.date(), 1, items, total_amount))
+        self.execute(cursor, self.upsert_sql('SalesHourly', ['sales_hour'], ROLLUP_COUNTERS),
+                     (order_time.replace(minute=0, second=0, microsecond=0), 1, items, total_amount))
+        products = {}
+        for item in order_list:
+            units, revenue = products.get(item['product_id'], (0, 0))
+            products[item['product_id']] = (units + item['quantity'], revenue + item['quantity'] * item['price'])
+        self.executemany(cursor, self.upsert_sql('ProductSales', ['product_id'], {'units_sold': 'add', 'revenue': 'add'}),
+                         [(p_id, units, round(revenue, 2)) for p_id, (units, revenue) in sorted(products.items())])
+
+    def _rollups_from_orders(self, cursor):
+        """The three rollups recomputed from Orders/OrderItems plus the order archive (superstore_archive):
+        {table: {key: (counters...)}} with string keys."""
+        import superstore_archive   # Imported on demand: the archive (and NumPy) only matter once something was archived
+        archive = superstore_archive.open_archive()
+        exclude, exclude_params = archive.hot_exclusion('o') if archive else ('', [])
+        where = f" WHERE {exclude}" if exclude else ""
+        hour_expr, hour_params = self.hour_bucket_sql('o.order_date')
+        items_per_order = "(SELECT order_id, SUM(quantity) AS items FROM OrderItems GROUP BY order_id)"
+        product_lines = "OrderItems oi" + (f" JOIN Orders o ON o.order_id = oi.order_id{where}" if exclude else "")
+        queries = {
+            'SalesDaily': ("SELECT DATE(o.order_date), COUNT(*), COALESCE(SUM(i.items), 0), SUM(o.total_amount) "
+                           f"FROM Orders o LEFT JOIN {items_per_order} i ON i.order_id = o.order_id{where} GROUP BY 1",
+                           exclude_params),
+            'SalesHourly': (f"SELECT {hour_expr}, COUNT(*), COALESCE(SUM(i.items), 0), SUM(o.total_amount) "
+                            f"FROM Orders o LEFT JOIN {items_per_order} i ON i.order_id = o.order_id{where} GROUP BY 1",
+                            hour_params + exclude_params),
+            'ProductSales': (f"SELECT oi.product_id, SUM(oi.quantity), SUM(oi.quantity * oi.price_at_sale) FROM {product_lines} "
+                             "GROUP BY oi.product_id", exclude_params),
+        }
+        result = {}
+        for table, (query, params) in queries.items():
+            self.execute(cursor, query, params)
+            result[table] = {str(row[0]): tuple(row[1:]) for row in cursor.fetchall()}
+        for table, rows in (archive.rollups() if archive else {}).items():
+            for key, archived in rows.items():
+                hot = result[table].get(key)
+                # SQLite sums DECIMAL columns as REAL; the archive's money is exact Decimal.
+                result[table][key] = archived if hot is None else tuple(
+                    (to_money(h) if isinstance(h, float) else h) + a for h, a in zip(hot, archived))
+        return result
+
+    ROLLUP_COLUMNS = {
+        'SalesDaily': ('sales_date', 'order_count', 'items_sold', 'revenue'),
+        'SalesHourly': ('sales_hour', 'order_count', 'items_sold', 'revenue'),
+        'ProductSales': ('product_id', 'units_sold', 'revenue'),
+    }
+
+    @instrumented('op.rebuild_rollups')
+    def rebuild_rollups(self):
+        """Recomputes every rollup table from Orders/OrderItems in one transaction (backfill after upgrading,
+        or repair after check_rollups() reports drift). Returns {table: rows written}."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.rollback()
+                self.begin(conn)
+                written = {}
+                for table, rows in self._rollups_from_orders(cursor).items():
+                    columns = self.ROLLUP_COLUMNS[table]
+                    self.execute(cursor, f"DELETE FROM {table}")
+                    self.executemany(cursor,
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                        [(key,) + tuple(values) for key, values in rows.items()])
+                    written[table] = len(rows)
+                conn.commit()
+                return written
+            except Exception:
+                conn.rollback()
+                METRICS.count('rollbacks.rebuild_rollups')
+                raise
+            finally:
+                cursor.close()
+
+    @instrumented('op.check_rollups')
+    def check_rollups(self):
+        """Compares the rollup tables with a fresh aggregate of the raw orders.
+
+        Returns a list of human-readable mismatches (empty when everything agrees). Money is compared to the paisa.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                expected = self._rollups_from_orders(cursor)
+                problems = []
+                for table, columns in self.ROLLUP_COLUMNS.items():
+                    self.execute(cursor, f"SELECT {', '.join(columns)} FROM {table}")
+                    stored = {str(row[0]): tuple(row[1:]) for row in cursor.fetchall()}
+                    for key in sorted(set(expected[table]) | set(stored)):
+                        want, have = expected[table].get(key), stored.get(key)
+                        if want is None or have is None:
+                            problems.append(f"{table} {key}: {'missing' if have is None else 'no matching orders'}")
+                        elif any(to_money(a) != to_money(b) for a, b in zip(want, have)):
+                            problems.append(f"{table} {key}: expected {tuple(map(str, map(to_money, want)))}, "
+                                            f"found {tuple(map(str, map(to_money, have)))}")
+                return problems
+            finally:
+                cursor.close()
+
+    @instrumented('op.checkout')
+    def checkout(self, order_list, total_amount, name, mobile, email=None, batched=None, idempotency_key=None, order_time=None,
+                 cart_id=None):
+        """Writes one order (customer, order header, order items, stock) in a single transaction.
+
+        Returns (order_id, customer_name). On any failure the transaction is rolled back and the error re-raised.
+        An order carrying an idempotency_key is written at most once: repeating the call (e.g. a journal
+        replay after a lost commit acknowledgement) returns the order already stored under that key.
+        Units the cart `cart_id` reserved are used up instead of being taken from stock again.
+        With CHECKOUT_CONFIG['group_commit'] on, the order shares its transaction with concurrent checkouts.
+        """
+        order = {'order_list': order_list, 'total_amount': total_amount, 'name': name, 'mobile': mobile, 'email': email,
+                 'idempotency_key': idempotency_key, 'order_time': order_time, 'cart_id': cart_id}
+        if CHECKOUT_CONFIG['group_commit']:
+            if self._group_committer is None:
+                with self._group_committer_lock:
+                    if self._group_committer is None:
+                        self._group_committer = GroupCommitter(self, CHECKOUT_CONFIG['group_window_ms'] / 1000,
+                                                               CHECKOUT_CONFIG['group_max_orders'])
+            return self._group_committer.submit(order, batched)
+        return self._checkout_one(order, batched)
+
+    def _checkout_one(self, order, batched=None):
+        """checkout() in a transaction of its own."""
+        if batched is None:
+            batched = CHECKOUT_CONFIG['batched']
+
+        with self.connection() as conn:
+            cursor = None
+
+            try:
+                cursor = conn.cursor()
+
+                # FIX: Rollback any hanging transaction state before starting a new one.
+                conn.rollback()
+                with METRICS.timed('checkout.begin'):
+                    self.begin(conn)
+
+                result, customer_id = self._write_order(conn, cursor, order, batched)
+
+                # 6. Commit Transaction
+                with METRICS.timed('checkout.commit'):
+                    conn.commit()
+                self.inventory_cache.invalidate()
+                if customer_id is not None:
+                    self.customer_cache.put(order['mobile'], customer_id, result[1])    # Only committed customers are cached
+                return result
+
+            except Exception as err:
+                # Rollback on any failure
+                conn.rollback()
+                METRICS.count('rollbacks.checkout')
+                if isinstance(err, InsufficientStockError):
+                    METRICS.count('checkout.insufficient_stock')
+                if isinstance(err, INTEGRITY_ERRORS):
+                    self.customer_cache.discard(order['mobile'])    # e.g. the cached customer row no longer exists
+                    if order['idempotency_key']:
+                        # Another writer stored this key between our check and our INSERT: report its order.
+                        existing = self._order_for_key(cursor, order['idempotency_key'])
+                        conn.rollback()     # Ends the read (and releases its lock) before the connection goes back to the pool
+                        if existing:
+                            return existing
+                raise
+
+            finally:
+                # Ensure cursor is closed after transaction attempt
+                if cursor:
+                    cursor.close()
+
+    def _write_order(self, conn, cursor, order, batched, savepoint=None):
+        """Steps 2-5 of a checkout, inside an open write transaction.
+
+        Returns ((order_id, customer_name), customer_id); customer_id is None when the idempotency key
+        was already stored and nothing new was written. `savepoint` names the savepoint a failed order
+        is undone to when the transaction is shared (group commit) instead of rolled back as a whole.
+        """
+        if order.get('idempotency_key'):
+            existing = self._order_for_key(cursor, order['idempotency_key'])
+            if existing:
+                METRICS.count('checkout.duplicate_key')
+                return existing, None
+
+        # 2. Check/Insert Customer (returning customers come from the cache, with no query at all)
+        cached = self.customer_cache.get(order['mobile'])
+        if cached:
+            # Use the name found in the database for the receipt
+            customer_id, customer_name = cached
+        else:
+            with METRICS.timed('checkout.customer_lookup'):
+                customer_id, customer_name = self._resolve_customer(cursor, order['name'], order['mobile'], order.get('email'))
+
+        # 3. Insert Order (stamped here so the rollups below file it under exactly the same day and hour)
+        order_time = (order.get('order_time') or datetime.datetime.now()).replace(microsecond=0)
+        order_insert_query = "INSERT INTO Orders (customer_id, total_amount, order_date, idempotency_key) VALUES (%s, %s, %s, %s)"
+        self.execute(cursor, order_insert_query, (customer_id, order['total_amount'], order_time, order.get('idempotency_key')))
+        order_id = cursor.lastrowid
+
+        # 4. Insert Order Items and Update Inventory Stock (only for units the cart had not reserved)
+        decrement = consolidate_lines(order['order_list'])
+        if order.get('cart_id'):
+            with METRICS.timed('checkout.claim_reservations'):
+                decrement = self._claim_reservations(cursor, order['cart_id'], decrement)
+        with METRICS.timed('checkout.order_lines'):
+            if batched:
+                self._apply_order_lines_batched(conn, cursor, order_id, order['order_list'], savepoint, decrement)
+            else:
+                self._apply_order_lines_per_row(conn, cursor, order_id, order['order_list'], decrement)
+
+        # 5. Update Sales Rollups
+        with METRICS.timed('checkout.rollups'):
+            self._update_rollups(cursor, order_time, order['order_list'], order['total_amount'])
+        return (order_id, customer_name), customer_id
+
+    @instrumented('op.checkout_group')
+    def checkout_group(self, orders, batched=None):
+        """Writes several orders in one transaction (one commit, one log flush), each in its own savepoint.
+
+        `orders` are dicts of checkout() arguments. Returns one entry per order: (order_id, customer_name),
+        or the InsufficientStockError / integrity error that order hit. A failed order is undone back to
+        its savepoint and the others still commit. Any other error rolls back the whole group and is raised.
+        """
+        if batched is None:
+            batched = CHECKOUT_CONFIG['batched']
+        results, committed = [], []
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.rollback()
+                with METRICS.timed('checkout.begin'):
+                    self.begin(conn)
+                for order in orders:
+                    self.execute(cursor, "SAVEPOINT group_order")
+                    try:
+                        result, customer_id = self._write_order(conn, cursor, order, batched, savepoint='group_order')
+                    except (InsufficientStockError,) + INTEGRITY_ERRORS as err:
+                        self.execute(cursor, "ROLLBACK TO SAVEPOINT group_order")
+                        METRICS.count('rollbacks.checkout_savepoint')
+                        if isinstance(err, InsufficientStockError):
+                            METRICS.count('checkout.insufficient_stock')
+                        else:
+                            self.customer_cache.discard(order['mobile'])
+                        result = err
+                    else:
+                        if customer_id is not None:
+                            committed.append((order['mobile'], customer_id, result[1]))
+                    self.execute(cursor, "RELEASE SAVEPOINT group_order")
+                    results.append(result)
+                with METRICS.timed('checkout.commit'):
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                METRICS.count('rollbacks.checkout_group')
+                raise
+            finally:
+                cursor.close()
+
+        self.inventory_cache.invalidate()
+        for mobile, customer_id, customer_name in committed:
+            self.customer_cache.put(mobile, customer_id, customer_name)
+        return results
+
+    def _order_for_key(self, cursor, idempotency_key):
+        """(order_id, customer_name) of the order stored under an idempotency key, or None. Orders moved
+        to the cold archive keep their key in ArchivedOrderKeys, so a late replay still finds them."""
+        self.execute(cursor, self.locking_read(
+            "SELECT o.order_id, c.name FROM Orders o LEFT JOIN Customers c ON c.customer_id = o.customer_id "
+            "WHERE o.idempotency_key = %s"), (idempotency_key,))
+        row = cursor.fetchone()
+        if row is None:
+            self.execute(cursor, "SELECT k.order_id, c.name FROM ArchivedOrderKeys k "
+                                 "LEFT JOIN Customers c ON c.customer_id = k.customer_id WHERE k.idempotency_key = %s",
+                         (idempotency_key,))
+            row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _resolve_customer(self, cursor, name, mobile, email):
+        """Finds or registers the customer inside the checkout transaction; returns (customer_id, name).
+
+        Two tills can register the same new mobile number at once. The second INSERT then hits the
+        UNIQUE key; it is undone back to a savepoint and the row the other till committed is read instead.
+        """
+        self.execute(cursor, "SELECT customer_id, name FROM Customers WHERE mobile_number = %s", (mobile,))
+        customer = cursor.fetchone()
+        if customer:
+            return customer[0], customer[1]
+
+        self.execute(cursor, "SAVEPOINT new_customer")
+        try:
+            self.execute(cursor, "INSERT INTO Customers (name, mobile_number, email) VALUES (%s, %s, %s)", (name, mobile, email or None))
+            return cursor.lastrowid, name
+        except INTEGRITY_ERRORS:
+            self.execute(cursor, "ROLLBACK TO SAVEPOINT new_customer")
+            # A locking read sees the other till's committed row even under a REPEATABLE READ snapshot.
+            self.execute(cursor, self.locking_read("SELECT customer_id, name FROM Customers WHERE mobile_number = %s"), (mobile,))
+            customer = cursor.fetchone()
+            if customer is None:
+                raise   # The conflict was on another unique column (the email), not the mobile number
+            return customer[0], customer[1]
+
+    @instrumented('op.warm_customer_cache')
+    def warm_customer_cache(self, days=None):
+        """Preloads customers who ordered within `days` days so their next checkout needs no customer lookup."""
+        days = CUSTOMER_CACHE_CONFIG['warm_days'] if days is None else days
+        since = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(days=days)
+        rows = self.query_all("SELECT customer_id, mobile_number, name FROM Customers WHERE customer_id IN "
+                              "(SELECT customer_id FROM Orders WHERE order_date >= %s) ORDER BY customer_id LIMIT %s",
+                              (since, self.customer_cache.max_entries))
+        self.customer_cache.warm((row['customer_id'], row['mobile_number'], row['name']) for row in rows if row['mobile_number'])
+        return len(rows)
+
+    # --- Cart-time stock reservations (see RESERVATION_CONFIG) -------------------------
+
+    @instrumented('op.reserve_stock')
+    def reserve_stock(self, cart_id, product_id, quantity):
+        """Holds `quantity` more units of a product for a cart until its checkout, release or expiry.
+        The units come off stock_quantity now; raises InsufficientStockError if they are not there."""
+        self.reservations.reserve(cart_id, product_id, quantity)
+
+    def _reservation_expiry(self, ttl_seconds):
+        return datetime.datetime.now().replace(microsecond=0) + datetime.timedelta(seconds=ttl_seconds)
+
+    def _add_reservation(self, cursor, cart_id, product_id, quantity, expires_at):
+        self.execute(cursor, self.upsert_sql('StockReservations', ['cart_id', 'product_id'], {'quantity': 'add', 'expires_at': 'set'}),
+                     (cart_id, product_id, quantity, expires_at))
+        # A cart someone is still working on keeps all of its reservations alive.
+        self.execute(cursor, "UPDATE StockReservations SET expires_at = %s WHERE cart_id = %s", (expires_at, cart_id))
+
+    def _reservation_transaction(self, work):
+        """Runs work(cursor) in a write transaction; commits if it returns True, rolls back otherwise."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.rollback()
+                self.begin(conn)
+                if not work(cursor):
+                    conn.rollback()
+                    return False
+                conn.commit()
+                return True
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def _move_stock_to_reservation(self, cart_id, product_id, quantity, ttl_seconds, min_stock=0):
+        """Moves units from the Inventory row to a reservation row; False if stock is short (below
+        max(quantity, min_stock))."""
+        def work(cursor):
+            self.execute(cursor, "UPDATE Inventory SET stock_quantity = stock_quantity - %s WHERE product_id = %s AND stock_quantity >= %s",
+                         (quantity, product_id, max(quantity, min_stock)))
+            if cursor.rowcount != 1:
+                return False
+            self._add_reservation(cursor, cart_id, product_id, quantity, self._reservation_expiry(ttl_seconds))
+            return True
+
+        moved = self._reservation_transaction(work)
+        if moved:
+            self.inventory_cache.invalidate()
+        return moved
+
+    def _move_allotment_to_cart(self, holder, cart_id, product_id, quantity):
+        """Hands units from an allotment row to a cart without touching Inventory; False if the allotment is short."""
+        def work(cursor):
+            self.execute(cursor, "UPDATE StockReservations SET quantity = quantity - %s, expires_at = %s "
+                                 "WHERE cart_id = %s AND product_id = %s AND quantity >= %s",
+                         (quantity, self._reservation_expiry(RESERVATION_CONFIG['allotment_ttl_seconds']), holder, product_id, quantity))
+            if cursor.rowcount != 1:
+                return False
+            self._add_reservation(cursor, cart_id, product_id, quantity, self._reservation_expiry(RESERVATION_CONFIG['ttl_seconds']))
+            return True
+
+        return self._reservation_transaction(work)
+
+    def _return_stock(self, cursor, quantities):
+        """Adds units back onto Inventory rows ({product_id: units}) in one statement."""
+        product_ids = sorted(p_id for p_id, quantity in quantities.items() if quantity)
+        chunk_size = CHECKOUT_CONFIG['stock_update_chunk']
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            case_expr = 'CASE product_id ' + ' '.join(['WHEN %s THEN %s'] * len(chunk)) + ' END'
+            self.execute(cursor,
+                f"UPDATE Inventory SET stock_quantity = stock_quantity + {case_expr} WHERE product_id IN ({', '.join(['%s'] * len(chunk))})",
+                [value for p_id in chunk for value in (p_id, quantities[p_id])] + chunk)
+
+    def _release_where(self, condition, params):
+        """Returns the units of every reservation matching `condition` to stock and deletes them; returns the units."""
+        released = {}
+
+        def work(cursor):
+            self.execute(cursor, self.locking_read(f"SELECT product_id, quantity FROM StockReservations WHERE {condition}",
+                                                   exclusive=True), params)
+            for product_id, quantity in cursor.fetchall():
+                released[product_id] = released.get(product_id, 0) + quantity
+            self._return_stock(cursor, released)
+            self.execute(cursor, f"DELETE FROM StockReservations WHERE {condition}", params)
+            return True
+
+        self._reservation_transaction(work)
+        if released:
+            self.inventory_cache.invalidate()
+        return sum(released.values())
+
+    @instrumented('op.release_reservations')
+    def release_reservations(self, cart_id, product_id=None):
+        """Gives a cart's reserved units (of one product, or all) back to stock: cart reset, line removed, sale abandoned."""
+        if product_id is None:
+            return self._release_where("cart_id = %s", (cart_id,))
+        return self._release_where("cart_id = %s AND product_id = %s", (cart_id, product_id))
+
+    def reclaim_allotments(self, product_id):
+        """Gives every till's allotment of a product back to stock (the last units of a product belong to
+        whichever cart asks for them, not to the till that happened to allot them); returns the units."""
+        return self._release_where("cart_id LIKE %s AND product_id = %s", ('allot:%', product_id))
+
+    @instrumented('op.sweep_reservations')
+    def sweep_reservations(self):
+        """Gives the units of every expired reservation back to stock; returns how many."""
+        released = self._release_where("expires_at < %s", (datetime.datetime.now().replace(microsecond=0),))
+        if released:
+            METRICS.count('reservations.swept_units', released)
+        return released
+
+    def reservation_summary(self):
+        """Open carts, reserved units and allotment units currently held (for `reservations status`)."""
+        rows = self.query_all("SELECT cart_id, product_id, quantity, expires_at FROM StockReservations")
+        now = datetime.datetime.now()
+        return {
+            'carts': len({row['cart_id'] for row in rows if not row['cart_id'].startswith('allot:')}),
+            'cart_units': sum(row['quantity'] for row in rows if not row['cart_id'].startswith('allot:')),
+            'allotment_units': sum(row['quantity'] for row in rows if row['cart_id'].startswith('allot:')),
+            'expired_units': sum(row['quantity'] for row in rows if row['expires_at'] < now),
+        }
+
+    def _claim_reservations(self, cursor, cart_id, quantities):
+        """Inside checkout: uses up the cart's reservations and returns what must still come off stock.
+
+        Reserved units beyond what the order contains go back to stock in the same transaction.
+        """
+        self.execute(cursor, self.locking_read("SELECT product_id, quantity FROM StockReservations WHERE cart_id = %s",
+                                               exclusive=True), (cart_id,))
+        reserved = cursor.fetchall()
+        if not reserved:
+            return quantities
+        remaining, surplus = dict(quantities), {}
+        for product_id, quantity in reserved:
+            used = min(quantity, remaining.get(product_id, 0))
+            if product_id in remaining:
+                remaining[product_id] -= used
+            if quantity > used:
+                surplus[product_id] = surplus.get(product_id, 0) + quantity - used
+        self.execute(cursor, "DELETE FROM StockReservations WHERE cart_id = %s", (cart_id,))
+        self._return_stock(cursor, surplus)
+        METRICS.count('checkout.reserved_units', sum(quantity for _, quantity in reserved) - sum(surplus.values()))
+        return remaining
+
+    def _apply_order_lines_per_row(self, conn, cursor, order_id, order_list, decrement=None):
+        """Original checkout path: one UPDATE and one INSERT per cart line (2N round trips).
+        `decrement` ({product_id: units}) is what still has to come off stock; default: every unit ordered."""
+        update_stock_query = "UPDATE Inventory SET stock_quantity = stock_quantity - %s WHERE product_id = %s AND stock_quantity >= %s"
+        order_item_insert_query = "INSERT INTO OrderItems (order_id, product_id, quantity, price_at_sale) VALUES (%s, %s, %s, %s)"
+        decrement = dict(decrement if decrement is not None else consolidate_lines(order_list))
+
+        for item in order_list:
+            quantity = min(item['quantity'], decrement.get(item['product_id'], 0))
+            if quantity:
+                # Check if stock update will be successful
+                self.execute(cursor, update_stock_query, (quantity, item['product_id'], quantity))
+
+                if cursor.rowcount == 0:
+                    raise InsufficientStockError([item])
+                decrement[item['product_id']] -= quantity
+
+            # Insert into OrderItems
+            # item['price'] is a Decimal, bound as DECIMAL by both drivers
+            self.execute(cursor, order_item_insert_query, (order_id, item['product_id'], item['quantity'], item['price']))
+
+    def _apply_order_lines_batched(self, conn, cursor, order_id, order_list, savepoint=None, decrement=None):
+        """Batched checkout path: one conditional multi-row UPDATE (per stock_update_chunk products) plus one multi-row INSERT.
+        `decrement` ({product_id: units}) is what still has to come off stock; default: every unit ordered."""
+        quantities = {p_id: quantity for p_id, quantity in
+                      (decrement if decrement is not None else consolidate_lines(order_list)).items() if quantity > 0}
+        product_ids = sorted(quantities)    # IN (...) on the primary key locks rows in id order, so tills cannot deadlock
+
+        # Every row is decremented only if it can cover its own quantity, so rowcount tells us whether all lines fit.
+        # A fully reserved cart has nothing left to take and never touches (or locks) its Inventory rows.
+        updated = 0
+        chunk_size = CHECKOUT_CONFIG['stock_update_chunk']
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            case_expr = 'CASE product_id ' + ' '.join(['WHEN %s THEN %s'] * len(chunk)) + ' END'
+            case_params = [value for p_id in chunk for value in (p_id, quantities[p_id])]
+            self.execute(cursor,
+                f"UPDATE Inventory SET stock_quantity = stock_quantity - {case_expr} "
+                f"WHERE product_id IN ({', '.join(['%s'] * len(chunk))}) AND stock_quantity >= {case_expr}",
+                case_params + chunk + case_params)
+            updated += cursor.rowcount
+            if updated != start + len(chunk):
+                break
+
+        if updated != len(product_ids):
+            # Failure path only: undo the partial decrement first (this also releases the row locks early,
+            # unless other orders share the transaction), then re-read stock to report exactly which lines were short.
+            if savepoint:
+                self.execute(cursor, f"ROLLBACK TO SAVEPOINT {savepoint}")
+            else:
+                conn.rollback()
+            self.execute(cursor, f"SELECT product_id, stock_quantity FROM Inventory WHERE product_id IN ({', '.join(['%s'] * len(product_ids))})",
+                         product_ids)
+            stock = dict(cursor.fetchall())
+            short_ids = {p_id for p_id in product_ids if stock.get(p_id, 0) < quantities[p_id]}
+            # If another till restocked in between, nothing looks short any more; report the whole order then.
+            raise InsufficientStockError([item for item in order_list if item['product_id'] in short_ids] or list(order_list))
+
+        # mysql.connector rewrites executemany() of a plain INSERT into a single multi-row INSERT statement.
+        self.executemany(cursor,
+            "INSERT INTO OrderItems (order_id, product_id, quantity, price_at_sale) VALUES (%s, %s, %s, %s)",
+            [(order_id, item['product_id'], item['quantity'], item['price']) for item in order_list])
+
+class MySQLEngine(StorageEngine):
+    """Storage engine backed by the MySQL server in DB_CONFIG."""
+
+    name = 'mysql'
+
+    def __init__(self, db_config=None, pool_config=None):
+        if mysql is None:
+            raise RuntimeError("The MySQL backend needs mysql-connector-python (pip install mysql-connector-python).")
+        db_config = dict(db_config or DB_CONFIG)
+        # mysql.connector.connect(**db_config) -> The ** just unpacks this dictionary into keyword arguments for the function.
+        super().__init__(ConnectionPool(lambda: mysql.connector.connect(**db_config), **(pool_config or DB_POOL_CONFIG)))
+        for replica in REPLICA_CONFIG['mysql_replicas']:
+            replica = dict(db_config, **replica)
+            if 'port' in replica:
+                replica['port'] = int(replica['port'])
+            self.replicas.append(MySQLReplica(replica, pool_config))
+
+    def stream_cursor(self, conn):
+        # Unbuffered: rows are pulled from the server as fetchmany() asks for them.
+        return conn.cursor(buffered=False)
+
+    def finish_stream(self, conn, cursor):
+        # An unbuffered result must be drained before the connection can run anything else.
+        if conn.unread_result:
+            conn.consume_results()
+        cursor.close()
+
+    def lock_wait_seconds(self):
+        # Server-wide InnoDB counter (milliseconds); callers compare two readings.
+        rows = self.query_all("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock_time'")
+        return int(rows[0]['Value']) / 1000 if rows else None
+
+# SQLite cannot bind Decimal or parse TIMESTAMP columns by itself; these keep both backends returning the same types.
+sqlite3.register_adapter(decimal.Decimal, str)
+sqlite3.register_adapter(datetime.datetime,
+                         lambda value: value.isoformat(' ', 'milliseconds' if value.microsecond else 'seconds'))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATE', lambda value: datetime.date.fromisoformat(value.decode()))
+# DECIMAL columns have numeric affinity in SQLite (stored as REAL); read back as paisa-exact Decimal like MySQL's.
+sqlite3.register_converter('DECIMAL', lambda value: to_money(value.decode()))
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'project.sql')
+
+_SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+@functools.lru_cache(maxsize=1024)
+def _qmark(query):
+    """Rewrites %s placeholders to SQLite's ? style (cached, the same few queries run all day)."""
+    return query.replace('%s', '?')
+
+def _split_table_body(body):
+    """Splits the inside of CREATE TABLE (...) on top-level commas."""
+    parts, depth, current = [], 0, []
+    for char in body:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+def _translate_create_table(statement):
+    """Translates one MySQL CREATE TABLE into SQLite statements (table, then its indexes and triggers)."""
+    match = re.match(r'CREATE TABLE IF NOT EXISTS (\w+)\s*\((.*)\)\s*$', statement, re.S | re.I)
+    table, body = match.groups()
+    columns, indexes, touch_columns, primary_key = [], [], [], None
+
+    for part in _split_table_body(body):
+        index = re.match(r'(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\((.*)\)$', part, re.S | re.I)
+        if index:
+            unique, index_name, index_columns = index.groups()
+            if unique:
+                # Kept as a table constraint so ON CONFLICT (...) targets work like MySQL unique keys.
+                columns.append(f"CONSTRAINT {index_name} UNIQUE ({index_columns})")
+            else:
+                indexes.append(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({index_columns})")
+            continue
+        if re.search(r'\bAUTO_INCREMENT\b', part, re.I):
+            primary_key = part.split()[0]
+            part = f"{primary_key} INTEGER PRIMARY KEY AUTOINCREMENT"
+        if re.search(r'\bON UPDATE CURRENT_TIMESTAMP', part, re.I):
+            touch_columns.append(part.split()[0])
+            part = re.sub(r'\s+ON UPDATE CURRENT_TIMESTAMP(\(\d\))?', '', part, flags=re.I)
+        part = re.sub(r'CURRENT_TIMESTAMP\(\d\)', f"({_SQLITE_NOW})", part, flags=re.I)
+        part = re.sub(r'DEFAULT CURRENT_TIMESTAMP\b', "DEFAULT (datetime('now', 'localtime'))", part, flags=re.I)
+        columns.append(part)
+
+    statements = [f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(columns) + "\n)"]
+    statements.extend(indexes)
+    for column in touch_columns:
+        # Emulates MySQL's ON UPDATE CURRENT_TIMESTAMP (the inventory cache relies on it for delta refresh).
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_on_update AFTER UPDATE ON {table} "
+            f"FOR EACH ROW WHEN NEW.{column} = OLD.{column} BEGIN "
+            f"UPDATE {table} SET {column} = {_SQLITE_NOW} WHERE {primary_key} = NEW.{primary_key}; END")
+    return statements
+
+def translate_mysql_schema(script):
+    """Turns project.sql (MySQL DDL plus seed data) into (schema statements, seed statements) for SQLite."""
+    script = re.sub(r'--[^\n]*', '', script)
+    schema, seed = [], []
+    for statement in script.split(';'):
+        statement = statement.strip()
+        keyword = statement.split(None, 1)[0].upper() if statement else ''
+        if keyword == 'CREATE' and re.match(r'CREATE\s+TABLE', statement, re.I):
+            schema.extend(_translate_create_table(statement))
+        elif keyword == 'CREATE' and re.match(r'CREATE\s+(UNIQUE\s+)?INDEX', statement, re.I):
+            schema.append(re.sub(r'INDEX\s+(?!IF)', 'INDEX IF NOT EXISTS ', statement, count=1, flags=re.I))
+        elif keyword == 'INSERT':
+            seed.append(re.sub(r'^INSERT\s+IGNORE', 'INSERT OR IGNORE', statement, flags=re.I))
+        # CREATE DATABASE, USE and the verification SELECTs have no SQLite equivalent and are skipped.
+    return schema, seed
+
+class SQLiteEngine(StorageEngine):
+    """Embedded storage engine: one SQLite file in WAL mode, schema built from project.sql."""
+
+    name = 'sqlite'
+    text_keys_ignore_case = False
+
+    def __init__(self, path=None, pool_config=None, schema_path=SCHEMA_PATH):
+        self.path = path or STORAGE_CONFIG['sqlite_path']
+        self._lock_wait_total = 0.0     # Seconds spent in BEGIN IMMEDIATE waiting for another writer
+        self._lock_wait_mutex = threading.Lock()
+        super().__init__(ConnectionPool(self._connect, is_healthy=self._is_healthy, **(pool_config or DB_POOL_CONFIG)))
+        self._ensure_schema(schema_path)
+        self.replicas = [SQLiteReplica(path, self.path, pool_config, STORAGE_CONFIG['sqlite_busy_timeout'])
+                         for path in REPLICA_CONFIG['sqlite_replicas']]
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=STORAGE_CONFIG['sqlite_busy_timeout'],
+            isolation_level=None,               # Autocommit; write transactions are opened explicitly by begin()
+            check_same_thread=False,            # Pooled connections move between threads (one user at a time)
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=256,              # Prepared-statement cache for the handful of hot queries
+        )
+        conn.execute("PRAGMA journal_mode=WAL")     # Readers never block the writer (and vice versa)
+        conn.execute("PRAGMA synchronous=NORMAL")   # Durable at checkpoints; safe with WAL
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute(f"PRAGMA cache_size=-{STORAGE_CONFIG['sqlite_cache_mib'] * 1024}")   # Negative = KiB
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        conn.execute("SELECT 1")
+        return True
+
+    def sql(self, query):
+        return _qmark(query)
+
+    def upsert_sql(self, table, key_columns, updates):
+        columns = key_columns + list(updates)
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET " + _upsert_assignments(updates, "excluded.{}"))
+
+    def hour_bucket_sql(self, column):
+        return f"strftime(%s, {column})", ['%Y-%m-%d %H:00:00']
+
+    def hour_of_day_sql(self, column):
+        return f"CAST(strftime(%s, {column}) AS INTEGER)", ['%H']
+
+    def locking_read(self, query, exclusive=False):
+        # Writers are serialised by BEGIN IMMEDIATE, so every read in a write transaction is already current.
+        return query
+
+    def begin(self, conn):
+        # IMMEDIATE takes the write lock up front, so two checkouts cannot deadlock upgrading read locks.
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        waited = time.perf_counter() - start
+        with self._lock_wait_mutex:
+            self._lock_wait_total += waited
+
+    def lock_wait_seconds(self):
+        return self._lock_wait_total
+
+    # Columns added to project.sql after a file may have been created. CREATE TABLE IF NOT EXISTS skips
+    # existing tables, and SQLite cannot add a UNIQUE column in place, so the constraint becomes an index.
+    UPGRADES = [
+        ('Orders', 'idempotency_key', "ALTER TABLE Orders ADD COLUMN idempotency_key VARCHAR(64)",
+         "CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_idempotency_key ON Orders (idempotency_key)"),
+    ]
+
+    def _ensure_schema(self, schema_path):
+        """Creates missing tables/indexes from project.sql; seed data is loaded only into a brand-new file."""
+        with open(schema_path, encoding='utf-8') as schema_file:
+            schema, seed = translate_mysql_schema(schema_file.read())
+        with self.connection() as conn:
+            is_new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Users'").fetchone() is None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in schema:
+                    conn.execute(statement)
+                if is_new:
+                    for statement in seed:
+                        conn.execute(statement)
+                for table, column, *statements in self.UPGRADES:
+                    if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                        for statement in statements:
+                            conn.execute(statement)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+class ServiceConnection:
+    """One socket to the checkout service; RemoteEngine pools these like database connections."""
+
+    def __init__(self, host, port, timeout):
+        try:
+            self._sock = socket.create_connection((host, port), timeout=timeout)
+        except OSError as err:
+            raise RemoteError(f"Checkout service unreachable at {host}:{port} ({err})") from err
+        self._file = self._sock.makefile('rwb')
+        self._ids = itertools.count(1)
+        self.broken = False
+
+    def call(self, op, **args):
+        """Sends one request and waits for its response (requests on one socket are sequential)."""
+        request_id = next(self._ids)
+        try:
+            self._file.write(json.dumps({'id': request_id, 'op': op, 'args': args}, default=str).encode() + b'\n')
+            self._file.flush()
+            line = self._file.readline()
+        except OSError as err:
+            self.broken = True
+            raise RemoteError(f"Lost connection to the checkout service ({err})") from err
+        if not line:
+            self.broken = True
+            raise RemoteError("The checkout service closed the connection.")
+        response = json.loads(line)
+        if response.get('ok'):
+            return response.get('result')
+        error_type = RemoteIntegrityError if response.get('error') == 'integrity_error' else RemoteError
+        raise error_type(response.get('message', 'Checkout service error'), response.get('error'), response.get('details'))
+
+    def is_connected(self):
+        try:
+            return self.call('ping') == 'pong'
+        except RemoteError:
+            return False
+
+    def rollback(self):
+        # Called by the pool on release. Nothing transactional lives on the client side, but a socket
+        # that failed mid-call must not be reused, and raising here makes the pool discard it.
+        if self.broken:
+            raise RemoteError("Discarding broken service connection.")
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self._sock.close()
+
+class RemoteEngine(StorageEngine):
+    """Thin-client engine: forwards every store operation to the checkout service (superstore_service)."""
+
+    name = 'service'
+
+    def __init__(self, host=None, port=None, pool_config=None):
+        self.host = host or SERVICE_CONFIG['host']
+        self.port = port or SERVICE_CONFIG['port']
+        timeout = SERVICE_CONFIG['client_timeout']
+        super().__init__(ConnectionPool(lambda: ServiceConnection(self.host, self.port, timeout),
+                                        **(pool_config or DB_POOL_CONFIG)))
+
+    def call(self, op, **args):
+        with METRICS.timed(f"rpc.{op}"), self.connection() as conn:
+            return conn.call(op, **args)
+
+    def ping(self):
+        self.call('ping')
+
+    def service_metrics(self, reset=False):
+        """The checkout service's own Metrics snapshot (its SQL statements and operations)."""
+        return self.call('metrics', reset=reset)
+
+    def authenticate(self, username, password, role_required):
+        return self.call('authenticate', username=username, password=password, role_required=role_required)
+
+    def inventory_rows_since(self, since):
+        rows = self.call('inventory_rows_since', since=since.isoformat() if since else None)
+        for row in rows:
+            row['price'] = to_money(row['price'])     # Sent as a string, so no float rounding on the way
+            row['updated_at'] = datetime.datetime.fromisoformat(row['updated_at'])
+        return rows
+
+    def stock(self, product_id):
+        return self.call('stock', product_id=product_id)
+
+    def iter_inventory(self, name_prefix=None, name_contains=None, max_stock=None, after_id=0, limit=None, batch_size=500):
+        # Streams page by page over the socket, so only one batch is ever held on either side.
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            rows, has_more = self.call('inventory_page', after_id=after_id, page_size=size, name_prefix=name_prefix,
+                                       name_contains=name_contains, max_stock=max_stock)
+            for row in rows:
+                row['price'] = to_money(row['price'])
+            yield from rows
+            if not has_more or not rows:
+                break
+            after_id = rows[-1]['product_id']
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def get_product(self, product_id):
+        item = self.call('get_product', product_id=product_id)
+        if item:
+            item['price'] = to_money(item['price'])
+        return item
+
+    def product_count(self):
+        return self.call('product_count')
+
+    def get_product_by_barcode(self, barcode):
+        item = self.call('get_product_by_barcode', barcode=barcode)
+        if item:
+            item['price'] = to_money(item['price'])
+        return item
+
+    def add_product(self, name, price, quantity, barcode=None):
+        product_id = self.call('add_product', name=name, price=price, quantity=quantity, barcode=barcode)
+        self.inventory_cache.invalidate()
+        return product_id
+
+    def restock(self, product_id, add_qty):
+        found = self.call('restock', product_id=product_id, add_qty=add_qty)
+        self.inventory_cache.invalidate()
+        return found
+
+    def warm_customer_cache(self, days=None):
+        return 0    # Customers are resolved (and cached) by the service
+
+    def upsert_products(self, rows, stock_mode='set', insert_only=False):
+        inserted, updated, errors = self.call('upsert_products', rows=rows, stock_mode=stock_mode, insert_only=insert_only)
+        self.inventory_cache.invalidate()
+        return inserted, updated, [tuple(error) for error in errors]
+
+    def total_earnings(self):
+        return to_money(self.call('total_earnings'))    # Money travels as text, so no float rounding on the way
+
+    def sales_summary(self, day=None):
+        summary = self.call('sales_summary', day=day.isoformat() if day else None)
+        summary['total_revenue'], summary['day_revenue'] = to_money(summary['total_revenue']), to_money(summary['day_revenue'])
+        for hour in summary['hours']:
+            hour['revenue'] = to_money(hour['revenue'])
+        return summary
+
+    def top_products(self, limit=5):
+        rows = self.call('top_products', limit=limit)
+        for row in rows:
+            row['revenue'] = to_money(row['revenue'])
+        return rows
+
+    def sales_report(self, start=None, end=None, top_n=None):
+        report = self.call('sales_report', start=start.isoformat() if start else None,
+                           end=end.isoformat() if end else None, top_n=top_n)
+        report['revenue'], report['avg_basket_value'] = to_money(report['revenue']), to_money(report['avg_basket_value'])
+        for row in report['top_by_revenue'] + report['top_by_units'] + report['hourly']:
+            row['revenue'] = to_money(row['revenue'])
+        return report
+
+    def rebuild_rollups(self):
+        raise RemoteError("Rebuild the rollups on the service's own database (superstore_cli.py rollups rebuild --backend ...).")
+
+    check_rollups = rebuild_rollups
+
+    def checkout(self, order_list, total_amount, name, mobile, email=None, batched=None, idempotency_key=None, order_time=None,
+                 cart_id=None):
+        lines = [{key: item[key] for key in ('product_id', 'name', 'quantity', 'price', 'subtotal')} for item in order_list]
+        try:
+            order_id, customer_name = self.call('checkout', order_list=lines, total_amount=total_amount,
+                                                name=name, mobile=mobile, email=email, idempotency_key=idempotency_key,
+                                                order_time=order_time.isoformat() if order_time else None, cart_id=cart_id)
+        except RemoteError as err:
+            if err.code != 'insufficient_stock':
+                raise
+            short_ids = set(err.details or ())
+            raise InsufficientStockError([item for item in order_list if item['product_id'] in short_ids] or list(order_list))
+        self.inventory_cache.invalidate()
+        return order_id, customer_name
+
+    def reserve_stock(self, cart_id, product_id, quantity):
+        try:
+            self.call('reserve_stock', cart_id=cart_id, product_id=product_id, quantity=quantity)
+        except RemoteError as err:
+            if err.code != 'insufficient_stock':
+                raise
+            raise InsufficientStockError([{'product_id': product_id, 'name': f"product #{product_id}", 'quantity': quantity}])
+        self.inventory_cache.invalidate()
+
+    def release_reservations(self, cart_id, product_id=None):
+        released = self.call('release_reservations', cart_id=cart_id, product_id=product_id)
+        if released:
+            self.inventory_cache.invalidate()
+        return released
+
+    def sweep_reservations(self):
+        return self.call('sweep_reservations')
+
+    def reservation_summary(self):
+        return self.call('reservation_summary')
+
+    def checkout_group(self, orders, batched=None):
+        """Sends the orders one by one; the service groups concurrent checkouts itself when group commit is on."""
+        results = []
+        for order in orders:
+            try:
+                results.append(self.checkout(**order))
+            except (InsufficientStockError, RemoteIntegrityError) as err:
+                results.append(err)
+        return results
+
+STORAGE_ENGINES = {
+    'mysql': MySQLEngine,
+    'sqlite': SQLiteEngine,
+    'service': RemoteEngine,
+}
@@ -0,0 +1,84 @@
+"""Group commit for the Super Store CLI's checkouts.
+
+Checkouts that arrive together share one transaction, so a rush of orders pays for one
+BEGIN/COMMIT (and one log flush on the server) per group instead of one per order. The engine
+does the actual work in StorageEngine.checkout_group, with a savepoint per order; this module only
+gathers the orders and hands each caller its own result.
+
+    committer = GroupCommitter(engine, window=0.005, max_orders=32)
+    order_id, customer = committer.submit(order)
+"""
+import threading
+
+from superstore_metrics import METRICS
+
+class _GroupSlot:
+    """One checkout waiting in a group: its arguments, and its result once the group has committed."""
+
+    __slots__ = ('order', 'result', 'done')
+
+    def __init__(self, order):
+        self.order = order
+        self.result = None
+        self.done = threading.Event()
+
+class GroupCommitter:
+    """Coalesces concurrent checkouts into shared transactions (group commit).
+
+    The first checkout to arrive opens a group and waits up to `window` seconds for others to join
+    (or until `max_orders` have), then commits the whole group with StorageEngine.checkout_group on
+    its own thread while later arrivals start the next group. Every caller gets back its own order's
+    result or exception, exactly as from a checkout of its own.
+    """
+
+    def __init__(self, engine, window=0.005, max_orders=32):
+        self.engine = engine
+        self.window = window
+        self.max_orders = max_orders
+        self._lock = threading.Lock()
+        self._open = None           # (slots, full_event) of the group still accepting orders
+        self.stats = {'groups': 0, 'orders': 0, 'largest': 0, 'fallbacks': 0}
+
+    def submit(self, order, batched=None):
+        slot = _GroupSlot(order)
+        with self._lock:
+            leader = self._open is None
+            if leader:
+                self._open = ([], threading.Event())
+            slots, full = self._open
+            slots.append(slot)
+            if len(slots) >= self.max_orders:
+                self._open = None
+                full.set()
+        if leader:
+            full.wait(self.window)
+            with self._lock:
+                if self._open is not None and self._open[0] is slots:
+                    self._open = None
+            self._commit(slots, batched)
+        slot.done.wait()
+        if isinstance(slot.result, Exception):
+            raise slot.result
+        return slot.result
+
+    def _commit(self, slots, batched):
+        try:
+            results = self.engine.checkout_group([slot.order for slot in slots], batched)
+        except Exception:
+            # The shared transaction failed as a whole (deadlock, lost connection) and stored nothing:
+            # each order is retried in a transaction of its own, so it fails or succeeds by itself.
+            self.stats['fallbacks'] += 1
+            results = []
+            for slot in slots:
+                try:
+                    results.append(self.engine._checkout_one(slot.order, batched))
+                except Exception as err:
+                    results.append(err)
+        with self._lock:
+            self.stats['groups'] += 1
+            self.stats['orders'] += len(slots)
+            self.stats['largest'] = max(self.stats['largest'], len(slots))
+        METRICS.count('checkout.groups')
+        for slot, result in zip(slots, results):
+            slot.result = result
+            slot.done.set()
@@ -0,0 +1,405 @@
+"""Offline order journal for the Super Store CLI.
+
+OrderJournal is the durable log of sales the database has not taken yet, JournalReplayer applies it
+in batches (checkout_group) whenever the database answers, and SnapshotEngine is the read-only
+catalogue the billing portal sells from in the meantime.
+
+    journal = OrderJournal(JOURNAL_CONFIG['directory'])
+    replayer = JournalReplayer(journal, get_engine)
+    applied, conflicts = replayer.replay_all()
+"""
+import datetime
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+
+from superstore_cart import InsufficientStockError, to_money
+from superstore_engines import DB_ERRORS, StorageEngine, consolidate_lines
+from superstore_metrics import METRICS
+from superstore_pool import PoolTimeoutError
+
+# Tills keep selling through database outages: sales are appended to a local journal (JSON Lines,
+# fsync'd in small groups) and replayed into the database by a background thread. Every sale carries an
+# idempotency key, so a replay can never store an order twice or take its stock twice.
+JOURNAL_CONFIG = {
+    # 'off', 'fallback' (journal a sale only when its checkout cannot reach the database) or
+    # 'always' (journal every sale and acknowledge it at once; the database catches up in the background)
+    'mode': os.environ.get('SUPERSTORE_JOURNAL', 'fallback'),
+    'directory': os.environ.get('SUPERSTORE_JOURNAL_DIR', 'superstore_journal'),
+    'fsync_interval': 0.005,    # Seconds an append waits so sales from other threads share its fsync
+    'replay_batch': 100,        # Journaled sales applied per replay pass
+    'replay_interval': 2.0,     # Seconds between replay attempts (and database probes while offline)
+    'compact_bytes': 8 << 20,   # Rewrite the journal without its applied sales once it grows past this
+}
+
+class JournalError(Exception):
+    """The order journal could not make a sale durable (disk full, permissions, journal closed)."""
+
+_JOURNAL_LINE_KEYS = ('product_id', 'name', 'quantity', 'price', 'subtotal')
+_CATALOG_KEYS = ('product_id', 'name', 'price', 'stock_quantity', 'barcode')
+
+def lines_from_json(order_list):
+    """Order lines read back from JSON (journal, service requests): money is written as strings, read as Decimal."""
+    return [dict(line, price=to_money(line['price']), subtotal=to_money(line['subtotal'])) for line in order_list]
+
+class OrderJournal:
+    """Append-only, fsync-batched log of till sales, kept until each sale is in the database.
+
+    One JSON object per line: an 'order' record per sale, later followed by 'applied' (with the order_id)
+    or 'conflict' once a replay has dealt with it. Appends return only after their line is fsync'd;
+    a single background writer does the fsyncs, so sales arriving together share one.
+    """
+
+    def __init__(self, directory, fsync_interval=0.005):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, 'orders.log')
+        self.fsync_interval = fsync_interval
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()    # Held while the file is written or compacted (taken before _cond)
+        self._buffer = []                   # (encoded line, record) waiting for the next write + fsync
+        self._queued_seq = 0                # Appends handed to the writer so far
+        self._synced_seq = 0                # Appends known to be on disk
+        self._error = None
+        self._closed = False
+        self.pending = {}                   # key -> order record not yet in the database, oldest first
+        self.conflicts = {}                 # key -> (order record, conflict record) replay could not apply
+        self.stats = {'appends': 0, 'fsyncs': 0, 'applied': 0, 'conflicts': 0}
+        self._load()
+        self._file = open(self.path, 'ab')
+        self._writer = threading.Thread(target=self._write_loop, name='order-journal', daemon=True)
+        self._writer.start()
+
+    def _load(self):
+        """Rebuilds pending/conflicts from the file; a torn last line (crash mid-write) is cut off."""
+        if not os.path.exists(self.path):
+            return
+        good_end = 0
+        with open(self.path, 'rb') as log:
+            for line in log:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    self._apply(json.loads(line))
+                except ValueError:
+                    break
+                good_end += len(line)
+        if good_end < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as log:
+                log.truncate(good_end)
+
+    def _apply(self, record):
+        key, kind = record.get('key'), record.get('type')
+        if kind == 'order':
+            self.pending[key] = record
+        elif kind == 'applied':
+            self.pending.pop(key, None)
+            self.conflicts.pop(key, None)
+        elif kind == 'conflict':
+            order = self.pending.pop(key, None)
+            if order is not None:
+                self.conflicts[key] = (order, record)
+        elif kind == 'retry':
+            entry = self.conflicts.pop(key, None)
+            if entry is not None:
+                self.pending[key] = entry[0]
+
+    def _append(self, records):
+        """Writes records and returns once they are on disk."""
+        lines = [(json.dumps(record, separators=(',', ':'), default=str) + '\n', record) for record in records]
+        with self._cond:
+            if self._closed:
+                raise JournalError("The order journal is closed.")
+            self._buffer.extend(lines)
+            self._queued_seq += 1
+            seq = self._queued_seq
+            self._cond.notify_all()
+            while self._synced_seq < seq and self._error is None:
+                self._cond.wait()
+            if self._synced_seq < seq:
+                raise JournalError(f"Order journal write failed: {self._error}")
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer:
+                    return
+            if self.fsync_interval and not self._closed:
+                time.sleep(self.fsync_interval)     # Let concurrent sales join this fsync
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+                seq = self._queued_seq
+            try:
+                with self._io_lock:
+                    self._file.write(''.join(line for line, _ in batch).encode('utf-8'))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    with self._cond:
+                        for _, record in batch:
+                            self._apply(record)
+                        self._synced_seq = seq
+                        self.stats['fsyncs'] += 1
+                        self._cond.notify_all()
+            except OSError as err:
+                with self._cond:
+                    self._error = err
+                    self._cond.notify_all()
+                return
+
+    def record_sale(self, order_list, total_amount, name, mobile, email=None, key=None, at=None, cart_id=None):
+        """Makes one sale durable and returns its idempotency key.
+        `cart_id` lets the replay use the cart's stock reservations if they have not expired by then."""
+        record = {'type': 'order', 'key': key or uuid.uuid4().hex,
+                  'at': (at or datetime.datetime.now()).replace(microsecond=0).isoformat(),
+                  'order_list': [{column: item[column] for column in _JOURNAL_LINE_KEYS} for item in order_list],
+                  'total': total_amount, 'name': name, 'mobile': mobile, 'email': email or None, 'cart_id': cart_id}
+        self._append([record])
+        self.stats['appends'] += 1
+        METRICS.count('journal.sales')
+        return record['key']
+
+    def next_batch(self, limit):
+        """The oldest `limit` sales still waiting for the database."""
+        with self._cond:
+            return list(itertools.islice(self.pending.values(), limit))
+
+    def mark(self, results):
+        """Records replay outcomes ('applied' / 'conflict' records) with a single fsync."""
+        self._append(results)
+        for result in results:
+            self.stats['applied' if result['type'] == 'applied' else 'conflicts'] += 1
+            METRICS.count(f"journal.{result['type']}")
+
+    def retry_conflicts(self):
+        """Puts every conflicted sale back in the replay queue (e.g. after the shortfall was restocked)."""
+        keys = list(self.conflicts)
+        if keys:
+            self._append([{'type': 'retry', 'key': key} for key in keys])
+        return len(keys)
+
+    def maybe_compact(self):
+        """Rewrites the file with only the outstanding sales once it outgrows compact_bytes."""
+        if os.path.getsize(self.path) > JOURNAL_CONFIG['compact_bytes']:
+            self.compact()
+
+    def compact(self):
+        with self._io_lock, self._cond:
+            records = list(self.pending.values())
+            for order, conflict in self.conflicts.values():
+                records += [order, conflict]
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as out:
+                out.writelines(json.dumps(record, separators=(',', ':'), default=str) + '\n' for record in records)
+                out.flush()
+                os.fsync(out.fileno())
+            self._file.close()
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, 'ab')
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._file.close()
+
+    # --- What a till needs to start without the database ------------------------------
+
+    def save_catalog(self, rows):
+        """Keeps a copy of the catalogue so a till can open offline (written to a temp file, then swapped in)."""
+        path = os.path.join(self.directory, 'catalog.jsonl')
+        with open(path + '.tmp', 'w', encoding='utf-8') as out:
+            out.writelines(json.dumps({column: row[column] for column in _CATALOG_KEYS}, default=str) + '\n' for row in rows)
+        os.replace(path + '.tmp', path)
+
+    def load_catalog(self):
+        """The last saved catalogue rows, or None."""
+        try:
+            with open(os.path.join(self.directory, 'catalog.jsonl'), encoding='utf-8') as rows:
+                return [dict(row, price=to_money(row['price'])) for row in map(json.loads, rows)]
+        except (OSError, ValueError):
+            return None
+
+    def _logins_path(self):
+        return os.path.join(self.directory, 'logins.json')
+
+    def _load_logins(self):
+        try:
+            with open(self._logins_path(), encoding='utf-8') as logins:
+                return json.load(logins)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _password_hash(password, salt):
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), bytes.fromhex(salt), 100_000).hex()
+
+    def remember_login(self, username, password, role):
+        """Stores a salted hash of credentials the database just accepted, for offline sign-in later."""
+        logins = self._load_logins()
+        salt = os.urandom(16).hex()
+        logins[username] = {'role': role, 'salt': salt, 'hash': self._password_hash(password, salt)}
+        with open(self._logins_path() + '.tmp', 'w', encoding='utf-8') as out:
+            json.dump(logins, out)
+        os.replace(self._logins_path() + '.tmp', self._logins_path())
+
+    def has_logins(self):
+        return bool(self._load_logins())
+
+    def check_login(self, username, password, role):
+        entry = self._load_logins().get(username)
+        return bool(entry and entry['role'] == role and
+                    hmac.compare_digest(entry['hash'], self._password_hash(password, entry['salt'])))
+
+class JournalReplayer:
+    """Applies journaled sales to the database in batches, oldest first, on a background thread.
+
+    Each batch is one checkout_group transaction. A sale whose stock is gone by the time it reaches the
+    database is recorded as a conflict (and reported) instead of blocking the sales behind it. A database
+    error ends the pass; the same sales are retried on the next one, and their idempotency keys make
+    the retry harmless.
+    """
+
+    def __init__(self, journal, get_store, batch_size=100, interval=2.0):
+        self.journal = journal
+        self.get_store = get_store      # Returns the storage engine to replay into (looked up on every pass)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.online = None          # Whether the last replay pass or probe reached the database
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='journal-replay', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+
+    def replay_batch(self):
+        """Applies up to batch_size pending sales in one transaction; returns the result records written to the journal."""
+        batch = self.journal.next_batch(self.batch_size)
+        if not batch:
+            return []
+        outcomes = self.get_store().checkout_group([
+            {'order_list': lines_from_json(order['order_list']), 'total_amount': to_money(order['total']), 'name': order['name'],
+             'mobile': order['mobile'], 'email': order['email'], 'idempotency_key': order['key'],
+             'order_time': datetime.datetime.fromisoformat(order['at']), 'cart_id': order.get('cart_id')} for order in batch])
+        results = []
+        for order, outcome in zip(batch, outcomes):
+            if isinstance(outcome, InsufficientStockError):
+                results.append({'type': 'conflict', 'key': order['key'], 'short': [item['product_id'] for item in outcome.short_items],
+                                'message': str(outcome)})
+            elif isinstance(outcome, Exception):    # An integrity error, e.g. a product deleted since the sale
+                results.append({'type': 'conflict', 'key': order['key'], 'short': [], 'message': str(outcome)})
+            else:
+                results.append({'type': 'applied', 'key': order['key'], 'order_id': outcome[0]})
+        self.journal.mark(results)
+        return results
+
+    def replay_all(self):
+        """Replays until nothing is pending; returns (applied, conflicts). Database errors propagate."""
+        applied = conflicts = 0
+        while self.journal.pending:
+            for result in self.replay_batch():
+                if result['type'] == 'applied':
+                    applied += 1
+                else:
+                    conflicts += 1
+        self.journal.maybe_compact()
+        return applied, conflicts
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                if self.journal.pending:
+                    self.replay_all()
+                elif self.online is not True:
+                    self.get_store().ping()
+                self.online, self.last_error = True, None
+            except DB_ERRORS + (PoolTimeoutError, JournalError, RuntimeError) as err:
+                self.online, self.last_error = False, str(err)
+
+class SnapshotEngine(StorageEngine):
+    """Read-only catalogue for the billing portal while the database is unreachable.
+
+    Serves a fixed list of inventory rows (the live engine's cache, or the journal's saved catalogue)
+    through the usual engine interface; the portal sends its sales to the order journal instead.
+    """
+
+    name = 'offline'
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._loaded_at = datetime.datetime.now()
+        super().__init__(pool=None)
+        self.product_index()
+
+    def inventory_rows_since(self, since):
+        if since is not None:
+            return []
+        return [dict(row, updated_at=self._loaded_at) for row in sorted(self._rows, key=lambda row: row['product_id'])]
+
+    def iter_inventory(self, name_prefix=None, name_contains=None, max_stock=None, after_id=0, limit=None, batch_size=500):
+        prefix, contains = (name_prefix or '').lower(), (name_contains or '').lower()
+        count = 0
+        for item in self.list_inventory():
+            name = item['name'].lower()
+            if item['product_id'] <= after_id or not name.startswith(prefix) or contains not in name:
+                continue
+            if max_stock is not None and item['stock_quantity'] > max_stock:
+                continue
+            yield item
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def get_product(self, product_id):
+        self.list_inventory()
+        return self.inventory_cache.product_map.get(str(product_id))
+
+    def product_lookup(self):
+        return self.product_index()     # The saved catalogue is in memory already
+
+    def stock(self, product_id):
+        item = self.get_product(product_id)
+        return item['stock_quantity'] if item else None
+
+    def apply_sale(self, order_list):
+        """Takes a journaled sale's quantities off the displayed stock, so the till does not oversell."""
+        for product_id, quantity in consolidate_lines(order_list).items():
+            item = self.get_product(product_id)
+            if item:
+                item['stock_quantity'] = max(item['stock_quantity'] - quantity, 0)
+        self.inventory_cache.invalidate()
+
+    def ping(self):
+        raise RuntimeError("Offline: the database is unreachable.")
+
+    def warm_customer_cache(self, days=None):
+        return 0
+
+    def checkout(self, *args, **kwargs):
+        raise RuntimeError("Offline: sales go to the order journal.")
+
+    def close(self):
+        pass
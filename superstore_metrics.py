@@ -0,0 +1,211 @@
+"""Built-in instrumentation for the Super Store CLI.
+
+Every SQL statement and store operation is timed into a fixed log-scale latency histogram, with
+row counts and error/rollback counters; statements slower than slow_query_ms are appended to the
+slow-query log. One process-wide Metrics object (METRICS) is shared by the storage engines, the
+checkout service and the benchmarks.
+
+    with METRICS.timed('op.checkout'):
+        ...
+    print(format_metrics(METRICS.snapshot()))
+"""
+import bisect
+import collections
+import datetime
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+# Built-in instrumentation: every SQL statement and store operation is timed into a latency histogram,
+# with row counts and error/rollback counters. Statements slower than slow_query_ms go to the slow log.
+METRICS_CONFIG = {
+    'enabled': os.environ.get('SUPERSTORE_METRICS', '1') != '0',
+    'slow_query_ms': 200,
+    'slow_log_path': os.environ.get('SUPERSTORE_SLOW_LOG', 'superstore_slow.log'),
+    'dump_path': os.environ.get('SUPERSTORE_METRICS_DUMP', 'superstore_metrics.json'),  # Written on demand / at exit
+}
+
+# Histogram bucket upper bounds: 10 us doubling up to ~84 s (anything slower lands in the last bucket).
+LATENCY_BUCKETS = tuple(1e-5 * 2 ** i for i in range(24))
+
+class LatencyHistogram:
+    """Fixed log-scale latency histogram: recording is one bisect and a few additions."""
+
+    __slots__ = ('counts', 'count', 'total', 'max', 'rows', 'errors')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+
+    def record(self, seconds, rows=0, error=False):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if rows > 0:
+            self.rows += rows
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples (so slightly pessimistic)."""
+        target, seen = self.count * fraction, 0
+        for bucket, hits in enumerate(self.counts):
+            seen += hits
+            if hits and seen >= target:
+                return min(LATENCY_BUCKETS[bucket], self.max) if bucket < len(LATENCY_BUCKETS) else self.max
+        return 0.0
+
+    def summary(self):
+        return {'count': self.count, 'errors': self.errors, 'rows': self.rows,
+                'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+                'p50_ms': round(self.percentile(0.50) * 1000, 3), 'p95_ms': round(self.percentile(0.95) * 1000, 3),
+                'p99_ms': round(self.percentile(0.99) * 1000, 3), 'max_ms': round(self.max * 1000, 3)}
+
+class _Timer:
+    """`with METRICS.timed(name):` - records the block's latency, and an error if it raises."""
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.name, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+@functools.lru_cache(maxsize=1024)
+def _statement_label(query):
+    """Groups SQL text into 'VERB Table' ('UPDATE Inventory', 'SELECT Customers') for the statement histograms."""
+    words = query.split(None, 1)
+    verb = words[0].upper() if words else '?'
+    table = re.search(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+)', query, re.I)
+    return f"sql {verb} {table.group(1)}" if table else f"sql {verb}"
+
+class Metrics:
+    """Process-wide latency histograms and counters (thread-safe; one lock taken per recording)."""
+
+    def __init__(self, enabled=True, slow_query_ms=200, slow_log_path=None):
+        self.enabled = enabled
+        self.slow_seconds = slow_query_ms / 1000
+        self.slow_log_path = slow_log_path
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self.counters = collections.Counter()   # Rollbacks, slow statements, ... keyed by name
+        self.started = time.time()
+        self._slow_log = None
+
+    def timed(self, name):
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def record(self, name, seconds, rows=0, error=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.record(seconds, rows, error)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += amount
+
+    def record_statement(self, query, params, seconds, rows=0, error=False):
+        """Records one SQL statement; slow ones are also appended to the slow-query log."""
+        if not self.enabled:
+            return
+        self.record(_statement_label(query), seconds, rows, error)
+        if seconds >= self.slow_seconds:
+            self.count('slow_statements')
+            self._log_slow(query, params, seconds, rows)
+
+    def _log_slow(self, query, params, seconds, rows):
+        if not self.slow_log_path:
+            return
+        shown = params if not isinstance(params, (list, tuple)) or len(params) <= 10 else f"{list(params[:10])} ... ({len(params)} params)"
+        line = (f"{datetime.datetime.now().isoformat(' ', 'milliseconds')}  {seconds * 1000:9.1f} ms  rows={rows}  "
+                f"{' '.join(query.split())[:500]}  params={shown}\n")
+        with self._lock:
+            try:
+                if self._slow_log is None:
+                    self._slow_log = open(self.slow_log_path, 'a', encoding='utf-8', buffering=1)
+                self._slow_log.write(line)
+            except OSError:
+                self.slow_log_path = None   # Unwritable location: keep serving checkouts, just stop logging
+
+    def snapshot(self):
+        """Everything recorded so far as plain data (JSON-serialisable)."""
+        with self._lock:
+            histograms = {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+            counters = dict(self.counters)
+        return {'since': datetime.datetime.fromtimestamp(self.started).isoformat(' ', 'seconds'),
+                'slow_query_ms': self.slow_seconds * 1000, 'operations': histograms, 'counters': counters}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def dump(self, path=None):
+        """Writes snapshot() as JSON to `path` (default METRICS_CONFIG['dump_path']) and returns the path."""
+        path = path or METRICS_CONFIG['dump_path']
+        with open(path, 'w', encoding='utf-8') as out:
+            json.dump(self.snapshot(), out, indent=2)
+        return path
+
+def format_metrics(snapshot):
+    """Text table of a Metrics snapshot, one line per operation/statement."""
+    lines = [f"{'operation':<34}{'count':>8}{'errors':>7}{'rows':>9}{'mean ms':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>9}"]
+    for name, op in snapshot['operations'].items():
+        lines.append(f"{name[:33]:<34}{op['count']:>8}{op['errors']:>7}{op['rows']:>9}{op['mean_ms']:>9.2f}"
+                     f"{op['p50_ms']:>8.2f}{op['p95_ms']:>8.2f}{op['p99_ms']:>8.2f}{op['max_ms']:>9.2f}")
+    if snapshot['counters']:
+        lines.append("counters: " + ", ".join(f"{name}={value}" for name, value in sorted(snapshot['counters'].items())))
+    return "\n".join(lines)
+
+METRICS = Metrics(METRICS_CONFIG['enabled'], METRICS_CONFIG['slow_query_ms'], METRICS_CONFIG['slow_log_path'])
+
+def instrumented(name):
+    """Decorator timing a store operation under `name`; list results count as rows."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                METRICS.record(name, time.perf_counter() - start, error=True)
+                raise
+            METRICS.record(name, time.perf_counter() - start, len(result) if isinstance(result, list) else 0)
+            return result
+        return wrapper
+    return decorate
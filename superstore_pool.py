@@ -0,0 +1,142 @@
+"""Connection pooling for the Super Store CLI's storage engines.
+
+Idle connections are reused most recent first and health-checked only after sitting unused for
+max_idle_seconds, so the hot path is a plain queue pop.
+
+    pool = ConnectionPool(lambda: mysql.connector.connect(**DB_CONFIG), **DB_POOL_CONFIG)
+    conn = pool.acquire()
+    try:
+        ...
+    finally:
+        pool.release(conn)
+"""
+import queue
+import threading
+import time
+
+# Connection pool settings. Every portal borrows a connection from the pool and hands it back
+# when it is done, so a shift change no longer pays a fresh TCP + auth handshake.
+DB_POOL_CONFIG = {
+    'pool_size': 4,             # Maximum number of open connections kept by this process
+    'checkout_timeout': 10,     # Seconds to wait for a free connection before giving up
+    'max_idle_seconds': 300,    # Idle connections older than this are health-checked before reuse
+}
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection became free within the checkout timeout."""
+
+class ConnectionPool:
+    """A small thread-safe pool of long-lived database connections."""
+
+    def __init__(self, connect, pool_size=4, checkout_timeout=10, max_idle_seconds=300, is_healthy=None):
+        self._connect = connect                     # Factory that opens one new connection
+        self._is_healthy = is_healthy or (lambda conn: conn.is_connected())  # is_connected() pings the server
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self._idle = queue.LifoQueue()              # LIFO so the most recently used (warmest) connection is reused first
+        self._lock = threading.Lock()
+        self._open = 0                              # Connections currently open (idle + checked out)
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,                 # Checkouts that had to block because the pool was exhausted
+            'wait_time_total': 0.0,     # Seconds spent blocked waiting for a connection
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'reconnects': 0,            # Stale connections replaced after a failed health check
+        }
+
+    def acquire(self):
+        """Checks out a healthy connection, opening or waiting for one as needed."""
+        start = time.perf_counter()
+        waited = False
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open < self.pool_size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                conn, last_used = self._open_new(), None
+            else:
+                waited = True
+                try:
+                    conn, last_used = self._idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.stats['timeouts'] += 1
+                    raise PoolTimeoutError(f"No database connection became free within {self.checkout_timeout}s "
+                                           f"(pool size {self.pool_size}).")
+
+        wait_time = time.perf_counter() - start
+        with self._lock:
+            self.stats['checkouts'] += 1
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_time_total'] += wait_time
+                self.stats['wait_time_max'] = max(self.stats['wait_time_max'], wait_time)
+
+        # Only connections that sat idle for a while are pinged, so the hot path stays a plain queue pop.
+        if last_used is not None and time.monotonic() - last_used > self.max_idle_seconds:
+            conn = self._revalidate(conn)
+        return conn
+
+    def release(self, conn):
+        """Returns a connection to the pool, discarding it if it is broken."""
+        try:
+            # Never hand a half-finished transaction to the next user of this connection.
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def close_all(self):
+        """Closes every idle connection (called on shutdown)."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def _open_new(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+            raise
+        with self._lock:
+            self.stats['created'] += 1
+        return conn
+
+    def _revalidate(self, conn):
+        try:
+            if self._is_healthy(conn):
+                return conn
+        except Exception:
+            pass
+        # Stale connection (server restarted, wait_timeout expired, ...): replace it with a fresh one.
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self.stats['reconnects'] += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+            raise
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._open -= 1
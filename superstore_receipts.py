@@ -0,0 +1,511 @@
+"""Receipt store for the Super Store CLI: every receipt rendered once, kept, and found again for reprints.
+
+A sale's receipt text is rendered when the sale commits (or is journaled), printed, and appended to
+an append-only store. Reprints and returns then read back exactly what the customer was given,
+instead of rebuilding the sale from Orders/OrderItems:
+
+    superstore_receipts/
+        receipts.dat                    receipt bodies back to back (raw deflate with a preset dictionary)
+        receipts.log                    one fixed 40-byte entry per receipt, in append order:
+                                        order_id, time, mobile, offset and length in receipts.dat, flags
+        index.json                      the sorted runs below and how many log entries they cover
+        run-<start>-<count>.order       (order_id, entry number) pairs sorted by order_id
+        run-<start>-<count>.date        ... by receipt time
+        run-<start>-<count>.mobile      ... by customer mobile
+
+Appends only touch the two files at the end. Every RECEIPT_CONFIG['seal_every'] receipts the
+unsorted tail of the log is sorted into a new run of each index (bounded work, done by the append
+that fills the tail). Runs of similar size are merged by a background thread (so there are only ever
+a few of them, and each receipt is rewritten O(log n) times); a merge writes its run without the lock.
+A lookup binary-searches each memory-mapped run and scans the short tail, so a reprint reads a few
+dozen pages whether the store holds a thousand receipts or ten million.
+
+Compression is per receipt with a dictionary of the receipt's fixed text, which stores a typical
+receipt in about a quarter of its rendered size. Journaled sales (order number not known yet) are stored with
+order_id 0 and found by mobile or date.
+
+Appends, seals and the manifest swap that ends a merge hold an exclusive lock on the store (flock, so
+tills on one machine can share a directory); lookups, and a merge reading its runs, take it shared. A receipt is a copy of a sale that is already safe in
+the database or the journal, so the store flushes to the OS but does not fsync every append.
+"""
+import array
+import bisect
+import collections
+import contextlib
+import datetime
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:     # Windows: the store is then safe between threads, not between processes
+    fcntl = None
+
+RECEIPT_CONFIG = {
+    'enabled': os.environ.get('SUPERSTORE_RECEIPTS', 'on') != 'off',
+    'directory': os.environ.get('SUPERSTORE_RECEIPT_DIR', 'superstore_receipts'),
+    'compress': os.environ.get('SUPERSTORE_RECEIPT_COMPRESS', 'on') != 'off',
+    'seal_every': 1024,         # Unsorted log entries (scanned by every lookup) before they are sorted into a run
+    'background_merge': True,   # Merge runs on a background thread (off: only seal() / merge() merge them)
+    'batch': 256,               # Receipts rendered and appended together by the batch billing mode
+}
+
+EPOCH = datetime.datetime(1970, 1, 1)   # Receipt times are stored as whole seconds since this (naive, local)
+
+ENTRY = struct.Struct('<qqqqII')        # order_id, seconds, mobile, offset, length, flags
+KEY = struct.Struct('<qq')              # key, entry number
+INDEX_FIELDS = {'order': 0, 'date': 1, 'mobile': 2}    # Sorted index -> ENTRY field it is keyed on
+FLAG_DEFLATE = 1
+
+# Preset dictionary for compressing receipts. Stored receipts depend on these exact bytes: never edit
+# it, add a new flag (and dictionary) instead.
+ZDICT = ("Item                    Qty   Price    Total\n"
+         "Subtotal:                               ₹.00\n"
+         "TOTAL AMOUNT:                           ₹.00\n"
+         "Order number assigned when this sale reaches the database.\n"
+         "=============================================\n"
+         "          SUPER STORE SALES RECEIPT          \n"
+         "=============================================\n"
+         "Order ID: J-                     Date: 20\n"
+         "Customer Name: \nCustomer Mobile: \n"
+         "---------------------------------------------\n").encode('utf-8')
+
+Sale = collections.namedtuple('Sale', 'order_id lines total mobile customer_name at note', defaults=(None, None))
+Sale.__doc__ = """A sale to render: lines are cart lines (or dicts) with name, quantity, price and subtotal."""
+
+StoredReceipt = collections.namedtuple('StoredReceipt', 'order_id at mobile text')
+
+# --- Rendering ---------------------------------------------------------------------------
+
+RULE = "=" * 45
+THIN = "-" * 45
+_HEADER = f"{RULE}\n          SUPER STORE SALES RECEIPT          \n{RULE}\n"
+_COLUMNS = f"{THIN}\nItem                    Qty   Price    Total\n{THIN}\n"
+
+def _render(sale, stamp):
+    parts = [_HEADER, f"Order ID: {sale.order_id:<20} Date: {stamp}\nCustomer Name: {sale.customer_name}\n"
+                      f"Customer Mobile: {sale.mobile}\n", _COLUMNS]
+    parts.extend(f"{item['name']:<20.20} {item['quantity']:<3} {'₹' + format(item['price'], '.2f'):<6} "
+                 f"₹{item['subtotal']:.2f}\n" for item in sale.lines)
+    parts.append(f"{THIN}\nSubtotal:                               ₹{sale.total:.2f}\n"
+                 f"TOTAL AMOUNT:                           ₹{sale.total:.2f}\n")
+    if sale.note:
+        parts.append(f"{THIN}\n{sale.note}\n")
+    parts.append(f"{RULE}\n")
+    return ''.join(parts)
+
+def render_receipt(sale):
+    """The receipt text for a sale (the layout generate_receipt has always printed)."""
+    return _render(sale, (sale.at or datetime.datetime.now()).strftime('%Y-%m-%d %H:%M'))
+
+def render_receipts(sales):
+    """Receipt texts for many sales in one pass; sales stamped in the same minute share the date text."""
+    now = datetime.datetime.now()
+    stamps = {}
+    texts = []
+    for sale in sales:
+        minute = (sale.at or now).replace(second=0, microsecond=0)
+        stamp = stamps.get(minute)
+        if stamp is None:
+            stamp = stamps[minute] = minute.strftime('%Y-%m-%d %H:%M')
+        texts.append(_render(sale, stamp))
+    return texts
+
+# --- Store -------------------------------------------------------------------------------
+
+def _number(value):
+    """An order id or mobile as an index key (0 for a journaled 'J-...' reference or a missing value)."""
+    text = str(value or '').strip()
+    return int(text) if text.isdigit() else 0
+
+def _seconds(moment):
+    return (moment - EPOCH) // datetime.timedelta(seconds=1)
+
+def _day_range(day):
+    start = datetime.datetime.combine(day, datetime.time())
+    return _seconds(start), _seconds(start + datetime.timedelta(days=1))
+
+def _bisect(mapped, count, key):
+    """First position in a sorted KEY file whose key is >= `key`."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if KEY.unpack_from(mapped, middle * KEY.size)[0] < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def _int64s(data):
+    """Little-endian int64 file bytes as an array('q')."""
+    values = array.array('q', data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _write_keys(path, chunks):
+    """Writes lists of sorted (key, entry number) pairs to a temp file and swaps it in."""
+    temp_path = f"{path}.{os.getpid()}.tmp"     # Two tills may write the same merged run at once
+    with open(temp_path, 'wb') as out:
+        for chunk in chunks:
+            out.write(struct.pack(f'<{2 * len(chunk)}q', *itertools.chain.from_iterable(chunk)))
+    os.replace(temp_path, path)
+
+def _merged_keys(older, newer, chunk_size=65536):
+    """The pairs of two sorted KEY files in order, as sorted lists of up to 2 * chunk_size pairs.
+
+    Each step takes the next chunk of both files, hands out every pair up to the smaller of the two
+    chunks' last pairs, and keeps the rest for the next step. sorted() merges the two sorted pieces
+    at C speed, so a background merge holds the GIL only in short bursts.
+    """
+    pairs = [KEY.iter_unpack(older), KEY.iter_unpack(newer)]
+    pending = [[], []]
+    while True:
+        for side in (0, 1):
+            pending[side].extend(itertools.islice(pairs[side], chunk_size - len(pending[side])))
+        if not pending[0] or not pending[1]:
+            rest = pending[0] or pending[1]
+            while rest:
+                yield rest
+                rest = list(itertools.islice(pairs[0] if pending[0] else pairs[1], chunk_size))
+            return
+        bound = min(pending[0][-1], pending[1][-1])
+        cuts = [bisect.bisect_right(pending[side], bound) for side in (0, 1)]
+        yield sorted(pending[0][:cuts[0]] + pending[1][:cuts[1]])
+        pending = [pending[side][cuts[side]:] for side in (0, 1)]
+
+class ReceiptStore:
+    """The receipt directory: appends receipts, keeps the sorted indexes up to date and answers lookups."""
+
+    def __init__(self, directory=None, compress=None, seal_every=None, background_merge=None):
+        self.directory = directory or RECEIPT_CONFIG['directory']
+        self.compress = RECEIPT_CONFIG['compress'] if compress is None else compress
+        self.seal_every = seal_every or RECEIPT_CONFIG['seal_every']
+        self.background_merge = RECEIPT_CONFIG['background_merge'] if background_merge is None else background_merge
+        os.makedirs(self.directory, exist_ok=True)
+        self.data_path = os.path.join(self.directory, 'receipts.dat')
+        self.log_path = os.path.join(self.directory, 'receipts.log')
+        self.manifest_path = os.path.join(self.directory, 'index.json')
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(self.directory, 'lock'), 'a+b')
+        self._data = open(self.data_path, 'ab')
+        self._log = open(self.log_path, 'ab')
+        self._maps = {}     # path -> read-only mmap (run files never change once written)
+        self._manifest_stamp = None
+        self.manifest = None
+        self._merge_lock = threading.Lock()     # One merge at a time in this process
+        self._merge_wanted = threading.Event()
+        self._merger = None
+        self._closing = False
+        self.merge_error = None     # Last error of the background merger (the next seal retries)
+        self._refresh()
+
+    def __len__(self):
+        return self._log_count()
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive=True):
+        """Holds the store between this process's threads and, where flock exists, other processes."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as manifest:
+                return json.load(manifest)
+        except FileNotFoundError:
+            return {'version': 1, 'sealed': 0, 'runs': []}
+
+    def _save_manifest(self):
+        """Writes index.json to a temp file and swaps it in, so readers see the old runs or the new ones."""
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as out:
+            json.dump(self.manifest, out, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    def _refresh(self):
+        """Re-reads index.json if it changed (another process may have sealed) and unmaps runs it no
+        longer lists (lock held)."""
+        try:
+            status = os.stat(self.manifest_path)
+            stamp = (status.st_mtime_ns, status.st_size, status.st_ino)
+        except FileNotFoundError:
+            stamp = None
+        if self.manifest is not None and stamp == self._manifest_stamp:
+            return
+        self.manifest, self._manifest_stamp = self._load_manifest(), stamp
+        live = {self._run_path(run, index) for run in self.manifest['runs'] for index in INDEX_FIELDS}
+        for path in [path for path in self._maps if path not in live and path not in (self.data_path, self.log_path)]:
+            self._maps.pop(path).close()
+
+    def _run_path(self, run, index):
+        return os.path.join(self.directory, f"run-{run['start']:012d}-{run['count']:012d}.{index}")
+
+    def _map(self, path, size=None):
+        """A read-only mmap of a file (b'' while it is empty). The data and log files are re-mapped when
+        a read needs more than the current mapping covers; run files never change."""
+        mapped = self._maps.get(path)
+        if mapped is not None and (size is None or len(mapped) >= size):
+            return mapped
+        if mapped is not None:
+            self._maps.pop(path).close()
+        with open(path, 'rb') as source:
+            if not os.fstat(source.fileno()).st_size:
+                return b''
+            mapped = self._maps[path] = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped
+
+    def _log_count(self, repair=False):
+        """Complete entries in the log; with `repair` (exclusive lock held) a torn last entry left by a
+        crash mid-append is cut off."""
+        size = os.fstat(self._log.fileno()).st_size
+        if repair and size % ENTRY.size:
+            os.truncate(self.log_path, size - size % ENTRY.size)
+        return size // ENTRY.size
+
+    def _pack(self, text):
+        data = text.encode('utf-8')
+        if not self.compress:
+            return data
+        packer = zlib.compressobj(6, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY, ZDICT)
+        return packer.compress(data) + packer.flush()
+
+    @staticmethod
+    def _unpack(blob, flags):
+        if flags & FLAG_DEFLATE:
+            unpacker = zlib.decompressobj(-15, zdict=ZDICT)
+            blob = unpacker.decompress(blob) + unpacker.flush()
+        return blob.decode('utf-8')
+
+    # --- Writing -----------------------------------------------------------------------------
+
+    def append(self, sales, texts=None):
+        """Stores the receipts of `sales`, rendering them in one pass unless their `texts` are given.
+        One write to each file (and one lock) however many receipts there are."""
+        if texts is None:
+            texts = render_receipts(sales)
+        blobs = [self._pack(text) for text in texts]
+        flags = FLAG_DEFLATE if self.compress else 0
+        now = _seconds(datetime.datetime.now())
+        with self._locked():
+            offset = os.fstat(self._data.fileno()).st_size
+            count = self._log_count(repair=True)
+            entries = []
+            for sale, blob in zip(sales, blobs):
+                entries.append(ENTRY.pack(_number(sale.order_id), _seconds(sale.at) if sale.at else now,
+                                          _number(sale.mobile), offset, len(blob), flags))
+                offset += len(blob)
+            # Bodies first: an entry is only ever written after the bytes it points at.
+            self._data.write(b''.join(blobs))
+            self._data.flush()
+            self._log.write(b''.join(entries))
+            self._log.flush()
+            self._refresh()
+            if count + len(entries) - self.manifest['sealed'] >= self.seal_every:
+                self._seal()
+                if self.background_merge and self._merge_candidate():
+                    self._wake_merger()
+
+    def seal(self):
+        """Sorts every receipt not yet indexed into the runs and merges them now (`receipts index`)."""
+        with self._locked():
+            self._refresh()
+            self._seal()
+        self.merge()
+
+    def _seal(self):
+        """Sorts the log entries no run covers yet into a new run (exclusive lock held). The work is
+        bounded by seal_every; merging is left to merge()."""
+        start, count = self.manifest['sealed'], self._log_count()
+        if count <= start:
+            return
+        log = self._map(self.log_path, count * ENTRY.size)
+        entries = list(ENTRY.iter_unpack(log[start * ENTRY.size:count * ENTRY.size]))
+        run = {'start': start, 'count': count - start}
+        for index, field in INDEX_FIELDS.items():
+            _write_keys(self._run_path(run, index), [sorted((entry[field], number) for number, entry in enumerate(entries, start))])
+        self.manifest = {'version': 1, 'sealed': count, 'runs': self.manifest['runs'] + [run]}
+        self._save_manifest()
+        self._manifest_stamp = None     # Re-read (and re-stamped) by the next _refresh
+
+    def _merge_candidate(self):
+        """The newest pair of neighbouring runs where the older is no more than twice the newer, or None."""
+        runs = self.manifest['runs']
+        for position in range(len(runs) - 2, -1, -1):
+            if runs[position]['count'] <= 2 * runs[position + 1]['count']:
+                return runs[position], runs[position + 1]
+        return None
+
+    def _remove_run(self, run):
+        for index in INDEX_FIELDS:
+            path = self._run_path(run, index)
+            if path in self._maps:
+                self._maps.pop(path).close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def merge(self):
+        """Merges neighbouring runs of similar size until none are left; returns how many merges it made.
+
+        The merged run is written from private mappings of its two parts while no lock is held, so
+        appends (and the checkouts behind them) never wait for a merge; only the manifest swap at the
+        end takes the exclusive lock. If another till merged the same runs meanwhile, its result stands.
+        """
+        merges = 0
+        with self._merge_lock:
+            while not self._closing:
+                with self._locked(exclusive=False):
+                    self._refresh()
+                    pair = self._merge_candidate()
+                    if pair is None:
+                        return merges
+                    sources = {}
+                    for index in INDEX_FIELDS:
+                        sources[index] = []
+                        for part in pair:
+                            with open(self._run_path(part, index), 'rb') as source:
+                                sources[index].append(mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ))
+                merged = {'start': pair[0]['start'], 'count': pair[0]['count'] + pair[1]['count']}
+                try:
+                    for index, parts in sources.items():
+                        _write_keys(self._run_path(merged, index), _merged_keys(*parts))
+                finally:
+                    for parts in sources.values():
+                        for part in parts:
+                            part.close()
+                with self._locked():
+                    self._refresh()
+                    runs = list(self.manifest['runs'])
+                    if merged in runs:
+                        continue        # Another till made the same merge first
+                    position = runs.index(pair[0]) if pair[0] in runs else -1
+                    if position < 0 or runs[position + 1:position + 2] != [pair[1]]:
+                        self._remove_run(merged)    # The parts went into some other merge
+                        continue
+                    runs[position:position + 2] = [merged]
+                    self.manifest = {'version': 1, 'sealed': self.manifest['sealed'], 'runs': runs}
+                    self._save_manifest()
+                    self._manifest_stamp = None
+                    for part in pair:
+                        self._remove_run(part)
+                merges += 1
+        return merges
+
+    def _wake_merger(self):
+        if self._merger is None:
+            self._merger = threading.Thread(target=self._merge_loop, name='receipt-merger', daemon=True)
+            self._merger.start()
+        self._merge_wanted.set()
+
+    def _merge_loop(self):
+        while True:
+            self._merge_wanted.wait()
+            self._merge_wanted.clear()
+            if self._closing:
+                return
+            try:
+                self.merge()
+                self.merge_error = None
+            except OSError as err:
+                self.merge_error = str(err)
+
+    # --- Lookups -----------------------------------------------------------------------------
+
+    def _entry_numbers(self, index, low, high, last=None):
+        """Log entry numbers whose `index` key is in [low, high): binary search in every run, then a scan
+        of the unsorted tail (lock held). With `last`, only the `last` highest keys of each run are taken."""
+        numbers = []
+        for run in self.manifest['runs']:
+            keys = self._map(self._run_path(run, index))
+            count = len(keys) // KEY.size
+            start, end = _bisect(keys, count, low), _bisect(keys, count, high)
+            if last:
+                start = max(start, end - last)
+            numbers.extend(_int64s(keys[start * KEY.size:end * KEY.size])[1::2])
+        start, count = self.manifest['sealed'], self._log_count()
+        if count > start:
+            log = self._map(self.log_path, count * ENTRY.size)
+            # The tail as int64s, five per entry (length and flags share the fifth): one C-level copy, no per-entry unpack
+            keys = _int64s(log[start * ENTRY.size:count * ENTRY.size])[INDEX_FIELDS[index]::ENTRY.size // 8]
+            if high == low + 1:     # One order id or mobile: let array.index do the scanning
+                position = -1
+                with contextlib.suppress(ValueError):
+                    while True:
+                        position = keys.index(low, position + 1)
+                        numbers.append(start + position)
+            else:
+                numbers.extend(number for number, key in enumerate(keys, start) if low <= key < high)
+        return numbers
+
+    def find(self, order_id=None, mobile=None, day=None, limit=None):
+        """Stored receipts for an order id, else a customer mobile and/or a day (datetime.date), newest
+        first (by receipt time)."""
+        if order_id is not None:
+            key = _number(order_id)
+            if not key:
+                return []   # Journaled receipts have no order id yet
+            index, low, high = 'order', key, key + 1
+        elif mobile is not None:
+            key = _number(mobile)
+            index, low, high = 'mobile', key, key + 1
+        elif day is not None:
+            index, (low, high) = 'date', _day_range(day)
+        else:
+            raise ValueError("Look receipts up by order id, mobile number or day.")
+        first, last = _day_range(day) if day is not None else (None, None)
+        found = []
+        with self._locked(exclusive=False):
+            self._refresh()
+            # A day's receipts are sorted by time in each run, so only the newest `limit` of each can make the cut.
+            numbers = self._entry_numbers(index, low, high, limit if index == 'date' else None)
+            log = self._map(self.log_path, (max(numbers) + 1) * ENTRY.size) if numbers else b''
+            entries = sorted((ENTRY.unpack_from(log, number * ENTRY.size) + (number,) for number in numbers),
+                             key=lambda entry: (entry[1], entry[-1]), reverse=True)
+            for entry in entries:
+                if first is not None and not first <= entry[1] < last:
+                    continue
+                found.append(self._receipt(entry[:-1]))
+                if limit and len(found) >= limit:
+                    break
+        return found
+
+    def _receipt(self, entry):
+        order_id, seconds, mobile, offset, length, flags = entry
+        data = self._map(self.data_path, offset + length)
+        return StoredReceipt(order_id or None, EPOCH + datetime.timedelta(seconds=seconds),
+                             f"{mobile:010d}" if mobile else '', self._unpack(data[offset:offset + length], flags))
+
+    def stats(self):
+        with self._locked(exclusive=False):
+            self._refresh()
+            count = self._log_count()
+            index_bytes = sum(os.path.getsize(self._run_path(run, index))
+                              for run in self.manifest['runs'] for index in INDEX_FIELDS)
+            return {'receipts': count, 'unsorted': count - self.manifest['sealed'], 'runs': len(self.manifest['runs']),
+                    'data_bytes': os.path.getsize(self.data_path),
+                    'index_bytes': index_bytes + os.path.getsize(self.log_path)}
+
+    def close(self):
+        """Lets a merge in progress finish (no further one starts), then closes the files."""
+        self._closing = True
+        if self._merger is not None:
+            self._merge_wanted.set()
+            self._merger.join()
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            for handle in (self._data, self._log, self._lock_file):
+                handle.close()
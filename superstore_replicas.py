@@ -0,0 +1,189 @@
+"""Read replicas for the Super Store CLI's storage engines.
+
+A StorageEngine routes inventory listings and reports to one of its replicas (read_connection) when
+the replica is fresh enough and already holds this process's own last write; everything else stays
+on the primary. MySQLReplica is a real replica server; SQLiteReplica is a periodically refreshed
+copy of the primary file, for local testing.
+
+    engine.replicas = [SQLiteReplica('replica.db', engine.path)]
+    with engine.read_connection() as conn:
+        ...
+"""
+try:
+    import mysql.connector
+except ImportError:     # Only MySQL replicas need the connector.
+    mysql = None
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+from superstore_pool import DB_POOL_CONFIG, ConnectionPool, PoolTimeoutError
+
+# Read replicas. Inventory listings, the billing screen's inventory polling and the manager reports
+# read from a replica whose data is at most max_staleness_seconds old and already holds this process's
+# own last write (read-your-writes); writes, checkouts and every other read stay on the primary.
+# MySQL replicas are servers replicating from DB_CONFIG's (SUPERSTORE_MYSQL_REPLICAS=host[:port],...).
+# For local testing, SQLite replicas are files re-copied from the primary every sqlite_refresh_seconds
+# (SUPERSTORE_SQLITE_REPLICAS=replica.db,...).
+REPLICA_CONFIG = {
+    'mysql_replicas': [dict(zip(('host', 'port'), entry.strip().split(':')))
+                       for entry in os.environ.get('SUPERSTORE_MYSQL_REPLICAS', '').split(',') if entry.strip()],
+    'sqlite_replicas': [path.strip() for path in os.environ.get('SUPERSTORE_SQLITE_REPLICAS', '').split(',') if path.strip()],
+    'sqlite_refresh_seconds': 1.0,
+    # Must stay below INVENTORY_CACHE_CONFIG['overlap_seconds'], so delta refreshes cannot miss a row.
+    'max_staleness_seconds': float(os.environ.get('SUPERSTORE_MAX_STALENESS', '2')),
+    'lag_check_interval': 1.0,  # Seconds a MySQL replica's measured lag is trusted before asking it again
+    'retry_seconds': 30,        # A replica that failed is left alone this long
+}
+
+# Driver errors that take a replica out of rotation.
+_REPLICA_ERRORS = (sqlite3.Error,) + ((mysql.connector.Error,) if mysql else ())
+
+class Replica:
+    """A read-only copy of the database that listings and reports can be served from.
+
+    applied_at() is the wall-clock time up to which the replica is known to hold every commit of the
+    primary (None while that is unknown or the replica has failed).
+    """
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self._retry_at = 0.0
+
+    def applied_at(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        return self._applied_at()
+
+    def _applied_at(self):
+        raise NotImplementedError
+
+    def mark_failed(self):
+        """Takes the replica out of rotation for REPLICA_CONFIG['retry_seconds']."""
+        self._retry_at = time.monotonic() + REPLICA_CONFIG['retry_seconds']
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self.pool.acquire()
+        except Exception:
+            self.mark_failed()
+            raise
+        try:
+            yield conn
+        except _REPLICA_ERRORS:
+            self.mark_failed()
+            raise
+        finally:
+            self.pool.release(conn)
+
+    def close(self):
+        self.pool.close_all()
+
+class MySQLReplica(Replica):
+    """A MySQL server replicating from the primary; its lag is read from SHOW REPLICA STATUS."""
+
+    def __init__(self, db_config, pool_config=None):
+        super().__init__(f"{db_config['host']}:{db_config.get('port', 3306)}",
+                         ConnectionPool(lambda: mysql.connector.connect(**db_config), **(pool_config or DB_POOL_CONFIG)))
+        self._checked = float('-inf')
+        self._known = None
+
+    def _applied_at(self):
+        now = time.monotonic()
+        if now - self._checked >= REPLICA_CONFIG['lag_check_interval']:
+            self._checked = now
+            try:
+                with self.connection() as conn:
+                    lag = self._lag(conn)
+            except _REPLICA_ERRORS + (PoolTimeoutError,):
+                lag = None
+            # Seconds_Behind_Source is whole seconds rounded down, hence the extra second.
+            self._known = None if lag is None else time.time() - lag - 1
+        return self._known
+
+    @staticmethod
+    def _lag(conn):
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except mysql.connector.Error:
+                cursor.execute("SHOW SLAVE STATUS")     # MySQL before 8.0.22
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if not row:
+            return None     # Not replicating at all
+        return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+class _ReplicaFileConnection(sqlite3.Connection):
+    """SQLite connection that remembers which copy of the replica file it opened."""
+    generation = 0
+
+class SQLiteReplica(Replica):
+    """A local stand-in for a real replica: a copy of the primary SQLite file, re-made every
+    sqlite_refresh_seconds with the online backup API.
+
+    Each copy is written next to the replica and renamed over it. Readers open the file immutable,
+    so they take no locks and never block the copier; a pooled connection still reading an older copy
+    is reopened on its next checkout.
+    """
+
+    def __init__(self, path, primary_path, pool_config=None, busy_timeout=10):
+        self.path = path
+        self.primary_path = primary_path
+        self.busy_timeout = busy_timeout    # Seconds a copy waits for the primary's write lock
+        self.generation = 0
+        self._copied_at = None
+        super().__init__(path, ConnectionPool(self._connect, is_healthy=self._is_current,
+                                              **dict(pool_config or DB_POOL_CONFIG, max_idle_seconds=0)))
+        self.refresh()
+        self._stop = threading.Event()
+        self._copier = threading.Thread(target=self._copy_loop, name='replica-copier', daemon=True)
+        self._copier.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro&immutable=1", uri=True, isolation_level=None,
+                               check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES, factory=_ReplicaFileConnection)
+        conn.generation = self.generation
+        return conn
+
+    def _is_current(self, conn):
+        return conn.generation == self.generation
+
+    def _applied_at(self):
+        return self._copied_at
+
+    def refresh(self):
+        """Copies the primary into the replica file now."""
+        started = time.time()   # The copy holds everything committed before it started
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        source = sqlite3.connect(self.primary_path, timeout=self.busy_timeout)
+        try:
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+                target.execute("PRAGMA journal_mode=DELETE")    # A WAL copy would need its -wal file
+            finally:
+                target.close()
+        finally:
+            source.close()
+        os.replace(temp_path, self.path)
+        self.generation += 1
+        self._copied_at = started
+
+    def _copy_loop(self):
+        while not self._stop.wait(REPLICA_CONFIG['sqlite_refresh_seconds']):
+            try:
+                self.refresh()
+            except (sqlite3.Error, OSError):
+                self.mark_failed()
+
+    def close(self):
+        self._stop.set()
+        self._copier.join()
+        super().close()
@@ -0,0 +1,178 @@
+"""Analytical sales reports for the Super Store CLI.
+
+Reads Orders/OrderItems straight from the database in fixed-size chunks, turns each chunk into
+columnar NumPy arrays and folds it into running per-product and per-hour totals, so memory stays
+bounded by the chunk size and the catalogue size, never by the number of order lines. Months moved
+to the cold archive (superstore_archive) are read from its memory-mapped columns in the same chunks.
+Money is summed as int64 paise, so totals are exact, and reported as Decimal like the rest of the CLI.
+
+    import superstore_cli as store, superstore_reports as reports
+    report = reports.ReportingEngine(store.get_engine()).report(start=datetime.date(2024, 1, 1))
+
+NumPy is optional for the rest of the CLI; only these reports need it (pip install numpy).
+"""
+import datetime
+import decimal
+import itertools
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import superstore_archive
+from superstore_cart import ZERO, to_money
+
+REPORT_CONFIG = {
+    'chunk_size': 200_000,  # Rows fetched and converted per pass
+    'top_n': 10,            # Rows in each "top" list
+}
+
+def _parse_date(value):
+    """DATE/TIMESTAMP values come back as date/datetime from MySQL and as text from SQLite aggregates."""
+    if value is None or isinstance(value, datetime.date):
+        return value.date() if isinstance(value, datetime.datetime) else value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+def _accumulate(total, keys, weights):
+    """Adds a chunk's int64 weights per key onto a running total, growing the total if the chunk has larger keys."""
+    if len(keys) and keys.max() >= len(total):
+        total = np.concatenate([total, np.zeros(keys.max() + 1 - len(total), dtype=np.int64)])
+    np.add.at(total, keys, weights)
+    return total
+
+def _rupees(paisa):
+    """An int64 paise total as Decimal rupees."""
+    return decimal.Decimal(int(paisa)).scaleb(-2)
+
+class ReportingEngine:
+    """Chunked, vectorised sales analytics over a StorageEngine (MySQL or SQLite)."""
+
+    def __init__(self, engine, chunk_size=None):
+        if np is None:
+            raise RuntimeError("Sales reports need NumPy (pip install numpy).")
+        self.engine = engine
+        self.chunk_size = chunk_size or REPORT_CONFIG['chunk_size']
+        self.archive = superstore_archive.open_archive()
+
+    def _chunks(self, query, params, money):
+        """Yields the query result as 2-D int64 arrays of at most chunk_size rows, with the amount in
+        column `money` converted to paise."""
+        with self.engine.read_connection() as conn:
+            cursor = self.engine.stream_cursor(conn)
+            try:
+                self.engine.execute(cursor, query, params)
+                while True:
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    chunk = np.array(rows, dtype=np.float64)
+                    paisa = np.rint(chunk[:, money] * 100)   # Two-decimal amounts: exact after rounding
+                    chunk = chunk.astype(np.int64)
+                    chunk[:, money] = paisa
+                    yield chunk
+            finally:
+                self.engine.finish_stream(conn, cursor)
+
+    def _date_filter(self, start, end):
+        """WHERE clause on o.order_date for an inclusive [start, end] date range (either end may be open),
+        leaving out hot rows the archive already counts."""
+        where, params = [], []
+        if self.archive:
+            exclude, params = self.archive.hot_exclusion('o')
+            if exclude:
+                where.append(exclude)
+        if start:
+            where.append("o.order_date >= %s")
+            params.append(datetime.datetime.combine(start, datetime.time()))
+        if end:
+            where.append("o.order_date < %s")
+            params.append(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time()))
+        return (" WHERE " + " AND ".join(where)) if where else "", params
+
+    def _days_in_range(self, start, end, where, params):
+        """Length of the reporting window in days; an open start begins at the first matching order."""
+        end = end or datetime.date.today()
+        if start is None:
+            firsts = [_parse_date(self.engine.query_value(f"SELECT MIN(o.order_date) FROM Orders o{where}", params,
+                                                          replica=True))]
+            if self.archive:
+                firsts.append(self.archive.first_order_date(None, end))
+            start = min((first for first in firsts if first), default=None)
+        return max((end - start).days + 1, 1) if start else 0
+
+    def report(self, start=None, end=None, top_n=None):
+        """Top sellers, sales by hour of day, basket averages and days of stock left for [start, end].
+
+        Returns a plain dict of str/int/float/Decimal values (the checkout service sends Decimals as strings).
+        """
+        top_n = top_n or REPORT_CONFIG['top_n']
+        where, where_params = self._date_filter(start, end)
+        hour_expr, hour_params = self.engine.hour_of_day_sql('o.order_date')
+
+        units = revenue = np.zeros(0, dtype=np.int64)
+        hour_units, hour_revenue, hour_orders = (np.zeros(24, dtype=np.int64) for _ in range(3))
+        lines = orders = order_paisa = 0
+
+        archive = self.archive
+
+        # Pass 1: order lines -> per-product and per-hour units/revenue (hot tables, then archived months).
+        for chunk in itertools.chain(
+                self._chunks(f"SELECT oi.product_id, oi.quantity, oi.quantity * oi.price_at_sale, {hour_expr} "
+                             f"FROM OrderItems oi JOIN Orders o ON o.order_id = oi.order_id{where}",
+                             hour_params + where_params, money=2),
+                archive.line_chunks(start, end, self.chunk_size) if archive else ()):
+            product_ids, hours = chunk[:, 0], chunk[:, 3]
+            units = _accumulate(units, product_ids, chunk[:, 1])
+            revenue = _accumulate(revenue, product_ids, chunk[:, 2])
+            np.add.at(hour_units, hours, chunk[:, 1])
+            np.add.at(hour_revenue, hours, chunk[:, 2])
+            lines += len(chunk)
+
+        # Pass 2: order headers -> basket value and orders per hour.
+        for chunk in itertools.chain(
+                self._chunks(f"SELECT o.total_amount, {hour_expr} FROM Orders o{where}", hour_params + where_params,
+                             money=0),
+                archive.order_chunks(start, end, self.chunk_size) if archive else ()):
+            hour_orders += np.bincount(chunk[:, 1], minlength=24)
+            order_paisa += int(chunk[:, 0].sum())
+            orders += len(chunk)
+
+        inventory = {row['product_id']: row for row in self.engine.list_inventory()}
+        days = self._days_in_range(start, end, where, where_params)
+        total_units = int(units.sum())
+
+        def product_rows(order):
+            return [{'product_id': int(p_id), 'name': inventory.get(int(p_id), {}).get('name', f"#{p_id}"),
+                     'units': int(units[p_id]), 'revenue': _rupees(revenue[p_id])}
+                    for p_id in order[:top_n] if units[p_id] > 0]
+
+        # Days of stock left = current stock / average units sold per day over the window (sold SKUs only).
+        sold = np.flatnonzero(units)
+        stock = np.array([inventory[p_id]['stock_quantity'] if p_id in inventory else 0 for p_id in sold.tolist()],
+                         dtype=np.float64)
+        per_day = units[sold] / days if days else np.zeros(len(sold))
+        days_left = np.divide(stock, per_day, out=np.full(len(sold), np.inf), where=per_day > 0)
+        on_sale = np.array([p_id in inventory for p_id in sold.tolist()], dtype=bool)
+        cover_order = np.argsort(days_left, kind='stable')
+        stock_cover = [{'product_id': int(sold[i]), 'name': inventory[int(sold[i])]['name'], 'stock': int(stock[i]),
+                        'units_per_day': round(float(per_day[i]), 2), 'days_left': round(float(days_left[i]), 1)}
+                       for i in cover_order if on_sale[i]][:top_n]
+
+        return {
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat() if end else None,
+            'days': days,
+            'orders': orders,
+            'lines': lines,
+            'units': total_units,
+            'revenue': _rupees(revenue.sum()),
+            'avg_basket_units': round(total_units / orders, 2) if orders else 0.0,
+            'avg_basket_lines': round(lines / orders, 2) if orders else 0.0,
+            'avg_basket_value': to_money(decimal.Decimal(order_paisa) / orders / 100) if orders else ZERO,
+            'top_by_revenue': product_rows(np.argsort(-revenue, kind='stable')),
+            'top_by_units': product_rows(np.argsort(-units, kind='stable')),
+            'hourly': [{'hour': hour, 'orders': int(hour_orders[hour]), 'units': int(hour_units[hour]),
+                        'revenue': _rupees(hour_revenue[hour])} for hour in range(24)],
+            'stock_cover': stock_cover,
+        }
@@ -0,0 +1,100 @@
+"""Cart-time stock reservations for the Super Store CLI.
+
+The storage engine moves units between Inventory and the StockReservations table; each engine's
+ReservationManager decides where a cart's units are taken from and when expired carts are swept.
+
+    engine.reserve_stock(cart.cart_id, product_id, quantity)    # -> engine.reservations.reserve(...)
+    engine.reservations.maybe_sweep()
+"""
+import os
+import threading
+import time
+import uuid
+
+from superstore_cart import InsufficientStockError
+from superstore_metrics import METRICS
+
+# Cart-time stock reservations: adding an item to a cart takes its units off Inventory.stock_quantity
+# at once, so the screen shows what is really still free and the cart's checkout cannot fail on them.
+# Abandoned carts give their units back through the expiry sweep.
+RESERVATION_CONFIG = {
+    'enabled': os.environ.get('SUPERSTORE_RESERVATIONS', '1') == '1',
+    'ttl_seconds': 900,         # A cart's reservations expire this long after its last change
+    'sweep_interval': 30,       # Seconds between expiry sweeps (billing portal and checkout service)
+    'hot_threshold': 10,        # Reservations of one product within hot_window seconds that make it "hot"
+    'hot_window': 10,
+    'allotment_units': 50,      # Units taken at once for a hot product, then handed to carts (0 = off)
+    'allotment_ttl_seconds': 60,    # An unused allotment goes back to stock this long after its last use
+    'allotment_share': 0.5,     # An allotment takes at most this share of the product's free stock
+}
+
+class ReservationManager:
+    """Routes one engine's cart reservations: straight from Inventory, or for hot products from an allotment.
+
+    An allotment is a block of units this process moves off the Inventory row in one update and then
+    hands to its carts from a reservation row of its own, so a busy SKU's Inventory row is locked once
+    per block instead of once per cart.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.holder = f"allot:{uuid.uuid4().hex[:16]}"   # cart_id of this process's allotment rows
+        self._lock = threading.Lock()
+        self._recent = {}           # product_id -> [window start, reservations in the window]
+        self._allotted = set()      # Products this process has taken an allotment of
+        self._last_sweep = time.monotonic()
+        self.stats = {'direct': 0, 'from_allotment': 0, 'allotments': 0, 'refused': 0}
+
+    def _is_hot(self, product_id):
+        now = time.monotonic()
+        with self._lock:
+            window = self._recent.get(product_id)
+            if window is None or now - window[0] > RESERVATION_CONFIG['hot_window']:
+                window = self._recent[product_id] = [now, 0]
+            window[1] += 1
+            return window[1] >= RESERVATION_CONFIG['hot_threshold']
+
+    def _count(self, stat):
+        with self._lock:    # Reservations arrive on several threads (the checkout service's DB workers)
+            self.stats[stat] += 1
+
+    def reserve(self, cart_id, product_id, quantity):
+        block = RESERVATION_CONFIG['allotment_units']
+        if block and self._is_hot(product_id):
+            if self.engine._move_allotment_to_cart(self.holder, cart_id, product_id, quantity):
+                self._count('from_allotment')
+                return
+            # Allotment empty (or none yet): take the next block, if that leaves enough stock for other tills.
+            block = max(block, quantity)
+            if self.engine._move_stock_to_reservation(self.holder, product_id, block, RESERVATION_CONFIG['allotment_ttl_seconds'],
+                                                      min_stock=int(block / RESERVATION_CONFIG['allotment_share'])):
+                self._allotted.add(product_id)
+                self._count('allotments')
+                if self.engine._move_allotment_to_cart(self.holder, cart_id, product_id, quantity):
+                    self._count('from_allotment')
+                    return
+        moved = self.engine._move_stock_to_reservation(cart_id, product_id, quantity, RESERVATION_CONFIG['ttl_seconds'])
+        if not moved and RESERVATION_CONFIG['allotment_units']:
+            # The last units may be sitting in part-used allotments, this process's or another till's:
+            # put them all back and try once more. A till whose allotment went takes a new one or reserves directly.
+            if self.engine.reclaim_allotments(product_id):
+                METRICS.count('reservations.allotments_reclaimed')
+                moved = self.engine._move_stock_to_reservation(cart_id, product_id, quantity, RESERVATION_CONFIG['ttl_seconds'])
+        if not moved:
+            self._count('refused')
+            raise InsufficientStockError([{'product_id': product_id, 'name': f"product #{product_id}", 'quantity': quantity}])
+        self._count('direct')
+
+    def maybe_sweep(self):
+        """Runs the expiry sweep if sweep_interval has passed since the last one; returns the units released."""
+        now = time.monotonic()
+        if now - self._last_sweep < RESERVATION_CONFIG['sweep_interval']:
+            return 0
+        self._last_sweep = now
+        return self.engine.sweep_reservations()
+
+    def close(self):
+        """Gives this process's unused allotments back to stock."""
+        if self._allotted:
+            self.engine.release_reservations(self.holder)
+            self._allotted.clear()
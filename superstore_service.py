@@ -0,0 +1,266 @@
+"""Headless checkout service for the Super Store CLI: one process, one connection pool, many tills.
+
+An asyncio server speaking newline-delimited JSON; tills reach it through RemoteEngine (the
+'service' backend in superstore_engines). Start it with `python superstore_cli.py serve`.
+
+    service = CheckoutService(engine, workers=8)
+    asyncio.run(service.serve('127.0.0.1', 8765))
+"""
+import asyncio
+import datetime
+import decimal
+import functools
+import itertools
+import json
+import sys
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from superstore_cart import Cart, InsufficientStockError, to_money
+from superstore_engines import CHECKOUT_CONFIG, DB_ERRORS, INTEGRITY_ERRORS, INVENTORY_PAGE_SIZE, SERVICE_CONFIG
+from superstore_journal import lines_from_json
+from superstore_metrics import METRICS
+from superstore_pool import PoolTimeoutError
+from superstore_reservations import RESERVATION_CONFIG
+
+class CheckoutService:
+    """Long-running asyncio service exposing billing and inventory operations over a local socket.
+
+    The wire format is one JSON object per line: {"id", "op", "args"} in, {"id", "ok", "result" | "error"} out.
+    Blocking engine calls run on a bounded thread pool, so the number of busy database connections
+    never exceeds `workers` no matter how many tills are connected.
+    """
+
+    def __init__(self, engine, workers=None):
+        self.engine = engine
+        self.workers = workers or SERVICE_CONFIG['workers']
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='store-db')
+        self.carts = {}                 # cart_id -> Cart (whose own cart_id, the reservation id, is prefixed)
+        self._cart_ids = itertools.count(1)
+        self._cart_prefix = f"svc:{uuid.uuid4().hex[:12]}:"     # Reservation id of server-side cart N: prefix + N
+        self.stats = {'clients': 0, 'requests': 0, 'errors': 0}
+
+    async def run_db(self, func, *args, **kwargs):
+        """Runs a blocking engine call on the bounded executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def handle_client(self, reader, writer):
+        self.stats['clients'] += 1
+        owned_carts = set()     # Carts opened on this connection are dropped when the till disconnects
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.dispatch(line, owned_carts)
+                writer.write(json.dumps(response, default=str).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for cart_id in owned_carts:
+                cart = self.carts.pop(cart_id, None)
+                if cart and RESERVATION_CONFIG['enabled']:
+                    try:
+                        await self.run_db(self.engine.release_reservations, cart.cart_id)
+                    except DB_ERRORS + (PoolTimeoutError,):
+                        pass    # Left to the expiry sweep
+            self.stats['clients'] -= 1
+            writer.close()
+
+    async def dispatch(self, line, owned_carts):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object.")
+            request_id = request.get('id')
+            handler = getattr(self, f"op_{request.get('op')}", None)
+            if handler is None:
+                raise ValueError(f"Unknown operation: {request.get('op')}")
+            self.stats['requests'] += 1
+            with METRICS.timed(f"service.{request['op']}"):     # Includes time queued for a DB worker
+                result = await handler(owned_carts, **request.get('args', {}))
+            return {'id': request_id, 'ok': True, 'result': result}
+        except InsufficientStockError as err:
+            error, message, details = 'insufficient_stock', str(err), [item['product_id'] for item in err.short_items]
+        except INTEGRITY_ERRORS as err:
+            error, message, details = 'integrity_error', str(err), None
+        except DB_ERRORS as err:
+            error, message, details = 'db_error', str(err), None
+        except PoolTimeoutError as err:
+            error, message, details = 'busy', str(err), None
+        except (KeyError, TypeError, ValueError) as err:
+            error, message, details = 'bad_request', str(err), None
+        except decimal.InvalidOperation:    # An amount that is not a number, e.g. "price": "abc"
+            error, message, details = 'bad_request', "Invalid amount: money must be a number such as \"15.00\".", None
+        except RuntimeError as err:     # A feature the service was not set up for (e.g. reports without NumPy)
+            error, message, details = 'unavailable', str(err), None
+        except Exception as err:
+            # A bug in one operation must not drop the till's connection (and with it its carts and reservations).
+            traceback.print_exc(file=sys.stderr)
+            METRICS.count('service.internal_errors')
+            error, message, details = 'internal_error', f"{type(err).__name__}: {err}", None
+        self.stats['errors'] += 1
+        return {'id': request_id, 'ok': False, 'error': error, 'message': message, 'details': details}
+
+    # --- Store operations (mirror StorageEngine) ---------------------------------
+
+    async def op_ping(self, owned_carts):
+        return 'pong'
+
+    async def op_metrics(self, owned_carts, reset=False):
+        snapshot = METRICS.snapshot()
+        if reset:
+            METRICS.reset()
+        return snapshot
+
+    async def op_authenticate(self, owned_carts, username, password, role_required):
+        return await self.run_db(self.engine.authenticate, username, password, role_required)
+
+    async def op_inventory_rows_since(self, owned_carts, since=None):
+        since = datetime.datetime.fromisoformat(since) if since else None
+        rows = await self.run_db(self.engine.inventory_rows_since, since)
+        for row in rows:
+            row['updated_at'] = row['updated_at'].isoformat()
+        return rows
+
+    async def op_list_inventory(self, owned_carts):
+        return await self.run_db(self.engine.list_inventory)
+
+    async def op_stock(self, owned_carts, product_id):
+        return await self.run_db(self.engine.stock, int(product_id))
+
+    async def op_inventory_page(self, owned_carts, after_id=0, page_size=INVENTORY_PAGE_SIZE, name_prefix=None,
+                                name_contains=None, max_stock=None):
+        return await self.run_db(self.engine.inventory_page, int(after_id), min(int(page_size), 1000),
+                                 name_prefix, name_contains, max_stock)
+
+    async def op_get_product(self, owned_carts, product_id):
+        return await self.run_db(self.engine.get_product, int(product_id))
+
+    async def op_get_product_by_barcode(self, owned_carts, barcode):
+        return await self.run_db(self.engine.get_product_by_barcode, str(barcode))
+
+    async def op_product_count(self, owned_carts):
+        return await self.run_db(self.engine.product_count)
+
+    async def op_add_product(self, owned_carts, name, price, quantity, barcode=None):
+        return await self.run_db(self.engine.add_product, name, to_money(price), quantity, barcode)
+
+    async def op_restock(self, owned_carts, product_id, add_qty):
+        return await self.run_db(self.engine.restock, int(product_id), int(add_qty))
+
+    async def op_upsert_products(self, owned_carts, rows, stock_mode='set', insert_only=False):
+        rows = [(line_no, dict(row, price=decimal.Decimal(row['price']))) for line_no, row in rows]
+        return await self.run_db(self.engine.upsert_products, rows, stock_mode, insert_only)
+
+    async def op_total_earnings(self, owned_carts):
+        return await self.run_db(self.engine.total_earnings)
+
+    async def op_sales_summary(self, owned_carts, day=None):
+        return await self.run_db(self.engine.sales_summary, datetime.date.fromisoformat(day) if day else None)
+
+    async def op_top_products(self, owned_carts, limit=5):
+        return await self.run_db(self.engine.top_products, limit)
+
+    async def op_sales_report(self, owned_carts, start=None, end=None, top_n=None):
+        start, end = (datetime.date.fromisoformat(day) if day else None for day in (start, end))
+        return await self.run_db(self.engine.sales_report, start, end, top_n)
+
+    async def op_checkout(self, owned_carts, order_list, total_amount, name, mobile, email=None, idempotency_key=None,
+                          order_time=None, cart_id=None):
+        order_time = datetime.datetime.fromisoformat(order_time) if order_time else None
+        return await self.run_db(self.engine.checkout, lines_from_json(order_list), to_money(total_amount), name, mobile, email,
+                                 idempotency_key=idempotency_key, order_time=order_time, cart_id=cart_id)
+
+    async def op_reserve_stock(self, owned_carts, cart_id, product_id, quantity):
+        await self.run_db(self.engine.reserve_stock, str(cart_id), int(product_id), int(quantity))
+
+    async def op_release_reservations(self, owned_carts, cart_id, product_id=None):
+        return await self.run_db(self.engine.release_reservations, str(cart_id),
+                                 int(product_id) if product_id is not None else None)
+
+    async def op_sweep_reservations(self, owned_carts):
+        return await self.run_db(self.engine.sweep_reservations)
+
+    async def op_reservation_summary(self, owned_carts):
+        return await self.run_db(self.engine.reservation_summary)
+
+    # --- Server-side carts (for front ends that do not keep their own) ------------
+
+    async def op_cart_new(self, owned_carts):
+        cart_id = next(self._cart_ids)
+        self.carts[cart_id] = Cart(self._cart_prefix + str(cart_id))
+        owned_carts.add(cart_id)
+        return cart_id
+
+    def _cart_view(self, cart_id):
+        cart = self.carts[cart_id]
+        # Money goes out as strings ("15.00"), so clients see exact amounts.
+        return {'cart_id': cart_id, 'lines': [line.as_dict() for line in cart], 'total': cart.total}
+
+    async def op_cart_get(self, owned_carts, cart_id):
+        return self._cart_view(cart_id)
+
+    async def op_cart_add(self, owned_carts, cart_id, product_id, quantity):
+        cart = self.carts[cart_id]
+        quantity = int(quantity)
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive number.")
+        item = await self.run_db(self.engine.get_product, int(product_id))
+        if item is None:
+            raise ValueError(f"Invalid Item Number: {product_id}")
+        line = cart.get(item['product_id'])
+        if RESERVATION_CONFIG['enabled']:
+            try:
+                await self.run_db(self.engine.reserve_stock, cart.cart_id, item['product_id'], quantity)
+            except InsufficientStockError:
+                raise ValueError(f"Insufficient stock! Only {item['stock_quantity']} available for {item['name']}.") from None
+        elif (line.quantity if line else 0) + quantity > item['stock_quantity']:
+            raise ValueError(f"Insufficient stock! Only {item['stock_quantity']} available for {item['name']}.")
+        cart.add(item, quantity)
+        return self._cart_view(cart_id)
+
+    async def op_cart_remove(self, owned_carts, cart_id, product_id):
+        cart = self.carts[cart_id]
+        if cart.remove(int(product_id)) and RESERVATION_CONFIG['enabled']:
+            await self.run_db(self.engine.release_reservations, cart.cart_id, int(product_id))
+        return self._cart_view(cart_id)
+
+    async def op_cart_reset(self, owned_carts, cart_id):
+        cart = self.carts[cart_id]
+        if cart and RESERVATION_CONFIG['enabled']:
+            await self.run_db(self.engine.release_reservations, cart.cart_id)
+        cart.clear(cart.cart_id)
+        return self._cart_view(cart_id)
+
+    async def op_cart_checkout(self, owned_carts, cart_id, name, mobile, email=None):
+        cart = self.carts[cart_id]
+        if not cart:
+            raise ValueError("Order is empty. Cannot check out.")
+        view = self._cart_view(cart_id)
+        order_id, customer_name = await self.run_db(self.engine.checkout, cart.lines(), cart.total, name, mobile, email,
+                                                    cart_id=cart.cart_id)
+        cart.clear(cart.cart_id)    # The checkout used up the cart's reservations
+        return {'order_id': order_id, 'customer_name': customer_name, 'lines': view['lines'], 'total': view['total']}
+
+    async def sweep_reservations(self):
+        """Background task: returns expired reservations to stock every sweep_interval seconds."""
+        while True:
+            await asyncio.sleep(RESERVATION_CONFIG['sweep_interval'])
+            try:
+                await self.run_db(self.engine.sweep_reservations)
+            except DB_ERRORS + (PoolTimeoutError,):
+                pass    # Retried next interval
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        if RESERVATION_CONFIG['enabled']:
+            self._sweeper = asyncio.create_task(self.sweep_reservations())    # Held so the task is not collected
+        group = ", group commit" if CHECKOUT_CONFIG['group_commit'] else ""
+        print(f"Checkout service ({self.engine.name} backend, {self.workers} DB workers{group}) listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
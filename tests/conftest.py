@@ -0,0 +1,60 @@
+"""Shared fixtures: every storage-engine test runs against SQLite and, when a server is reachable, MySQL.
+
+The MySQL engine connects with DB_CONFIG (superstore_engines.py) and is skipped when the connector is
+missing or the server cannot be reached. Tests only touch products they add themselves, so they can
+run against a database that already holds data.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import superstore_engines
+from superstore_archive import ARCHIVE_CONFIG
+from superstore_metrics import METRICS_CONFIG
+from superstore_pool import PoolTimeoutError
+
+@pytest.fixture(autouse=True)
+def _scratch_files(tmp_path, monkeypatch):
+    """Keeps the slow-query log and the order archive out of the working directory."""
+    monkeypatch.setitem(METRICS_CONFIG, 'slow_log_path', str(tmp_path / 'slow.log'))
+    monkeypatch.setitem(ARCHIVE_CONFIG, 'directory', str(tmp_path / 'archive'))
+
+def _open_engine(backend, tmp_path):
+    if backend == 'sqlite':
+        return superstore_engines.SQLiteEngine(str(tmp_path / 'superstore.db'))
+    if superstore_engines.mysql is None:
+        pytest.skip("mysql-connector-python is not installed")
+    engine = superstore_engines.MySQLEngine()
+    try:
+        engine.ping()
+    except superstore_engines.DB_ERRORS + (PoolTimeoutError,) as err:
+        engine.close()
+        pytest.skip(f"no MySQL server reachable with DB_CONFIG: {err}")
+    return engine
+
+@pytest.fixture(params=['sqlite', 'mysql'])
+def engine(request, tmp_path):
+    """A fresh engine per test; SQLite-only tests narrow it with parametrize('engine', ['sqlite'], indirect=True)."""
+    engine = _open_engine(request.param, tmp_path)
+    yield engine
+    engine.close()
+
+@pytest.fixture
+def add_product(engine):
+    """Adds a product with a name no other test uses; returns its inventory row."""
+    def add(price='25.50', quantity=10):
+        product_id = engine.add_product(f"Test item {uuid.uuid4().hex[:12]}", price, quantity)
+        return engine.get_product(product_id)
+    return add
+
+@pytest.fixture
+def order_line():
+    """Builds an order_list entry for checkout(), priced from a product's inventory row."""
+    def line(product, quantity):
+        return {'product_id': product['product_id'], 'name': product['name'], 'quantity': quantity,
+                'price': product['price'], 'subtotal': product['price'] * quantity}
+    return line
@@ -0,0 +1,62 @@
+"""Cold order archive. SQLite only: archiving moves every closed month out of the hot tables."""
+import datetime
+
+import pytest
+
+pytest.importorskip('numpy')     # The archive's column files are NumPy arrays
+
+from superstore_archive import OrderArchive, archive_orders, month_of, open_archive, verify_archive
+
+pytestmark = pytest.mark.parametrize('engine', ['sqlite'], indirect=True)
+
+OLD_SALE = datetime.datetime(2024, 1, 15, 10, 30)
+
+def _archive_closed_months(engine):
+    return archive_orders(engine, OrderArchive(), before=month_of(datetime.date.today()), log=lambda message: None)
+
+def test_archived_totals_match_the_hot_ones(engine, add_product, order_line):
+    product = add_product(price='19.99', quantity=20)
+    for day in (3, 3, 17):
+        lines = [order_line(product, 2)]
+        engine.checkout(lines, lines[0]['subtotal'], 'Asha', '9000000001', order_time=datetime.datetime(2024, 1, day, 9))
+    recent = [order_line(product, 1)]
+    engine.checkout(recent, recent[0]['subtotal'], 'Ravi', '9000000002')
+    report, earnings = engine.sales_report(), engine.total_earnings()
+
+    assert _archive_closed_months(engine) == ['2024-01']
+
+    assert engine.query_value("SELECT COUNT(*) FROM Orders") == 1
+    archive = open_archive()
+    assert verify_archive(engine, archive) == []
+    after = engine.sales_report()
+    assert (after['orders'], after['units'], after['revenue']) == (report['orders'], report['units'], report['revenue'])
+    assert after['revenue'] == report['revenue'] == product['price'] * 7
+    assert engine.total_earnings() == earnings
+    engine.rebuild_rollups()
+    assert engine.check_rollups() == []
+
+def test_late_replay_of_an_archived_order_is_not_written_again(engine, add_product, order_line):
+    product = add_product(quantity=10)
+    lines = [order_line(product, 4)]
+    stored = engine.checkout(lines, lines[0]['subtotal'], 'Asha', '9000000001', idempotency_key='late-sale', order_time=OLD_SALE)
+    _archive_closed_months(engine)
+    assert engine.query_value("SELECT COUNT(*) FROM Orders WHERE idempotency_key = %s", ('late-sale',)) == 0
+
+    # The journal replays the same sale after its month went to the archive.
+    assert engine.checkout(lines, lines[0]['subtotal'], 'Asha', '9000000001', idempotency_key='late-sale',
+                           order_time=OLD_SALE) == stored
+    assert engine.checkout_group([{'order_list': lines, 'total_amount': lines[0]['subtotal'], 'name': 'Asha',
+                                   'mobile': '9000000001', 'idempotency_key': 'late-sale', 'order_time': OLD_SALE}]) == [stored]
+    assert engine.stock(product['product_id']) == 6
+    assert engine.query_value("SELECT COUNT(*) FROM Orders") == 0
+
+def test_an_order_for_an_archived_month_becomes_a_new_segment(engine, add_product, order_line):
+    product = add_product(quantity=10)
+    lines = [order_line(product, 1)]
+    engine.checkout(lines, lines[0]['subtotal'], 'Asha', '9000000001', order_time=OLD_SALE)
+    _archive_closed_months(engine)
+    engine.checkout(lines, lines[0]['subtotal'], 'Ravi', '9000000002', order_time=OLD_SALE + datetime.timedelta(days=1))
+
+    assert _archive_closed_months(engine) == ['2024-01~2']
+    assert engine.sales_report()['orders'] == 2
+    assert verify_archive(engine, open_archive()) == []
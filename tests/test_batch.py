@@ -0,0 +1,95 @@
+"""Batch billing order files: CSV grouping, JSONL errors, column aliases, and replaying a file with keys."""
+import io
+import json
+import uuid
+
+import superstore_cli
+from superstore_batch import read_orders
+from superstore_journal import JOURNAL_CONFIG
+
+def _read(text, fmt):
+    return list(read_orders(io.StringIO(text), fmt))
+
+def _lines(order):
+    return (order['ref'], order['lines'])
+
+def test_csv_rows_are_grouped_by_ref():
+    orders = _read("Order,Customer,Phone,email,Product,Qty\n"      # Every header an alias
+                   "A-1,Asha,9876543210,asha@example.com,1,2\n"
+                   "A-1,,,,4,1\n"
+                   "\n"
+                   "A-2,Ravi,9123456780,,3,5\n"
+                   "A-1,Meera,9000000001,,2,1\n", 'csv')
+
+    assert [_lines(order) for order, _ in orders] == [('A-1', [(1, 2), (4, 1)]), ('A-2', [(3, 5)]), ('A-1', [(2, 1)])]
+    assert [error for _, error in orders] == [None, None, None]
+    first = orders[0][0]
+    assert (first['line'], first['name'], first['mobile'], first['email']) == (2, 'Asha', '9876543210', 'asha@example.com')
+    assert orders[2][0]['name'] == 'Meera'      # Not consecutive with the first A-1: an order of its own
+
+def test_csv_without_ref_is_one_order_per_row():
+    orders = _read("name,mobile,product_id,quantity\nAsha,9876543210,1,2\nAsha,9876543210,1,3\n", 'csv')
+    assert [(order['ref'], order['lines']) for order, _ in orders] == [(None, [(1, 2)]), (None, [(1, 3)])]
+
+def test_csv_bad_row_fails_its_whole_order():
+    orders = _read("ref,name,mobile,product_id,quantity\n"
+                   "B-1,Asha,9876543210,1,2\n"
+                   "B-1,,,x,1\n"
+                   "B-1,,,4,0\n"
+                   "B-2,Ravi,9123456780,3,1\n", 'csv')
+
+    (partial, error), (good, good_error) = orders
+    assert _lines(partial) == ('B-1', [(1, 2)])     # Lines read before the bad row, so the ref can be reported
+    assert error == "line 3: Invalid Item Number: x"
+    assert _lines(good) == ('B-2', [(3, 1)]) and good_error is None
+
+def test_jsonl_bad_lines_are_reported_and_the_rest_read():
+    text = '\n'.join([
+        json.dumps({'ref': 'J-1', 'name': 'Asha', 'mobile': '9876543210', 'lines': [{'product_id': 1, 'quantity': 2}]}),
+        '{"ref": "J-2", "lines": [',
+        json.dumps({'order_ref': 'J-3', 'customer': 'Ravi', 'phone': 9123456780,
+                    'items': [{'product': '4', 'qty': 1}, {'product': 5, 'qty': -1}]}),
+        '"a string"',
+        json.dumps({'ref': 'J-5', 'name': 'Meera', 'lines': []}),
+        json.dumps({'ref': 'J-6', 'lines': ['1']}),
+        '',
+        json.dumps({'Order': 'J-8', 'Customer_Name': 'Kiran', 'Mobile_Number': '9000000001', 'Idempotency_Key': 'k-8',
+                    'Items': [{'Product_ID': 7}]}),
+    ]) + '\n'
+
+    orders = _read(text, 'jsonl')
+
+    assert [(order['line'], order['ref'], error and error.split(' (')[0]) for order, error in orders] == [
+        (1, 'J-1', None),
+        (2, None, "Invalid JSON"),
+        (3, 'J-3', "Quantity must be a positive whole number"),
+        (4, None, "Expected a JSON object"),
+        (5, 'J-5', "Order has no lines"),
+        (6, 'J-6', "Order lines must be JSON objects"),
+        (8, 'J-8', None),
+    ]
+    assert orders[2][0]['mobile'] == '9123456780' and orders[2][0]['name'] == 'Ravi'
+    last = orders[-1][0]
+    assert (last['name'], last['mobile'], last['key'], last['lines']) == ('Kiran', '9000000001', 'k-8', [(7, 1)])
+
+def test_replayed_file_is_not_sold_twice(engine, add_product, tmp_path, monkeypatch):
+    monkeypatch.setitem(JOURNAL_CONFIG, 'mode', 'off')
+    product = add_product(quantity=10)
+    run = uuid.uuid4().hex
+    path = tmp_path / 'orders.jsonl'
+    path.write_text(''.join(json.dumps({'ref': f"R-{number}", 'key': f"{run}-{number}", 'name': 'Asha', 'mobile': '9876543210',
+                                        'lines': [{'product_id': product['product_id'], 'quantity': 2}]}) + '\n'
+                            for number in (1, 2)), encoding='utf-8')
+
+    def bill():
+        products = {str(product['product_id']): engine.get_product(product['product_id'])}
+        with open(path, encoding='utf-8') as stream:
+            return [superstore_cli.sell_batch_order(engine, order, products) for order, error in read_orders(stream, 'jsonl')]
+
+    first = bill()
+    replay = bill()     # e.g. the batch was killed before it wrote its results, and is run again
+
+    assert [result['status'] for result in first + replay] == ['committed'] * 4
+    assert [result['order_id'] for result in replay] == [result['order_id'] for result in first]
+    assert engine.stock(product['product_id']) == 6
+    assert engine.query_value("SELECT COUNT(*) FROM Orders WHERE idempotency_key LIKE %s", (f"{run}-%",)) == 2
@@ -0,0 +1,78 @@
+"""The billing cart: merged lines, removal, running totals and money rounding."""
+import decimal
+
+import pytest
+
+from superstore_cart import ZERO, Cart, to_money
+
+D = decimal.Decimal
+
+NOODLES = {'product_id': 1, 'name': 'Maggie Noodles', 'price': D('15.00'), 'stock_quantity': 100}
+TEA = {'product_id': 4, 'name': 'Tata Tea Gold 500g', 'price': D('290.00'), 'stock_quantity': 12}
+
+@pytest.mark.parametrize('value, expected', [
+    (0.1 + 0.2, '0.30'),
+    (1.005, '1.01'),        # repr gives '1.005'; Decimal(1.005) itself is 1.00499999...
+    (2.675, '2.68'),
+    (19.99, '19.99'),
+    (3, '3.00'),
+    ('12.345', '12.35'),
+    (D('-0.005'), '-0.01'),
+])
+def test_to_money(value, expected):
+    assert to_money(value) == D(expected)
+    assert str(to_money(value)) == expected
+
+def test_repeated_product_ids_merge_into_one_line():
+    cart = Cart()
+    first = cart.add(NOODLES, 2)
+    cart.add(TEA, 1)
+    again = cart.add(dict(NOODLES, price=D('99.00')), 3)    # The price is fixed when the line is first added
+
+    assert again is first
+    assert len(cart) == 2 and [line['product_id'] for line in cart] == [1, 4]
+    assert (first.quantity, first.price, first['subtotal']) == (5, D('15.00'), D('75.00'))
+    assert (cart.units, cart.total) == (6, D('365.00'))
+    assert 1 in cart and 2 not in cart and cart.get(4).quantity == 1
+
+@pytest.mark.parametrize('quantity', [0, -1])
+def test_add_refuses_a_non_positive_quantity(quantity):
+    cart = Cart()
+    with pytest.raises(ValueError):
+        cart.add(NOODLES, quantity)
+    assert not cart
+
+def test_remove_part_or_all_of_a_line():
+    cart = Cart()
+    cart.add(NOODLES, 5)
+    cart.add(TEA, 2)
+
+    assert cart.remove(1, 2) == 2
+    assert (cart.get(1).quantity, cart.units, cart.total) == (3, 5, D('625.00'))
+    assert cart.remove(1, 10) == 3          # No more than the line holds
+    assert 1 not in cart and cart.units == 2
+    assert cart.remove(1) == 0 and cart.remove(99) == 0
+    assert cart.remove(4) == 2
+    assert (len(cart), cart.units, cart.total) == (0, 0, ZERO)
+
+def test_clear_starts_a_new_cart_id():
+    cart = Cart('till-1')
+    cart.add(NOODLES, 1)
+    cart.clear()
+    assert (cart.lines(), cart.units, cart.total) == ([], 0, ZERO)
+    assert cart.cart_id not in ('till-1', None)
+    cart.clear('till-2')
+    assert cart.cart_id == 'till-2'
+
+def test_total_rounds_half_up_and_stays_exact():
+    cart = Cart()
+    cart.add({'product_id': 7, 'name': 'Loose rice (kg)', 'price': '10.005'}, 3)     # Rounded half up to 10.01
+    cart.add({'product_id': 8, 'name': 'Candy', 'price': 0.1}, 10)
+
+    assert cart.get(7).price == D('10.01')
+    assert cart.total == D('31.03')
+    assert str(cart.total) == '31.03'
+    for _ in range(1000):                   # Running totals do not drift the way float sums would
+        cart.add({'product_id': 8, 'name': 'Candy', 'price': 0.1}, 1)
+        cart.remove(8, 1)
+    assert cart.total == sum(line['subtotal'] for line in cart) == D('31.03')
@@ -0,0 +1,136 @@
+"""Catalogue import: per-row errors, stock modes and insert-only, from small CSV and JSON Lines files."""
+import decimal
+import json
+import random
+import uuid
+
+import pytest
+
+from superstore_catalog import import_catalog
+
+@pytest.fixture
+def prefix():
+    """A name prefix no other run uses, so the tests can share a database that already holds data."""
+    return f"Import {uuid.uuid4().hex[:8]} "
+
+@pytest.fixture
+def barcode():
+    return lambda: f"{random.randrange(10 ** 12):012d}9"
+
+def _import(engine, path, **options):
+    errors = []
+    summary = import_catalog(engine, str(path), on_error=lambda line_no, message: errors.append((line_no, message)), **options)
+    return summary, dict(errors)
+
+def _row(engine, name):
+    rows = engine.query_all("SELECT name, price, stock_quantity, barcode FROM Inventory WHERE name = %s", (name,))
+    return rows[0] if rows else None
+
+def test_csv_rows_with_errors_are_reported_and_skipped(engine, tmp_path, prefix, barcode):
+    code = barcode()
+    path = tmp_path / 'catalog.csv'
+    path.write_text(
+        "Name,Price,Stock,SKU,product_id\n"                 # Aliased, mixed-case headers; product_id is ignored
+        f"{prefix}Rice,55.5,10,{code},999999\n"
+        f"{prefix}Dal,abc,5,,\n"
+        f"{prefix}Oil,120,-2,,\n"
+        f"{prefix}Sugar,40,1.5,,\n"
+        f"{prefix}Rice,60,1,,\n"
+        f"{prefix}Salt,20,3,{code},\n"
+        "\n"
+        f"{prefix}Tea,290,4,,\n"
+        f",10,1,,\n", encoding='utf-8')
+
+    summary, errors = _import(engine, path, batch_size=1)
+
+    assert sorted(errors) == [3, 4, 5, 6, 7, 10]
+    assert "Invalid price 'abc'" in errors[3]
+    assert "negative" in errors[4] and "Invalid stock quantity '1.5'" in errors[5]
+    assert "Duplicate of line 2" in errors[6] and f"Barcode {code} already used on line 2" in errors[7]
+    assert "Missing product name" in errors[10]
+    assert summary == {'rows': 8, 'inserted': 2, 'updated': 0, 'errors': 6, 'batches': 2}
+    rice = _row(engine, f"{prefix}Rice")
+    assert (rice['price'], rice['stock_quantity'], rice['barcode']) == (decimal.Decimal('55.50'), 10, code)
+    assert _row(engine, f"{prefix}Tea")['stock_quantity'] == 4
+    assert _row(engine, f"{prefix}Salt") is None
+
+def test_jsonl_unreadable_lines_and_aliases(engine, tmp_path, prefix):
+    path = tmp_path / 'catalog.jsonl'
+    path.write_text('\n'.join([
+        json.dumps({'name': f"{prefix}Biscuit", 'price': 10, 'qty': 5}),
+        'not json',
+        '[1, 2]',
+        '',
+        json.dumps({'NAME': f"{prefix}Butter", 'price': '56.00', 'quantity': 3.0}),
+        json.dumps({'name': f"{prefix}Ghee", 'price': 1e12, 'stock': 1}),
+    ]) + '\n', encoding='utf-8')
+
+    summary, errors = _import(engine, path)
+
+    assert sorted(errors) == [2, 3, 6]
+    assert errors[2].startswith("Invalid JSON") and errors[3] == "Expected a JSON object"
+    assert errors[6].startswith("Price must be between")
+    assert (summary['inserted'], summary['errors']) == (2, 3)
+    assert _row(engine, f"{prefix}Butter")['stock_quantity'] == 3
+
+@pytest.mark.parametrize('stock_mode, expected', [('set', 5), ('add', 15)])
+def test_stock_mode(engine, tmp_path, prefix, stock_mode, expected):
+    engine.add_product(f"{prefix}Soap", '30.00', 10)
+    path = tmp_path / 'restock.csv'
+    path.write_text(f"name,price,stock\n{prefix}Soap,32.00,5\n{prefix}Shampoo,150,2\n", encoding='utf-8')
+
+    summary, errors = _import(engine, path, stock_mode=stock_mode)
+
+    assert errors == {}
+    assert (summary['inserted'], summary['updated']) == (1, 1)
+    soap = _row(engine, f"{prefix}Soap")
+    assert (soap['price'], soap['stock_quantity']) == (decimal.Decimal('32.00'), expected)
+    assert _row(engine, f"{prefix}Shampoo")['stock_quantity'] == 2       # A new product starts at the file's stock
+
+def test_insert_only_rejects_existing_products(engine, tmp_path, prefix):
+    engine.add_product(f"{prefix}Soap", '30.00', 10)
+    path = tmp_path / 'new.jsonl'
+    path.write_text(json.dumps({'name': f"{prefix}Soap", 'price': 1, 'stock': 1}) + '\n'
+                    + json.dumps({'name': f"{prefix}Comb", 'price': 15, 'stock': 8}) + '\n', encoding='utf-8')
+
+    summary, errors = _import(engine, path, insert_only=True)
+
+    assert errors == {1: f"Product '{prefix}Soap' already exists"}
+    assert (summary['inserted'], summary['updated']) == (1, 0)
+    soap = _row(engine, f"{prefix}Soap")
+    assert (soap['price'], soap['stock_quantity']) == (decimal.Decimal('30.00'), 10)
+    assert _row(engine, f"{prefix}Comb")['stock_quantity'] == 8
+
+def test_barcode_owned_by_another_product_is_rejected(engine, tmp_path, prefix, barcode):
+    code = barcode()
+    engine.add_product(f"{prefix}Soap", '30.00', 10, barcode=code)
+    path = tmp_path / 'catalog.csv'
+    path.write_text(f"name,price,stock,barcode\n{prefix}Comb,15,8,{code}\n", encoding='utf-8')
+
+    summary, errors = _import(engine, path)
+
+    assert errors == {2: f"Barcode {code} already belongs to '{prefix}Soap'"}
+    assert summary['inserted'] == 0 and _row(engine, f"{prefix}Comb") is None
+
+    path.write_text(f"name,price,stock,barcode\n{prefix}Soap,31,9,{code}\n", encoding='utf-8')
+    summary, errors = _import(engine, path)
+    assert errors == {} and summary['updated'] == 1     # The owner itself may keep its barcode
+
+def test_rows_the_database_rejects_are_redone_one_by_one(engine, tmp_path, prefix, barcode, monkeypatch):
+    code = barcode()
+    engine.add_product(f"{prefix}Soap", '30.00', 10, barcode=code)
+    # Another session assigns the barcode between the batch's checks and its INSERT: the checks see no owner.
+    matching = engine._matching
+    monkeypatch.setattr(engine, '_matching', lambda cursor, column, values, extra_column=None:
+                        [] if column == 'barcode' else matching(cursor, column, values, extra_column))
+    path = tmp_path / 'catalog.csv'
+    path.write_text(f"name,price,stock,barcode\n{prefix}Comb,15,8,\n{prefix}Brush,40,2,{code}\n{prefix}Soap,31,1,\n",
+                    encoding='utf-8')
+
+    summary, errors = _import(engine, path, stock_mode='add')
+
+    assert list(errors) == [3]          # Only the offending row; the rest of the batch is written
+    assert (summary['inserted'], summary['updated'], summary['errors']) == (1, 1, 1)
+    assert _row(engine, f"{prefix}Comb")['stock_quantity'] == 8
+    assert _row(engine, f"{prefix}Brush") is None
+    assert _row(engine, f"{prefix}Soap")['stock_quantity'] == 11
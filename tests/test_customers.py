@@ -0,0 +1,94 @@
+"""Customer lookups at checkout: the mobile -> customer cache, and two tills registering the same new mobile."""
+import random
+
+import pytest
+
+import superstore_cache
+from superstore_cache import CustomerCache
+
+CUSTOMER_BY_MOBILE = "SELECT customer_id, name FROM Customers WHERE mobile_number = %s"
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test moves by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(superstore_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+@pytest.fixture
+def mobile():
+    return f"9{random.randrange(10 ** 9):09d}"     # Not one a database shared with other runs already holds
+
+def test_least_recently_used_customer_is_evicted():
+    cache = CustomerCache(max_entries=2)
+    cache.put('9000000001', 1, 'Asha')
+    cache.put('9000000002', 2, 'Ravi')
+    assert cache.get('9000000001') == (1, 'Asha')      # Now the most recently used
+
+    cache.put('9000000003', 3, 'Meera')
+
+    assert cache.get('9000000002') is None
+    assert cache.get('9000000001') == (1, 'Asha') and cache.get('9000000003') == (3, 'Meera')
+    assert len(cache) == 2
+    assert cache.stats == {'hits': 3, 'misses': 1, 'evictions': 1, 'expired': 0}
+
+def test_put_again_refreshes_an_entry():
+    cache = CustomerCache(max_entries=2)
+    cache.put('9000000001', 1, 'Asha')
+    cache.put('9000000002', 2, 'Ravi')
+    cache.put('9000000001', 1, 'Asha K')
+    cache.put('9000000003', 3, 'Meera')
+    assert cache.get('9000000001') == (1, 'Asha K')
+    assert cache.get('9000000002') is None
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = CustomerCache(ttl_seconds=60)
+    cache.put('9000000001', 1, 'Asha')
+    clock[0] += 60
+    assert cache.get('9000000001') == (1, 'Asha')       # Exactly the TTL old is still fresh
+    clock[0] += 1
+    assert cache.get('9000000001') is None
+    assert len(cache) == 0
+    assert cache.stats['expired'] == 1
+
+def test_warm_loads_without_counting_lookups():
+    cache = CustomerCache(max_entries=2)
+    cache.warm([(1, '9000000001', 'Asha'), (2, '9000000002', 'Ravi'), (3, '9000000003', 'Meera')])
+    assert len(cache) == 2 and cache.get('9000000001') is None     # Most recent last: the first was evicted
+    assert cache.stats['hits'] == 0
+
+def test_returning_customer_comes_from_the_cache(engine, add_product, order_line, mobile):
+    product = add_product(quantity=10)
+    lines = [order_line(product, 1)]
+    first = engine.checkout(lines, lines[0]['subtotal'], 'Asha', mobile)
+    hits = engine.customer_cache.stats['hits']
+
+    second = engine.checkout(lines, lines[0]['subtotal'], 'Someone else', mobile)
+
+    assert engine.customer_cache.stats['hits'] == hits + 1
+    assert second[1] == first[1] == 'Asha'      # The receipt shows the registered name
+
+def test_duplicate_mobile_reuses_the_customer_another_till_registered(engine, add_product, order_line, mobile, monkeypatch):
+    product = add_product(quantity=10)
+    lines = [order_line(product, 1)]
+    engine.checkout(lines, lines[0]['subtotal'], 'Asha', mobile)        # "The other till" registers the mobile
+    customer_id = engine.query_value("SELECT customer_id FROM Customers WHERE mobile_number = %s", (mobile,))
+    engine.customer_cache.discard(mobile)
+
+    # This till's first lookup ran before the other till committed: it finds nothing and INSERTs.
+    executed = []
+    execute = engine.execute
+    def racing_execute(cursor, query, params=()):
+        if query == CUSTOMER_BY_MOBILE and CUSTOMER_BY_MOBILE not in executed:
+            params = ('not a mobile',)
+        executed.append(query)
+        return execute(cursor, query, params)
+    monkeypatch.setattr(engine, 'execute', racing_execute)
+
+    order_id, customer_name = engine.checkout(lines, lines[0]['subtotal'], 'Someone else', mobile)
+
+    assert "ROLLBACK TO SAVEPOINT new_customer" in executed
+    assert customer_name == 'Asha'
+    assert engine.query_value("SELECT customer_id FROM Orders WHERE order_id = %s", (order_id,)) == customer_id
+    assert engine.query_value("SELECT COUNT(*) FROM Customers WHERE mobile_number = %s", (mobile,)) == 1
+    assert engine.stock(product['product_id']) == 8
@@ -0,0 +1,74 @@
+"""Store operations of the storage engines (SQLite, and MySQL when a server is reachable)."""
+import decimal
+
+import pytest
+
+from superstore_cart import InsufficientStockError
+
+def test_authenticate(engine):
+    assert engine.authenticate('cashier', 'pass123', 'billing') == {'username': 'cashier', 'role': 'billing'}
+    assert engine.authenticate('manager', 'admin456', 'admin')['role'] == 'admin'
+    assert engine.authenticate('cashier', 'wrong', 'billing') is None
+    assert engine.authenticate('cashier', 'pass123', 'admin') is None
+
+def test_add_list_and_restock(engine, add_product):
+    product = add_product(price='12.25', quantity=7)
+    assert product['price'] == decimal.Decimal('12.25')
+    assert product['stock_quantity'] == 7
+
+    listed = {row['product_id']: row for row in engine.list_inventory()}
+    assert listed[product['product_id']]['name'] == product['name']
+
+    assert engine.restock(product['product_id'], 5) is True
+    assert engine.stock(product['product_id']) == 12
+    # The listing is served from the inventory cache; a restock must not leave it stale.
+    listed = {row['product_id']: row for row in engine.list_inventory()}
+    assert listed[product['product_id']]['stock_quantity'] == 12
+
+def test_restock_unknown_product(engine):
+    missing = (engine.query_value("SELECT MAX(product_id) FROM Inventory") or 0) + 1000
+    assert engine.restock(missing, 5) is False
+
+def test_checkout_takes_stock_and_records_earnings(engine, add_product, order_line):
+    first, second = add_product(price='15.00', quantity=10), add_product(price='7.35', quantity=4)
+    earnings = engine.total_earnings()
+    lines = [order_line(first, 3), order_line(second, 2)]
+    total = sum(line['subtotal'] for line in lines)
+
+    order_id, customer_name = engine.checkout(lines, total, 'Asha', '9000000001')
+
+    assert order_id
+    assert customer_name
+    assert engine.stock(first['product_id']) == 7
+    assert engine.stock(second['product_id']) == 2
+    assert engine.query_value("SELECT COUNT(*) FROM OrderItems WHERE order_id = %s", (order_id,)) == 2
+    assert isinstance(engine.total_earnings(), decimal.Decimal)
+    assert engine.total_earnings() - earnings == decimal.Decimal('59.70')
+    assert engine.check_rollups() == []
+
+def test_shortfall_rolls_back_the_whole_order(engine, add_product, order_line):
+    plenty, scarce = add_product(quantity=10), add_product(quantity=1)
+    orders = engine.query_value("SELECT COUNT(*) FROM Orders")
+    earnings = engine.total_earnings()
+    lines = [order_line(plenty, 2), order_line(scarce, 3)]
+
+    with pytest.raises(InsufficientStockError) as raised:
+        engine.checkout(lines, sum(line['subtotal'] for line in lines), 'Ravi', '9000000002')
+
+    assert [item['product_id'] for item in raised.value.short_items] == [scarce['product_id']]
+    # Neither line was taken: the line that had enough stock was rolled back with the short one.
+    assert engine.stock(plenty['product_id']) == 10
+    assert engine.stock(scarce['product_id']) == 1
+    assert engine.query_value("SELECT COUNT(*) FROM Orders") == orders
+    assert engine.total_earnings() == earnings
+
+def test_checkout_with_repeated_key_is_written_once(engine, add_product, order_line):
+    product = add_product(quantity=10)
+    lines = [order_line(product, 2)]
+    key = f"test-{product['product_id']}"
+
+    first = engine.checkout(lines, lines[0]['subtotal'], 'Asha', '9000000001', idempotency_key=key)
+    again = engine.checkout(lines, lines[0]['subtotal'], 'Asha', '9000000001', idempotency_key=key)
+
+    assert again == first
+    assert engine.stock(product['product_id']) == 8
@@ -0,0 +1,73 @@
+"""Group commit: several orders in one transaction, each behind its own savepoint."""
+import threading
+
+import pytest
+
+from superstore_cart import InsufficientStockError
+from superstore_engines import CHECKOUT_CONFIG
+
+def _order(lines, name, mobile, **extra):
+    return dict({'order_list': lines, 'total_amount': sum(line['subtotal'] for line in lines), 'name': name, 'mobile': mobile},
+                **extra)
+
+def test_failed_order_rolls_back_to_its_savepoint(engine, add_product, order_line):
+    first, scarce = add_product(quantity=10), add_product(quantity=2)
+    orders = [
+        _order([order_line(first, 1), order_line(scarce, 1)], 'Asha', '9000000001'),
+        _order([order_line(first, 4), order_line(scarce, 5)], 'Ravi', '9000000002'),    # Short of `scarce`
+        _order([order_line(first, 2)], 'Meena', '9000000003'),
+    ]
+
+    results = engine.checkout_group(orders)
+
+    assert isinstance(results[1], InsufficientStockError)
+    assert [item['product_id'] for item in results[1].short_items] == [scarce['product_id']]
+    assert all(isinstance(result, tuple) and result[0] for result in (results[0], results[2]))
+    # The short order's line of `first` was undone with it; the orders around it committed.
+    assert engine.stock(first['product_id']) == 7
+    assert engine.stock(scarce['product_id']) == 1
+    ids = (results[0][0], results[2][0])
+    assert engine.query_value("SELECT COUNT(*) FROM Orders WHERE order_id IN (%s, %s)", ids) == 2
+    assert engine.check_rollups() == []
+
+def test_repeated_key_in_a_group_returns_the_stored_order(engine, add_product, order_line):
+    product = add_product(quantity=10)
+    order = _order([order_line(product, 3)], 'Asha', '9000000001', idempotency_key=f"group-{product['product_id']}")
+
+    first = engine.checkout_group([order])[0]
+    assert engine.checkout_group([order, order]) == [first, first]
+    assert engine.stock(product['product_id']) == 7
+
+def test_concurrent_checkouts_share_transactions(engine, add_product, order_line, monkeypatch):
+    monkeypatch.setitem(CHECKOUT_CONFIG, 'group_commit', True)
+    monkeypatch.setitem(CHECKOUT_CONFIG, 'group_window_ms', 50)
+    product = add_product(quantity=5)
+    results, start = [], threading.Barrier(8)
+
+    def till(n):
+        start.wait()
+        try:
+            results.append(engine.checkout([order_line(product, 1)], product['price'], 'Asha', f"90000001{n:02d}"))
+        except InsufficientStockError as err:
+            results.append(err)
+
+    threads = [threading.Thread(target=till, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sold = [result for result in results if isinstance(result, tuple)]
+    assert len(sold) == 5
+    assert len(results) - len(sold) == 3
+    assert len({order_id for order_id, _ in sold}) == 5
+    assert engine.stock(product['product_id']) == 0
+    assert engine._group_committer.stats['groups'] < len(results)
+    assert engine.check_rollups() == []
+
+@pytest.mark.parametrize('batched', [True, False])
+def test_group_matches_per_order_checkout(engine, add_product, order_line, batched):
+    product = add_product(quantity=6)
+    results = engine.checkout_group([_order([order_line(product, 2)], 'Asha', '9000000001') for _ in range(3)], batched)
+    assert all(isinstance(result, tuple) for result in results)
+    assert engine.stock(product['product_id']) == 0
@@ -0,0 +1,112 @@
+"""Inventory cache: delta refresh on updated_at, the periodic full refresh, and invalidation after writes."""
+import datetime
+
+import pytest
+
+import superstore_cache
+from superstore_cache import InventoryCache
+
+T0 = datetime.datetime(2025, 3, 14, 9, 0)
+
+class FakeInventory:
+    """An Inventory table for InventoryCache's fetch_rows, recording every `since` it is asked for."""
+
+    def __init__(self):
+        self.rows = {}
+        self.fetches = []
+
+    def write(self, product_id, stock, at, name=None):
+        self.rows[product_id] = {'product_id': product_id, 'name': name or f"Item {product_id}", 'price': 10,
+                                 'stock_quantity': stock, 'barcode': None, 'updated_at': at}
+
+    def __call__(self, since):
+        self.fetches.append(since)
+        return [dict(row) for product_id, row in sorted(self.rows.items())
+                if since is None or row['updated_at'] >= since]
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(superstore_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+@pytest.fixture
+def table():
+    table = FakeInventory()
+    for product_id in (1, 2, 3):
+        table.write(product_id, 10, T0)
+    return table
+
+def _stock(cache):
+    return {row['product_id']: row['stock_quantity'] for row in cache.get_inventory()}
+
+def test_delta_refresh_reads_only_recent_changes(table, clock):
+    cache = InventoryCache(table, refresh_interval=2.0, overlap_seconds=5)
+    changes = []
+    cache.listeners.append(lambda rows, full_load: changes.append(([row['product_id'] for row in rows], full_load)))
+    assert _stock(cache) == {1: 10, 2: 10, 3: 10}
+
+    table.write(2, 7, T0 + datetime.timedelta(seconds=30))
+    table.write(0, 4, T0 + datetime.timedelta(seconds=31))
+    assert _stock(cache) == {1: 10, 2: 10, 3: 10}       # Served from the snapshot for refresh_interval
+    clock[0] += 2
+    rows = cache.get_inventory()
+
+    assert [row['product_id'] for row in rows] == [0, 1, 2, 3]     # A new lower id is sorted in
+    assert _stock(cache)[2] == 7
+    assert table.fetches == [None, T0 - datetime.timedelta(seconds=5)]
+    clock[0] += 2
+    cache.get_inventory()
+    assert table.fetches[-1] == T0 + datetime.timedelta(seconds=26)    # Newest updated_at seen, less the overlap
+    assert changes == [([1, 2, 3], True), ([0, 2], False), ([], False)]     # Re-read but unchanged rows are not passed on
+    assert cache.cached_rows() == rows and cache.cached_rows()[0] is not rows[0]
+
+def test_late_commit_is_missed_by_deltas_until_the_full_refresh(table, clock):
+    cache = InventoryCache(table, refresh_interval=2.0, overlap_seconds=5, full_refresh_seconds=300)
+    cache.get_inventory()
+    table.write(3, 9, T0 + datetime.timedelta(seconds=60))
+
+    # Stamped at +10s, but its transaction only commits after the +60s write was already read.
+    clock[0] += 2
+    cache.get_inventory()
+    table.write(1, 1, T0 + datetime.timedelta(seconds=10))
+    clock[0] += 2
+    assert _stock(cache)[1] == 10
+
+    clock[0] += 300
+    assert _stock(cache) == {1: 1, 2: 10, 3: 9}
+    assert table.fetches[-1] is None
+    assert (cache.stats['full_loads'], cache.stats['full_refreshes'], cache.stats['late_rows']) == (1, 1, 1)
+
+def test_full_refresh_can_be_turned_off(table, clock):
+    cache = InventoryCache(table, full_refresh_seconds=0)
+    cache.get_inventory()
+    clock[0] += 10_000
+    cache.get_inventory()
+    assert table.fetches[-1] == T0 - cache.overlap
+
+def test_invalidate_refreshes_at_once_and_clear_reloads(table, clock):
+    cache = InventoryCache(table, refresh_interval=60)
+    cache.get_inventory()
+    table.write(1, 3, T0 + datetime.timedelta(seconds=1))
+    cache.invalidate()
+    assert _stock(cache)[1] == 3
+    cache.clear()
+    cache.get_inventory()
+    assert table.fetches[-1] is None and cache.stats['full_loads'] == 2
+
+def test_restock_and_add_product_invalidate_the_engines_cache(engine, add_product):
+    product = add_product(quantity=10)
+    engine.list_inventory()
+    hits = engine.inventory_cache.stats['hits']
+    assert {row['product_id'] for row in engine.list_inventory()} >= {product['product_id']}
+    assert engine.inventory_cache.stats['hits'] == hits + 1
+
+    engine.restock(product['product_id'], 5)
+    by_id = {row['product_id']: row for row in engine.list_inventory()}
+    assert by_id[product['product_id']]['stock_quantity'] == 15
+
+    added = add_product(quantity=3)
+    by_id = {row['product_id']: row for row in engine.list_inventory()}
+    assert by_id[added['product_id']]['stock_quantity'] == 3
+    assert by_id[product['product_id']]['stock_quantity'] == 15
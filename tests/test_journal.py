@@ -0,0 +1,57 @@
+"""Offline order journal: replaying journaled sales into the database."""
+import uuid
+
+import pytest
+
+from superstore_journal import JournalReplayer, OrderJournal
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = OrderJournal(str(tmp_path / 'journal'), fsync_interval=0)
+    yield journal
+    journal.close()
+
+def test_replay_applies_each_sale_once(engine, journal, add_product, order_line):
+    product = add_product(quantity=10)
+    lines = [order_line(product, 3)]
+    key = uuid.uuid4().hex
+    journal.record_sale(lines, lines[0]['subtotal'], 'Asha', '9000000001', key=key)
+    replayer = JournalReplayer(journal, lambda: engine)
+
+    assert replayer.replay_all() == (1, 0)
+    assert not journal.pending
+    assert engine.stock(product['product_id']) == 7
+    orders = engine.query_value("SELECT COUNT(*) FROM Orders")
+
+    # The 'applied' record was lost (crash before its fsync): the same sale is pending again.
+    journal.record_sale(lines, lines[0]['subtotal'], 'Asha', '9000000001', key=key)
+    assert replayer.replay_all() == (1, 0)
+
+    assert engine.stock(product['product_id']) == 7
+    assert engine.query_value("SELECT COUNT(*) FROM Orders") == orders
+    assert engine.query_value("SELECT COUNT(*) FROM Orders WHERE idempotency_key = %s", (key,)) == 1
+
+def test_sale_short_of_stock_becomes_a_conflict(engine, journal, add_product, order_line):
+    sold_out, plenty = add_product(quantity=1), add_product(quantity=10)
+    short_key = journal.record_sale([order_line(sold_out, 2)], sold_out['price'] * 2, 'Asha', '9000000001')
+    journal.record_sale([order_line(plenty, 1)], plenty['price'], 'Ravi', '9000000002')
+
+    assert JournalReplayer(journal, lambda: engine).replay_all() == (1, 1)
+
+    # The conflict neither blocked the sale behind it nor took any stock.
+    assert list(journal.conflicts) == [short_key]
+    assert engine.stock(sold_out['product_id']) == 1
+    assert engine.stock(plenty['product_id']) == 9
+
+def test_journal_survives_reopening(tmp_path, order_line):
+    product = {'product_id': 1, 'name': 'Maggie Noodles', 'price': 15}
+    journal = OrderJournal(str(tmp_path / 'journal'), fsync_interval=0)
+    key = journal.record_sale([order_line(product, 2)], 30, 'Asha', '9000000001')
+    journal.close()
+
+    reopened = OrderJournal(str(tmp_path / 'journal'), fsync_interval=0)
+    try:
+        assert list(reopened.pending) == [key]
+        assert reopened.pending[key]['order_list'][0]['quantity'] == 2
+    finally:
+        reopened.close()
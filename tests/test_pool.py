@@ -0,0 +1,130 @@
+"""Connection pool, with a fake connection factory (no database server needed)."""
+import threading
+
+import pytest
+
+import superstore_pool
+from superstore_pool import ConnectionPool, PoolTimeoutError
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.pings = 0
+        self.rollbacks = 0
+
+    def is_connected(self):
+        self.pings += 1
+        return self.alive
+
+    def rollback(self):
+        if not self.alive:
+            raise OSError("connection lost")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+class FakeFactory:
+    """Opens numbered FakeConnections; fails instead while `failing` is set."""
+
+    def __init__(self):
+        self.opened = []
+        self.failing = False
+
+    def __call__(self):
+        if self.failing:
+            raise OSError("server unreachable")
+        conn = FakeConnection(len(self.opened) + 1)
+        self.opened.append(conn)
+        return conn
+
+@pytest.fixture
+def connect():
+    return FakeFactory()
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(superstore_pool.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_most_recently_released_connection_is_reused_first(connect, clock):
+    pool = ConnectionPool(connect, pool_size=3)
+    first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(third)
+    pool.release(second)
+
+    assert [pool.acquire().number for _ in range(3)] == [2, 3, 1]
+    assert pool.stats['created'] == 3 and pool.stats['checkouts'] == 6
+    assert first.rollbacks == 1     # Handed back with no open transaction
+    assert sum(conn.pings for conn in connect.opened) == 0      # Recently used: no health check
+
+def test_dead_idle_connection_is_replaced(connect, clock):
+    pool = ConnectionPool(connect, pool_size=1, max_idle_seconds=300)
+    conn = pool.acquire()
+    pool.release(conn)
+    clock[0] += 301
+    conn.alive = False      # e.g. the server's wait_timeout closed it
+
+    replacement = pool.acquire()
+
+    assert replacement is not conn and replacement.number == 2
+    assert conn.closed and conn.pings == 1
+    assert pool.stats['reconnects'] == 1
+    pool.release(replacement)
+    assert pool.acquire() is replacement      # Still one slot: the dead one did not leak it
+
+def test_idle_connection_is_kept_when_the_check_passes(connect, clock):
+    pool = ConnectionPool(connect, max_idle_seconds=300)
+    conn = pool.acquire()
+    pool.release(conn)
+    clock[0] += 301
+    assert pool.acquire() is conn
+    assert conn.pings == 1 and pool.stats['reconnects'] == 0
+
+def test_exhausted_pool_times_out(connect):
+    pool = ConnectionPool(connect, pool_size=1, checkout_timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats['timeouts'] == 1 and len(connect.opened) == 1
+
+def test_waiter_gets_the_connection_released_meanwhile(connect):
+    pool = ConnectionPool(connect, pool_size=1, checkout_timeout=5)
+    conn = pool.acquire()
+    releaser = threading.Timer(0.05, pool.release, (conn,))
+    releaser.start()
+
+    assert pool.acquire() is conn
+    releaser.join()
+    assert pool.stats['waits'] == 1 and pool.stats['wait_time_max'] > 0
+
+def test_broken_connection_is_discarded_on_release(connect):
+    pool = ConnectionPool(connect, pool_size=1, checkout_timeout=0.05)
+    conn = pool.acquire()
+    conn.alive = False
+    pool.release(conn)
+
+    assert conn.closed
+    assert pool.acquire().number == 2
+
+def test_failed_connect_frees_its_slot(connect):
+    pool = ConnectionPool(connect, pool_size=1, checkout_timeout=0.05)
+    connect.failing = True
+    with pytest.raises(OSError):
+        pool.acquire()
+    connect.failing = False
+    assert pool.acquire().number == 1
+
+def test_close_all_closes_idle_connections(connect):
+    pool = ConnectionPool(connect, pool_size=2)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.close_all()
+    assert first.closed and not second.closed
+    pool.release(second)
+    assert pool.acquire() is second
@@ -0,0 +1,134 @@
+"""ProductIndex: barcode, prefix and typo-tolerant lookups, and incremental maintenance."""
+import uuid
+
+import pytest
+
+import superstore_engines
+from superstore_cache import ProductIndex, _SortedKeys
+from superstore_engines import DatabaseLookup
+
+ROWS = [
+    {'product_id': 1, 'name': 'Maggie Noodles', 'price': 15, 'stock_quantity': 100, 'barcode': '8901058000016'},
+    {'product_id': 2, 'name': 'Sunfeast Biscuit', 'price': 10, 'stock_quantity': 80, 'barcode': None},
+    {'product_id': 3, 'name': 'Pepsi Can (300ml)', 'price': 40, 'stock_quantity': 24, 'barcode': '8902080000011'},
+    {'product_id': 4, 'name': 'Tata Tea Gold 500g', 'price': 290, 'stock_quantity': 12, 'barcode': None},
+    {'product_id': 5, 'name': 'Tata Salt 1kg', 'price': 28, 'stock_quantity': 50, 'barcode': None},
+    {'product_id': 6, 'name': 'Amul Butter 100g', 'price': 56, 'stock_quantity': 30, 'barcode': None},
+]
+
+@pytest.fixture
+def index():
+    index = ProductIndex()
+    index.apply([dict(row) for row in ROWS], full_load=True)
+    return index
+
+def ids(rows):
+    return [row['product_id'] for row in rows]
+
+def test_barcode(index):
+    assert index.by_barcode(' 8902080000011 ')['name'] == 'Pepsi Can (300ml)'
+    assert index.by_barcode('0000000000000') is None
+    assert ids(index.search('8901058000016')) == [1]
+
+def test_name_and_word_prefix(index):
+    assert ids(index.autocomplete('tata')) == [5, 4]           # Ranked by name: "tata salt" < "tata tea"
+    assert ids(index.autocomplete('Tata Te')) == [4]
+    assert ids(index.autocomplete('bisc')) == [2]               # Prefix of a later word
+    assert ids(index.autocomplete('tata g')) == [4]             # Earlier words exact, last one a prefix
+    assert index.autocomplete('   ') == []
+    assert ids(index.autocomplete('t', limit=1)) == [5]
+
+@pytest.mark.parametrize('typed, expected', [
+    ('nodles', [1]),            # Deletion
+    ('noodless', [1]),          # Insertion
+    ('biscuot', [2]),           # Substitution
+    ('bsicuit', [2]),           # Adjacent transposition
+    ('tata xyzzy', [5, 4]),     # A word matching nothing is ignored
+    ('amul buttr', [6]),
+])
+def test_fuzzy(index, typed, expected):
+    assert ids(index.fuzzy(typed)) == expected
+
+def test_fuzzy_needs_whole_words_for_short_ones(index):
+    assert index.fuzzy('tex') == []         # Too short to be a typo of "tea"
+    assert index.fuzzy('zzzzzz') == []
+
+def test_upsert_of_a_renamed_product(index):
+    index.upsert({'product_id': 2, 'name': 'Britannia Marie Gold', 'price': 30, 'stock_quantity': 80, 'barcode': '8901063000019'})
+
+    assert index.autocomplete('sunfeast') == []
+    assert index.fuzzy('biscuit') == []
+    assert ids(index.autocomplete('brit')) == [2]
+    assert ids(index.fuzzy('marei')) == [2]
+    assert index.by_barcode('8901063000019')['price'] == 30
+    assert ids(index.autocomplete('gold')) == [2, 4]
+
+def test_upsert_of_price_and_stock_only(index):
+    index.upsert(dict(ROWS[0], price=16, stock_quantity=99))
+    assert index.get(1)['price'] == 16
+    assert index.autocomplete('maggie')[0]['stock_quantity'] == 99
+
+def test_remove_unindexes_every_key(index):
+    index.remove(3)
+
+    assert index.get(3) is None
+    assert index.by_barcode('8902080000011') is None
+    assert index.autocomplete('pepsi') == [] and index.fuzzy('pespi') == []
+    assert 'pepsi' not in index.tokens
+    assert not any('pepsi' in words for words in index.wildcards.values())
+    index.remove(3)     # Removing twice is harmless
+    assert len(index) == len(ROWS) - 1
+
+def test_incremental_index_matches_a_bulk_built_one(index):
+    incremental = ProductIndex()
+    for row in ROWS:
+        incremental.upsert(dict(row))
+    assert list(incremental.names.irange(('',))) == list(index.names.irange(('',)))
+    assert incremental.tokens == index.tokens
+    assert incremental.wildcards == index.wildcards
+
+def test_sorted_keys_across_chunks(monkeypatch):
+    monkeypatch.setattr(_SortedKeys, 'CHUNK_SIZE', 4)
+    keys = _SortedKeys(range(0, 40, 2))
+    for key in range(39, 0, -2):
+        keys.add(key)
+    for key in (0, 17, 39, 100):
+        keys.discard(key)
+
+    expected = [key for key in range(40) if key not in (0, 17, 39)]
+    assert list(keys.irange(-1)) == expected
+    assert list(keys.irange(16)) == [key for key in expected if key >= 16]
+    assert list(keys.irange(99)) == []
+    assert len(keys) == len(expected)
+    assert max(map(len, keys._chunks)) <= 8
+
+def test_engine_index_follows_the_inventory_cache(engine, add_product):
+    index = engine.product_index()
+    product = add_product()
+    engine.restock(product['product_id'], 5)
+
+    # add_product/restock invalidate the cache; its next delta refresh updates the same index in place.
+    found = engine.product_index().autocomplete(product['name'])
+    assert ids(found) == [product['product_id']]
+    assert found[0]['stock_quantity'] == product['stock_quantity'] + 5
+    assert engine.product_index() is index
+
+def test_large_catalogue_is_looked_up_in_the_database(engine, add_product, monkeypatch):
+    monkeypatch.setattr(superstore_engines, 'PRODUCT_INDEX_MAX_PRODUCTS', 0)
+    product = add_product()
+    barcode = f"{product['product_id']:08d}{uuid.uuid4().hex[:6]}"
+    with_barcode = engine.get_product(engine.add_product(f"Scan {uuid.uuid4().hex[:12]}", '9.99', 4, barcode=barcode))
+
+    lookup = engine.product_lookup()
+
+    assert isinstance(lookup, DatabaseLookup) and engine.product_lookup() is lookup
+    assert engine.inventory_cache.stats['full_loads'] == 0      # The catalogue was never loaded whole
+    assert lookup.by_barcode(f" {barcode} ")['product_id'] == with_barcode['product_id']
+    assert lookup.search(barcode) == [engine.get_product_by_barcode(barcode)]
+    assert ids(lookup.search(product['name'][:-2])) == [product['product_id']]      # Name prefix
+    assert ids(lookup.search(product['name'][5:], limit=5)) == [product['product_id']]     # Substring
+    assert lookup.search('no such product ' + uuid.uuid4().hex) == [] and lookup.by_barcode('  ') is None
+
+def test_small_catalogue_uses_the_product_index(engine, add_product):
+    add_product()
+    assert engine.product_lookup() is engine.product_index()
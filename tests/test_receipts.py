@@ -0,0 +1,125 @@
+"""Receipt store: lookups across sealed, merged and unsorted receipts, crash repair, and the printed layout."""
+import datetime
+import decimal
+import os
+
+import pytest
+
+from superstore_receipts import ENTRY, ReceiptStore, Sale, render_receipt, render_receipts
+
+D = decimal.Decimal
+AT = datetime.datetime(2025, 3, 14, 9, 26)
+
+def _old_generate_receipt(order_id, order_list, total_amount, mobile, customer_name, stamp):
+    """The receipt generate_receipt printed before the store existed, line for line."""
+    receipt = []
+    receipt.append("=============================================")
+    receipt.append("          SUPER STORE SALES RECEIPT          ")
+    receipt.append("=============================================")
+    receipt.append(f"Order ID: {order_id:<20} Date: {stamp}")
+    receipt.append(f"Customer Name: {customer_name}")
+    receipt.append(f"Customer Mobile: {mobile}")
+    receipt.append("---------------------------------------------")
+    receipt.append("Item                    Qty   Price    Total")
+    receipt.append("---------------------------------------------")
+    for item in order_list:
+        name = item['name'][:20].ljust(20)
+        qty = str(item['quantity']).ljust(3)
+        price = f"₹{item['price']:.2f}".ljust(6)
+        subtotal = f"₹{item['subtotal']:.2f}"
+        receipt.append(f"{name} {qty} {price} {subtotal}")
+    receipt.append("---------------------------------------------")
+    receipt.append(f"Subtotal:                               ₹{total_amount:.2f}")
+    receipt.append(f"TOTAL AMOUNT:                           ₹{total_amount:.2f}")
+    receipt.append("=============================================\n")
+    return '\n'.join(receipt)
+
+def _sale(order_id, mobile='9000000001', at=AT, lines=None):
+    if lines is None:
+        lines = [{'name': 'Maggie Noodles', 'quantity': 2, 'price': D('15.00'), 'subtotal': D('30.00')}]
+    return Sale(order_id, lines, sum(line['subtotal'] for line in lines), mobile, 'Asha', at)
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReceiptStore(str(tmp_path / 'receipts'), seal_every=4, background_merge=False)
+    yield store
+    store.close()
+
+@pytest.mark.parametrize('lines', [
+    [{'name': 'Maggie Noodles', 'quantity': 2, 'price': D('15.00'), 'subtotal': D('30.00')}],
+    [{'name': 'Tata Tea Gold Premium Leaf 500g', 'quantity': 12, 'price': D('290.5'), 'subtotal': D('3486.00')},
+     {'name': 'Salt', 'quantity': 1, 'price': D('1234.99'), 'subtotal': D('1234.99')}],
+    [],
+])
+def test_receipt_is_byte_for_byte_the_old_layout(lines):
+    sale = _sale(4711, lines=lines)
+    old = _old_generate_receipt(4711, lines, sale.total, '9000000001', 'Asha', AT.strftime('%Y-%m-%d %H:%M'))
+
+    assert render_receipt(sale).encode('utf-8') == old.encode('utf-8')
+    assert render_receipts([sale, sale]) == [old, old]
+
+def test_find_across_runs_merges_and_the_tail(store):
+    days = [AT + datetime.timedelta(days=number % 3, minutes=number) for number in range(10)]
+    for number, at in enumerate(days, 1):
+        store.append([_sale(number, mobile=f"90000000{number % 2:02d}", at=at)])
+    store.append([_sale('J-1a2b', mobile='9111111111', at=AT)])     # Journaled: no order id yet
+
+    # Sealed every 4 receipts: two runs, three receipts still unsorted.
+    assert (store.stats()['runs'], store.stats()['unsorted']) == (2, 3)
+
+    def check():
+        assert [receipt.order_id for receipt in store.find(order_id=6)] == [6]
+        assert '₹30.00' in store.find(order_id=6)[0].text
+        assert store.find(order_id=99) == [] and store.find(order_id='J-1a2b') == []
+        assert [receipt.order_id for receipt in store.find(mobile='9000000001')] == [9, 3, 5, 7, 1]
+        assert [receipt.order_id for receipt in store.find(mobile='9111111111')] == [None]
+        assert [receipt.order_id for receipt in store.find(day=AT.date())] == [10, 7, 4, None, 1]   # Same time: the later append first
+        assert [receipt.order_id for receipt in store.find(day=AT.date(), limit=2)] == [10, 7]
+        assert store.find(order_id=2)[0].text == render_receipt(_sale(2, mobile='9000000000', at=days[1]))
+
+    check()
+    assert store.merge() == 1       # The two runs of 4 become one of 8
+    assert store.stats()['runs'] == 1
+    check()
+    store.seal()                    # Seals the tail, then merges again while runs are of similar size
+    assert (store.stats()['runs'], store.stats()['unsorted']) == (2, 0)
+    check()
+    assert len(store) == 11
+
+def test_background_merge_keeps_the_runs_few(tmp_path):
+    store = ReceiptStore(str(tmp_path / 'receipts'), seal_every=2, background_merge=True)
+    for number in range(1, 33):
+        store.append([_sale(number)])
+    store.merge()           # Waits for a merge in progress, then does what is left
+    try:
+        assert store.merge_error is None
+        # How the runs pair up depends on when the merger ran, but they stay few and cover every receipt.
+        runs = store.manifest['runs']
+        assert len(runs) <= 3 and sum(run['count'] for run in runs) == 32 and store.stats()['unsorted'] == 0
+        assert len(store.find(mobile='9000000001')) == 32
+        assert [receipt.order_id for receipt in store.find(order_id=17)] == [17]
+        names = sorted(os.listdir(tmp_path / 'receipts'))
+        assert len([name for name in names if name.startswith('run-')]) == 3 * len(runs)     # Merged parts are deleted
+        assert not [name for name in names if name.endswith('.tmp')]
+    finally:
+        store.close()
+    assert not store._merger.is_alive()
+
+def test_reopen_after_a_torn_log_entry(tmp_path):
+    directory = str(tmp_path / 'receipts')
+    store = ReceiptStore(directory, seal_every=100)
+    store.append([_sale(1), _sale(2), _sale(3)])
+    store.close()
+    with open(os.path.join(directory, 'receipts.log'), 'ab') as log:
+        log.write(b'\x07' * (ENTRY.size // 2))     # A crash part way through the next entry
+
+    store = ReceiptStore(directory, seal_every=100)
+    try:
+        assert len(store) == 3
+        assert [receipt.order_id for receipt in store.find(mobile='9000000001')] == [3, 2, 1]
+        store.append([_sale(4)])
+        assert os.path.getsize(os.path.join(directory, 'receipts.log')) == 4 * ENTRY.size
+        assert [receipt.order_id for receipt in store.find(order_id=4)] == [4]
+        assert store.find(order_id=3)[0].text == render_receipt(_sale(3))
+    finally:
+        store.close()
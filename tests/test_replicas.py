@@ -0,0 +1,74 @@
+"""Read replicas: which reads go to a replica, and read-your-writes. Uses SQLite replica files."""
+import sqlite3
+
+import pytest
+
+from superstore_replicas import REPLICA_CONFIG, SQLiteReplica
+
+pytestmark = pytest.mark.parametrize('engine', ['sqlite'], indirect=True)
+
+@pytest.fixture
+def replica(engine, tmp_path, monkeypatch):
+    monkeypatch.setitem(REPLICA_CONFIG, 'sqlite_refresh_seconds', 3600)     # Copied only when a test says so
+    replica = SQLiteReplica(str(tmp_path / 'replica.db'), engine.path)
+    engine.replicas.append(replica)     # Closed with the engine
+    return replica
+
+def _set_stock_behind_the_engines_back(engine, product_id, quantity):
+    """A write the engine does not know about, so it cannot route around the replica for it."""
+    conn = sqlite3.connect(engine.path)
+    try:
+        conn.execute("UPDATE Inventory SET stock_quantity = ? WHERE product_id = ?", (quantity, product_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def test_reads_go_to_a_fresh_replica(engine, add_product, replica):
+    product = add_product(quantity=10)
+    replica.refresh()
+    _set_stock_behind_the_engines_back(engine, product['product_id'], 3)
+
+    assert engine.get_product(product['product_id'])['stock_quantity'] == 10    # The replica's copy
+    assert engine.stock(product['product_id']) == 3                             # Not a replica read
+
+    replica.refresh()
+    assert engine.get_product(product['product_id'])['stock_quantity'] == 3
+
+def test_own_writes_are_read_from_the_primary(engine, add_product, replica):
+    product = add_product(quantity=10)
+    replica.refresh()
+
+    engine.restock(product['product_id'], 5)
+
+    # The replica is fresh but older than this process's write, so the read goes to the primary.
+    assert engine.get_product(product['product_id'])['stock_quantity'] == 15
+    replica.refresh()
+    _set_stock_behind_the_engines_back(engine, product['product_id'], 1)
+    assert engine.get_product(product['product_id'])['stock_quantity'] == 15    # Back on the replica
+
+def test_stale_or_failed_replica_is_skipped(engine, add_product, replica, monkeypatch):
+    product = add_product(quantity=10)
+    replica.refresh()
+    _set_stock_behind_the_engines_back(engine, product['product_id'], 4)
+
+    monkeypatch.setitem(REPLICA_CONFIG, 'max_staleness_seconds', -1)
+    assert engine.get_product(product['product_id'])['stock_quantity'] == 4
+    monkeypatch.setitem(REPLICA_CONFIG, 'max_staleness_seconds', 3600)
+    replica.mark_failed()
+    assert engine.get_product(product['product_id'])['stock_quantity'] == 4
+
+def test_reads_inside_a_transaction_stay_on_the_primary(engine, add_product, replica):
+    product = add_product(quantity=10)
+    replica.refresh()
+    _set_stock_behind_the_engines_back(engine, product['product_id'], 2)
+
+    with engine.connection():
+        with engine.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT stock_quantity FROM Inventory WHERE product_id = ?", (product['product_id'],))
+            assert cursor.fetchone()[0] == 2
+
+def test_writes_are_not_tracked_without_replicas(engine, add_product):
+    product = add_product(quantity=10)
+    engine.restock(product['product_id'], 1)
+    assert engine.last_write_at == 0.0
@@ -0,0 +1,117 @@
+"""Cart-time stock reservations."""
+import uuid
+
+import pytest
+
+from superstore_cart import InsufficientStockError
+from superstore_reservations import RESERVATION_CONFIG, ReservationManager
+
+@pytest.fixture
+def cart_id():
+    return uuid.uuid4().hex
+
+def test_reserve_takes_units_off_stock(engine, add_product, cart_id):
+    product = add_product(quantity=10)
+    engine.reserve_stock(cart_id, product['product_id'], 3)
+    engine.reserve_stock(cart_id, product['product_id'], 2)
+
+    assert engine.stock(product['product_id']) == 5
+    assert engine.query_value("SELECT quantity FROM StockReservations WHERE cart_id = %s AND product_id = %s",
+                              (cart_id, product['product_id'])) == 5
+
+def test_reserve_beyond_stock_is_refused(engine, add_product, cart_id):
+    product = add_product(quantity=2)
+    with pytest.raises(InsufficientStockError):
+        engine.reserve_stock(cart_id, product['product_id'], 3)
+    assert engine.stock(product['product_id']) == 2
+
+def test_release_gives_units_back(engine, add_product, cart_id):
+    first, second = add_product(quantity=10), add_product(quantity=10)
+    engine.reserve_stock(cart_id, first['product_id'], 4)
+    engine.reserve_stock(cart_id, second['product_id'], 1)
+
+    assert engine.release_reservations(cart_id, first['product_id']) == 4     # One line removed from the cart
+    assert engine.stock(first['product_id']) == 10
+    assert engine.stock(second['product_id']) == 9
+    assert engine.release_reservations(cart_id) == 1                          # The whole sale abandoned
+    assert engine.stock(second['product_id']) == 10
+
+def test_sweep_returns_expired_reservations(engine, add_product, cart_id, monkeypatch):
+    product = add_product(quantity=10)
+    monkeypatch.setitem(RESERVATION_CONFIG, 'ttl_seconds', -60)
+    engine.reserve_stock(cart_id, product['product_id'], 6)
+    assert engine.stock(product['product_id']) == 4
+
+    assert engine.sweep_reservations() == 6
+    assert engine.stock(product['product_id']) == 10
+    assert engine.sweep_reservations() == 0
+
+def test_checkout_uses_the_carts_reservations(engine, add_product, order_line, cart_id):
+    reserved, unreserved = add_product(quantity=10), add_product(quantity=10)
+    engine.reserve_stock(cart_id, reserved['product_id'], 3)
+    lines = [order_line(reserved, 2), order_line(unreserved, 1)]
+
+    engine.checkout(lines, sum(line['subtotal'] for line in lines), 'Asha', '9000000001', cart_id=cart_id)
+
+    # Two reserved units were sold, the third went back to stock; the unreserved line came off stock.
+    assert engine.stock(reserved['product_id']) == 8
+    assert engine.stock(unreserved['product_id']) == 9
+    assert engine.query_value("SELECT COUNT(*) FROM StockReservations WHERE cart_id = %s", (cart_id,)) == 0
+
+def test_reserved_units_cannot_be_sold_to_another_cart(engine, add_product, order_line, cart_id):
+    product = add_product(quantity=3)
+    engine.reserve_stock(cart_id, product['product_id'], 3)
+
+    with pytest.raises(InsufficientStockError):
+        engine.checkout([order_line(product, 1)], product['price'], 'Ravi', '9000000002')
+    engine.checkout([order_line(product, 3)], product['price'] * 3, 'Asha', '9000000001', cart_id=cart_id)
+    assert engine.stock(product['product_id']) == 0
+
+def test_hot_product_is_served_from_an_allotment(engine, add_product, monkeypatch):
+    monkeypatch.setitem(RESERVATION_CONFIG, 'hot_threshold', 2)
+    monkeypatch.setitem(RESERVATION_CONFIG, 'allotment_units', 20)
+    product = add_product(quantity=100)
+    carts = [uuid.uuid4().hex for _ in range(5)]
+    for cart in carts:
+        engine.reserve_stock(cart, product['product_id'], 1)
+
+    # One direct reservation, then a single block of 20 off the Inventory row that the later carts share.
+    assert engine.stock(product['product_id']) == 100 - 1 - 20
+    assert engine.reservations.stats['allotments'] == 1
+    for cart in carts:
+        engine.release_reservations(cart)
+    engine.release_reservations(engine.reservations.holder)
+    assert engine.stock(product['product_id']) == 100
+
+def test_last_units_are_not_stuck_in_another_tills_allotment(engine, add_product, monkeypatch):
+    monkeypatch.setitem(RESERVATION_CONFIG, 'hot_threshold', 1)
+    monkeypatch.setitem(RESERVATION_CONFIG, 'allotment_units', 5)
+    product = add_product(quantity=12)
+    till_a, till_b = ReservationManager(engine), ReservationManager(engine)    # Two processes' holders
+
+    till_a.reserve('cart-a', product['product_id'], 1)      # A allots 5 of the 12 and keeps 4 unused
+    assert engine.stock(product['product_id']) == 7
+    till_b.reserve('cart-b', product['product_id'], 1)      # 7 is below twice the block: B reserves directly
+    assert till_b.stats['allotments'] == 0
+    assert engine.stock(product['product_id']) == 6
+
+    # Only 6 are on the Inventory row; the other 4 free units are A's. B's cart still gets all 10.
+    till_b.reserve('cart-c', product['product_id'], 10)
+    assert engine.stock(product['product_id']) == 0
+    assert engine.query_value("SELECT COUNT(*) FROM StockReservations WHERE cart_id = %s", (till_a.holder,)) == 0
+
+    with pytest.raises(InsufficientStockError):     # Now the product really is sold out
+        till_a.reserve('cart-d', product['product_id'], 1)
+    for cart in ('cart-a', 'cart-b', 'cart-c'):
+        engine.release_reservations(cart)
+    assert engine.stock(product['product_id']) == 12
+
+def test_allotment_takes_at_most_a_share_of_stock(engine, add_product, monkeypatch):
+    monkeypatch.setitem(RESERVATION_CONFIG, 'hot_threshold', 1)
+    monkeypatch.setitem(RESERVATION_CONFIG, 'allotment_units', 5)
+    product = add_product(quantity=9)
+
+    engine.reserve_stock(uuid.uuid4().hex, product['product_id'], 1)
+
+    assert engine.reservations.stats == {'direct': 1, 'from_allotment': 0, 'allotments': 0, 'refused': 0}
+    assert engine.stock(product['product_id']) == 8
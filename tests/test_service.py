@@ -0,0 +1,82 @@
+"""Checkout service: requests over a socket, and malformed ones that must not drop the till's connection."""
+import asyncio
+import json
+
+import pytest
+
+from superstore_service import CheckoutService
+
+@pytest.fixture
+def service(engine):
+    service = CheckoutService(engine, workers=2)
+    yield service
+    service.executor.shutdown()
+
+def _dispatch(service, request):
+    return asyncio.run(service.dispatch(json.dumps(request), set()))
+
+@pytest.mark.parametrize('args', [
+    {'name': 'Test item', 'price': 'abc', 'quantity': 1},     # decimal.InvalidOperation, not a ValueError
+    {'name': 'Test item', 'price': '15.00'},                  # Missing argument
+])
+def test_malformed_arguments_are_a_bad_request(service, args):
+    response = _dispatch(service, {'id': 7, 'op': 'add_product', 'args': args})
+    assert (response['id'], response['ok'], response['error']) == (7, False, 'bad_request')
+
+@pytest.mark.parametrize('line', ['not json', '[1, 2]', '{"id": 1, "op": "no_such_op"}'])
+def test_malformed_requests_are_a_bad_request(service, line):
+    response = asyncio.run(service.dispatch(line, set()))
+    assert (response['ok'], response['error']) == (False, 'bad_request')
+
+def test_unexpected_error_is_an_internal_error(service, monkeypatch):
+    def broken(product_id):
+        raise ZeroDivisionError("division by zero")
+    monkeypatch.setattr(service.engine, 'get_product', broken)
+
+    response = _dispatch(service, {'id': 3, 'op': 'get_product', 'args': {'product_id': 1}})
+
+    assert (response['id'], response['ok'], response['error']) == (3, False, 'internal_error')
+    assert 'ZeroDivisionError' in response['message']
+
+def test_connection_survives_a_malformed_request(service, add_product):
+    product = add_product(quantity=5)
+
+    async def session():
+        server = await asyncio.start_server(service.handle_client, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+        async def call(op, **args):
+            writer.write(json.dumps({'id': op, 'op': op, 'args': args}).encode() + b'\n')
+            await writer.drain()
+            return json.loads(await reader.readline())
+
+        try:
+            cart_id = (await call('cart_new'))['result']
+            added = await call('cart_add', cart_id=cart_id, product_id=product['product_id'], quantity=2)
+            bad = await call('add_product', name='Test item', price='abc', quantity=1)
+            ping = await call('ping')
+            view = await call('cart_get', cart_id=cart_id)
+        finally:
+            writer.close()
+            server.close()
+            await server.wait_closed()
+        return added, bad, ping, view
+
+    added, bad, ping, view = asyncio.run(session())
+
+    assert added['ok']
+    assert bad['error'] == 'bad_request'
+    assert ping['result'] == 'pong'
+    # Same connection, so the cart (and its reservation) is still there.
+    assert [line['quantity'] for line in view['result']['lines']] == [2]
+
+def test_large_catalogue_lookups(service, add_product):
+    product = add_product()
+    service.engine.add_product('Scan ' + product['name'], '9.99', 1, barcode=f"77{product['product_id']:010d}")
+
+    count = _dispatch(service, {'id': 1, 'op': 'product_count'})
+    found = _dispatch(service, {'id': 2, 'op': 'get_product_by_barcode', 'args': {'barcode': f"77{product['product_id']:010d}"}})
+
+    assert count['result'] == service.engine.product_count() >= 2
+    assert found['result']['name'] == 'Scan ' + product['name']